@@ -0,0 +1,72 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Measures the per-call cost of supplier address derivation: the old
+rehash-everything scheme, sparts_supplier.addressing with a warm cache,
+and the bulk helper.
+
+    python benchmarks/bench_addressing.py --ids 1000000
+"""
+
+import argparse
+import hashlib
+import time
+
+from sparts_supplier import addressing
+
+
+def _sha512(data):
+    return hashlib.sha512(data).hexdigest()
+
+
+def uncached_address(supplier_id):
+    # What SupplierBatch._get_address did before the shared module: the
+    # constant namespace was rehashed on every call.
+    prefix = _sha512('supplier'.encode('utf-8'))[0:6]
+    return prefix + _sha512(supplier_id.encode('utf-8'))[0:64]
+
+
+def per_call(label, func, ids):
+    start = time.perf_counter()
+    for supplier_id in ids:
+        func(supplier_id)
+    elapsed = time.perf_counter() - start
+    print('{:<28} {:>8.3f} us/call'.format(label, elapsed / len(ids) * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ids', type=int, default=1000000)
+    parser.add_argument('--hot', type=int, default=1000,
+                        help='distinct ids in the repeated-lookup run')
+    args = parser.parse_args()
+
+    unique = ['supplier-{}'.format(i) for i in range(args.ids)]
+    hot = [unique[i % args.hot] for i in range(args.ids)]
+
+    per_call('uncached, hot ids', uncached_address, hot)
+    per_call('cached, hot ids', addressing.make_supplier_address, hot)
+
+    per_call('uncached, unique ids', uncached_address, unique)
+    start = time.perf_counter()
+    for _ in addressing.make_supplier_addresses(unique):
+        pass
+    elapsed = time.perf_counter() - start
+    print('{:<28} {:>8.3f} us/call'.format(
+        'bulk, unique ids', elapsed / len(unique) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Measures the import cost of each supplier CLI subcommand.
+
+Every case runs the CLI in a fresh interpreter under -X importtime,
+against benchmarks/mock_rest_api.py and with a throwaway signing key, and
+reports the median time spent importing modules, the number of modules
+imported and the wall time of the whole process. Results can be saved as
+a baseline and later runs compared against it:
+
+    python benchmarks/bench_cli_import.py --save baseline.json
+    python benchmarks/bench_cli_import.py --compare baseline.json
+    python benchmarks/bench_cli_import.py --cases retrieve --top 10
+
+--top lists the most expensive top-level imports of each case, which is
+where a module that crept into a subcommand's import path shows up.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from sawtooth_signing import create_context
+
+from sparts_supplier.supplier_batch import SupplierBatch
+
+from mock_rest_api import MockRestApi
+
+
+CLI = [sys.executable, '-X', 'importtime', '-c',
+       'from sparts_supplier.supplier_cli import main_wrapper; '
+       'main_wrapper()']
+
+SUPPLIER_ID = 'bench-supplier'
+
+
+def build_cases(url, workdir):
+    connection = ['--url', url]
+    specs = os.path.join(workdir, 'specs.jsonl')
+    parts = os.path.join(workdir, 'parts.txt')
+    rows = os.path.join(workdir, 'rows.csv')
+    batches = os.path.join(workdir, 'batches.bin')
+    return [
+        ('version', ['--version']),
+        ('retrieve', ['retrieve', SUPPLIER_ID] + connection),
+        ('list-supplier', ['list-supplier'] + connection),
+        ('create', ['create', 'bench-created', 'short', 'Bench Inc',
+                    'secret', 'http://example.com'] + connection),
+        ('AddPart', ['AddPart', SUPPLIER_ID, 'bench-part'] + connection),
+        ('AddParts', ['AddParts', SUPPLIER_ID, parts] + connection),
+        ('make-batch-file', ['make-batch-file', specs, batches,
+                             '--workers', '1']),
+        ('submit-file', ['submit-file', batches] + connection),
+        ('import', ['import', rows, '--workers', '1', '--quiet']
+         + connection),
+    ]
+
+
+def write_inputs(workdir):
+    with open(os.path.join(workdir, 'specs.jsonl'), 'w') as out:
+        for i in range(10):
+            out.write(json.dumps({'action': 'AddPart',
+                                  'supplier_id': SUPPLIER_ID,
+                                  'part_id': 'spec-part-{}'.format(i)}))
+            out.write('\n')
+    with open(os.path.join(workdir, 'parts.txt'), 'w') as out:
+        out.write('\n'.join('file-part-{}'.format(i) for i in range(10)))
+    with open(os.path.join(workdir, 'rows.csv'), 'w') as out:
+        out.write('supplier_id,part_id\n')
+        for i in range(10):
+            out.write('{},row-part-{}\n'.format(SUPPLIER_ID, i))
+
+
+def write_key(home, private_key):
+    # The CLI reads ~/.sawtooth/keys/<username>.priv
+    key_dir = os.path.join(home, '.sawtooth', 'keys')
+    os.makedirs(key_dir)
+    with open(os.path.join(key_dir, 'bench.priv'), 'w') as out:
+        out.write(private_key)
+
+
+def parse_importtime(stderr):
+    """Returns the total self time in microseconds of every import listed
+    in -X importtime output, the number of modules, and (cumulative us,
+    module) for each top-level import.
+    """
+    total = 0
+    modules = 0
+    top = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            self_us = int(fields[0])
+            cumulative_us = int(fields[1])
+        except (IndexError, ValueError):
+            continue
+        total += self_us
+        modules += 1
+        name = fields[2]
+        # Nesting is shown by two spaces per level after the separator
+        if not name[1:].startswith(' '):
+            top.append((cumulative_us, name.strip()))
+    return total, modules, top
+
+
+def measure(args, env, runs):
+    imports = []
+    walls = []
+    modules = 0
+    top = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(CLI + args, env=env, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE,
+                                universal_newlines=True)
+        walls.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError('{} failed: {}'.format(
+                ' '.join(args), result.stdout + result.stderr[-2000:]))
+        total, modules, top = parse_importtime(result.stderr)
+        imports.append(total)
+    return {
+        'import_ms': statistics.median(imports) / 1e3,
+        'modules': modules,
+        'wall_ms': statistics.median(walls) * 1e3,
+    }, sorted(top, reverse=True)
+
+
+def change(baseline, result):
+    """Percent change in import time; positive is slower."""
+    return (result['import_ms'] / baseline['import_ms'] - 1) * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', nargs='+', default=[],
+                        help='only run these subcommands')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='processes started per case')
+    parser.add_argument('--top', type=int, default=0,
+                        help='list this many of the slowest top-level '
+                        'imports per case')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare',
+                        help='compare with results saved by --save')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='import time increase in percent that '
+                        '--compare reports as a regression')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as fd:
+            baseline = json.load(fd)['results']
+
+    private_key = create_context('secp256k1').new_random_private_key()
+    results = {}
+    regressions = []
+    with tempfile.TemporaryDirectory() as workdir, \
+            MockRestApi() as server:
+        with SupplierBatch(server.url,
+                           private_key=private_key.as_hex()) as client:
+            client.create(SUPPLIER_ID, 'bench', 'Bench Inc', 'secret',
+                          'http://example.com')
+        write_inputs(workdir)
+        write_key(workdir, private_key.as_hex())
+        env = dict(os.environ, HOME=workdir, USER='bench',
+                   LOGNAME='bench')
+
+        print('{:<16} {:>10} {:>8} {:>10}{}'.format(
+            'subcommand', 'import ms', 'modules', 'wall ms',
+            ' import vs base' if baseline else ''))
+        for name, cli_args in build_cases(server.url, workdir):
+            if args.cases and name not in args.cases:
+                continue
+            result, top = measure(cli_args, env, args.runs)
+            results[name] = result
+            line = '{:<16} {:>10.1f} {:>8} {:>10.1f}'.format(
+                name, result['import_ms'], result['modules'],
+                result['wall_ms'])
+            if name in baseline:
+                line += ' {:>+13.1f}%'.format(change(baseline[name], result))
+                if change(baseline[name], result) > args.threshold:
+                    regressions.append(name)
+            print(line)
+            for cumulative_us, module in top[:args.top]:
+                print('    {:>10.1f} {}'.format(cumulative_us / 1e3, module))
+
+    if args.save:
+        with open(args.save, 'w') as fd:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            }, fd, indent=2, sort_keys=True)
+
+    if regressions:
+        print('regressed by more than {}%: {}'.format(
+            args.threshold, ', '.join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
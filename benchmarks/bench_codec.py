@@ -0,0 +1,66 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Compares state size and encode/decode time of supplier records in the
+legacy CSV+JSON layout and the binary codec.
+
+    python benchmarks/bench_codec.py --parts 10 1000 100000
+"""
+
+import argparse
+import timeit
+import uuid
+
+from sparts_supplier import codec
+
+
+def make_supplier(parts):
+    return {
+        'supplier_id': str(uuid.uuid4()),
+        'short_id': 'acme',
+        'supplier_name': 'Acme Corporation',
+        'passwd': 'x' * 64,
+        'supplier_url': 'http://acme.example.com',
+        'parts': [{'part_id': str(uuid.uuid4())} for _ in range(parts)],
+    }
+
+
+def per_call(func, arg):
+    timer = timeit.Timer(lambda: func(arg))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--parts', type=int, nargs='+',
+                        default=[10, 1000, 100000])
+    args = parser.parse_args()
+
+    print('{:>7} {:>7} {:>10} {:>12} {:>12}'.format(
+        'parts', 'codec', 'bytes', 'encode us', 'decode us'))
+    for parts in args.parts:
+        supplier = make_supplier(parts)
+        for name, encode in (('legacy', codec.encode_legacy_supplier),
+                             ('binary', codec.encode_supplier)):
+            data = encode(supplier)
+            print('{:>7} {:>7} {:>10} {:>12.1f} {:>12.1f}'.format(
+                parts, name, len(data),
+                per_call(encode, supplier) * 1e6,
+                per_call(codec.decode_supplier, data) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
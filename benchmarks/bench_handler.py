@@ -0,0 +1,305 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Microbenchmarks for the SupplierTransactionHandler hot path, driven
+through an in-memory state context.
+
+Each case's setup returns the op to time and, optionally, an untimed
+reset run after every op. A case reports ops/sec, per-op latency
+percentiles and the bytes allocated per op (measured in a separate pass
+under tracemalloc). Results can be saved as a baseline and later runs
+compared against it:
+
+    python benchmarks/bench_handler.py --save baseline.json
+    python benchmarks/bench_handler.py --compare baseline.json
+    python benchmarks/bench_handler.py --cases addpart --parts 0 1000
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from sparts_supplier import addressing
+from sparts_supplier import codec
+from sparts_supplier.processor import handler
+from sparts_supplier.processor.handler import SupplierTransactionHandler
+from sparts_supplier.processor.memory_state import InMemoryContext
+from sparts_supplier.processor.memory_state import make_request
+
+
+SUPPLIER_FIELDS = {
+    'short_id': 'acme',
+    'supplier_name': 'Acme Corporation',
+    'passwd': 'x' * 64,
+    'supplier_url': 'http://acme.example.com',
+}
+
+
+def payload(family_version, action, supplier_id, part_id=''):
+    # short_ids are unique per supplier under 1.1
+    fields = dict(SUPPLIER_FIELDS, supplier_id=supplier_id,
+                  short_id=supplier_id, action=action, part_id=part_id)
+    if action != 'create':
+        fields.update(dict.fromkeys(SUPPLIER_FIELDS, ''))
+    if family_version == '1.0':
+        return ','.join(fields[key] for key in (
+            'supplier_id', 'short_id', 'supplier_name', 'passwd',
+            'supplier_url', 'action', 'part_id')).encode()
+    return json.dumps(fields, sort_keys=True).encode()
+
+
+def supplier_record(supplier_id, parts):
+    return dict(SUPPLIER_FIELDS, supplier_id=supplier_id, parts=[
+        {'part_id': 'part-{}'.format(i)} for i in range(parts)])
+
+
+def seed_supplier(context, family_version, supplier_id, parts):
+    """Stores a supplier with parts as the given family version would
+    have left it: inline in the record for 1.0, as links for 1.1.
+    """
+    address = handler.make_supplier_address(
+        handler.SUPPLIER_NAMESPACE, supplier_id)
+    record = supplier_record(supplier_id, parts)
+    if family_version == '1.0':
+        context.state[address] = codec.encode_legacy_supplier(record)
+        return address, record
+    context.state[address] = codec.encode_supplier(
+        dict(record, parts=[]))
+    for part in record['parts']:
+        context.state[handler.make_part_address(
+            handler.PART_NAMESPACE, supplier_id, part['part_id'])] = \
+            handler.encode_part_link(part['part_id'])
+    return address, None
+
+
+def case_create(family_version):
+    def setup():
+        tp = SupplierTransactionHandler()
+        context = InMemoryContext()
+        ids = itertools.count()
+
+        def op():
+            tp.apply(make_request(payload(
+                family_version, 'create',
+                'supplier-{}'.format(next(ids))), family_version), context)
+        return op, None
+    return setup
+
+
+def case_addpart(family_version, parts):
+    def setup():
+        tp = SupplierTransactionHandler()
+        context = InMemoryContext()
+        address, record = \
+            seed_supplier(context, family_version, 'supplier', parts)
+        seeded = context.state[address]
+        ids = itertools.count(parts)
+
+        def op():
+            tp.apply(make_request(payload(
+                family_version, 'AddPart', 'supplier',
+                'part-{}'.format(next(ids))), family_version), context)
+
+        if record is None:
+            return op, None
+
+        # 1.0 keeps parts inline, so put the record back to its seeded
+        # size
+        def reset():
+            context.state[address] = seeded
+        reset()
+        return op, reset
+    return setup
+
+
+def case_parse_payload(family_version):
+    def setup():
+        data = payload(family_version, 'AddPart', 'supplier', 'part-1')
+
+        def op():
+            handler.parse_payload(data, family_version)
+        return op, None
+    return setup
+
+
+def case_address(cached):
+    def setup():
+        ids = itertools.count()
+        if cached:
+            def op():
+                handler.make_supplier_address(
+                    handler.SUPPLIER_NAMESPACE, 'supplier')
+        else:
+            derive = addressing.make_supplier_address.__wrapped__
+
+            def op():
+                derive('supplier-{}'.format(next(ids)))
+        return op, None
+    return setup
+
+
+def case_roundtrip(encode, parts):
+    def setup():
+        record = supplier_record('supplier', parts)
+
+        def op():
+            codec.decode_supplier(encode(record))
+        return op, None
+    return setup
+
+
+def build_cases(part_counts):
+    cases = [
+        ('create/1.0', case_create('1.0')),
+        ('create/1.1', case_create('1.1')),
+        ('parse_payload/1.0', case_parse_payload('1.0')),
+        ('parse_payload/1.1', case_parse_payload('1.1')),
+        ('address/cached', case_address(True)),
+        ('address/uncached', case_address(False)),
+    ]
+    for parts in part_counts:
+        cases += [
+            ('addpart/1.0/{}'.format(parts), case_addpart('1.0', parts)),
+            ('addpart/1.1/{}'.format(parts), case_addpart('1.1', parts)),
+            ('roundtrip/json/{}'.format(parts),
+             case_roundtrip(codec.encode_legacy_supplier, parts)),
+            ('roundtrip/binary/{}'.format(parts),
+             case_roundtrip(codec.encode_supplier, parts)),
+        ]
+    return cases
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(setup, min_time, max_ops, alloc_ops):
+    op, reset = setup()
+    reset = reset or (lambda: None)
+    for _ in range(min(10, max_ops)):
+        op()
+        reset()
+
+    timings = []
+    clock = time.perf_counter_ns
+    deadline = time.perf_counter() + min_time
+    while len(timings) < max_ops and \
+            (len(timings) < 5 or time.perf_counter() < deadline):
+        start = clock()
+        op()
+        timings.append(clock() - start)
+        reset()
+    timings.sort()
+
+    tracemalloc.start()
+    allocated = 0
+    for _ in range(alloc_ops):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        op()
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - before
+        reset()
+    tracemalloc.stop()
+
+    total = sum(timings)
+    return {
+        'ops': len(timings),
+        'ops_per_sec': len(timings) / (total / 1e9),
+        'p50_us': percentile(timings, 0.50) / 1e3,
+        'p95_us': percentile(timings, 0.95) / 1e3,
+        'p99_us': percentile(timings, 0.99) / 1e3,
+        'alloc_bytes': allocated // max(alloc_ops, 1),
+    }
+
+
+def print_row(name, result, baseline=None):
+    line = '{:<24} {:>12.0f} {:>10.1f} {:>10.1f} {:>10.1f} {:>12}'.format(
+        name, result['ops_per_sec'], result['p50_us'], result['p95_us'],
+        result['p99_us'], result['alloc_bytes'])
+    if baseline is not None:
+        line += ' {:>+8.1f}%'.format(change(baseline, result))
+    print(line)
+
+
+def change(baseline, result):
+    """Percent change in p50 latency; positive is slower."""
+    return (result['p50_us'] / baseline['p50_us'] - 1) * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--parts', type=int, nargs='+',
+                        default=[0, 1000, 10000, 100000],
+                        help='parts held by the supplier in addpart and '
+                        'roundtrip cases')
+    parser.add_argument('--cases', nargs='+', default=[],
+                        help='only run cases whose name starts with one '
+                        'of these')
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help='seconds to time each case for')
+    parser.add_argument('--max-ops', type=int, default=100000)
+    parser.add_argument('--alloc-ops', type=int, default=20,
+                        help='ops traced to measure allocations')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare',
+                        help='compare with results saved by --save')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='p50 slowdown in percent that --compare '
+                        'reports as a regression')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as fd:
+            baseline = json.load(fd)['results']
+
+    print('{:<24} {:>12} {:>10} {:>10} {:>10} {:>12}{}'.format(
+        'case', 'ops/sec', 'p50 us', 'p95 us', 'p99 us', 'alloc B/op',
+        ' p50 vs base' if baseline else ''))
+
+    results = {}
+    regressions = []
+    for name, setup in build_cases(args.parts):
+        if args.cases and not name.startswith(tuple(args.cases)):
+            continue
+        result = measure(setup, args.min_time, args.max_ops, args.alloc_ops)
+        results[name] = result
+        print_row(name, result, baseline.get(name))
+        if name in baseline and \
+                change(baseline[name], result) > args.threshold:
+            regressions.append(name)
+
+    if args.save:
+        with open(args.save, 'w') as fd:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            }, fd, indent=2, sort_keys=True)
+
+    if regressions:
+        print('regressed by more than {}%: {}'.format(
+            args.threshold, ', '.join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
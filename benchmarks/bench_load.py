@@ -0,0 +1,230 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Drives a mix of supplier client operations at a target rate and
+reports throughput and latency percentiles per operation.
+
+Runs fully offline against benchmarks/mock_rest_api.py unless --url
+points somewhere else:
+
+    python benchmarks/bench_load.py --mix create=1,addpart=8,retrieve=1 \\
+        --rate 500 --duration 10 --threads 8
+
+Operations are scheduled open loop at --rate per second (0 runs them
+back to back) and latency is measured from the scheduled start, so a
+client that falls behind shows it in the percentiles. cli_retrieve and
+cli_list run the supplier CLI in a new process, which is what a script
+shelling out to it pays per call.
+"""
+
+import argparse
+import itertools
+import os
+import queue
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from sawtooth_signing import create_context
+
+from sparts_supplier.supplier_batch import SupplierBatch
+from sparts_supplier.supplier_batch import create_session
+
+from mock_rest_api import MockRestApi
+
+
+CLI = [sys.executable, '-c',
+       'from sparts_supplier.supplier_cli import main_wrapper; '
+       'main_wrapper()']
+
+
+class Workload:
+    def __init__(self, client, url, suppliers):
+        self._client = client
+        self._url = url
+        self._lock = threading.Lock()
+        self._suppliers = list(suppliers)
+        self._ids = itertools.count()
+
+    def _new_id(self, kind):
+        return 'load-{}-{}-{}'.format(kind, os.getpid(), next(self._ids))
+
+    def _pick(self):
+        with self._lock:
+            return random.choice(self._suppliers)
+
+    def create(self):
+        supplier_id = self._new_id('supplier')
+        self._client.create(supplier_id, supplier_id, 'Load Test Inc',
+                            'secret', 'http://example.com')
+        with self._lock:
+            self._suppliers.append(supplier_id)
+
+    def addpart(self):
+        self._client.add_part(self._pick(), self._new_id('part'))
+
+    def retrieve(self):
+        self._client.retrieve_supplier(self._pick())
+
+    def list(self):
+        self._client.list_supplier()
+
+    def cli_retrieve(self):
+        subprocess.run(CLI + ['retrieve', self._pick(), '--url', self._url],
+                       stdout=subprocess.DEVNULL, check=True)
+
+    def cli_list(self):
+        subprocess.run(CLI + ['list-supplier', '--url', self._url],
+                       stdout=subprocess.DEVNULL, check=True)
+
+
+OPERATIONS = ('create', 'addpart', 'retrieve', 'list', 'cli_retrieve',
+              'cli_list')
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(
+                'unknown operation: {}'.format(name))
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def seed(client, count):
+    ids = ['load-seed-{}-{}'.format(os.getpid(), i) for i in range(count)]
+    client.submit_many(
+        client.make_create_transaction(
+            supplier_id, supplier_id, 'Seed Inc', 'secret',
+            'http://example.com')
+        for supplier_id in ids)
+    return ids
+
+
+def run(workload, mix, rate, duration, threads):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    results = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    work = queue.Queue(maxsize=threads * 4)
+
+    def worker():
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            name, scheduled = item
+            try:
+                getattr(workload, name)()
+            except Exception:
+                errors[name] += 1
+                continue
+            results[name].append(time.perf_counter() - scheduled)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+
+    start = time.perf_counter()
+    end = start + duration
+    for i in itertools.count():
+        scheduled = start + i / rate if rate else time.perf_counter()
+        if scheduled >= end:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        work.put((random.choices(names, weights)[0], scheduled))
+
+    for _ in pool:
+        work.put(None)
+    for thread in pool:
+        thread.join()
+    return results, errors, time.perf_counter() - start
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def report(results, errors, elapsed):
+    print('{:<14} {:>8} {:>7} {:>10} {:>9} {:>9} {:>9}'.format(
+        'operation', 'ops', 'errors', 'ops/sec', 'p50 ms', 'p95 ms',
+        'p99 ms'))
+    total = 0
+    for name, latencies in results.items():
+        latencies.sort()
+        total += len(latencies)
+        print('{:<14} {:>8} {:>7} {:>10.1f} {:>9.2f} {:>9.2f} {:>9.2f}'
+              .format(name, len(latencies), errors[name],
+                      len(latencies) / elapsed,
+                      percentile(latencies, 0.50) * 1e3,
+                      percentile(latencies, 0.95) * 1e3,
+                      percentile(latencies, 0.99) * 1e3))
+    print('{:<14} {:>8} {:>7} {:>10.1f}'.format(
+        'total', total, sum(errors.values()), total / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mix', type=parse_mix,
+                        default='create=1,addpart=8,retrieve=1',
+                        help='comma-separated operation=weight pairs from: '
+                        + ', '.join(OPERATIONS))
+    parser.add_argument('--rate', type=float, default=0,
+                        help='operations per second (0: as fast as '
+                        'possible)')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--threads', type=int, default=8,
+                        help='concurrent client threads')
+    parser.add_argument('--suppliers', type=int, default=1000,
+                        help='suppliers created before the run')
+    parser.add_argument('--url',
+                        help='REST API to load instead of the local mock')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds the mock adds to every request')
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = MockRestApi(latency=args.latency)
+        server.start()
+        url = server.url
+
+    private_key = create_context('secp256k1').new_random_private_key()
+    session = create_session(pool_size=args.threads)
+    client = SupplierBatch(url, session=session,
+                           private_key=private_key.as_hex(),
+                           family_version='1.1')
+    try:
+        workload = Workload(client, url, seed(client, args.suppliers))
+        report(*run(workload, args.mix, args.rate, args.duration,
+                    args.threads))
+    finally:
+        session.close()
+        if server is not None:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Compares decoding a synthetic state listing with yaml.safe_load against
+the JSON fast path used by SupplierBatch.
+
+    python benchmarks/bench_response_decode.py --entries 50000
+"""
+
+import argparse
+import base64
+import json
+import time
+import tracemalloc
+
+import yaml
+
+from sparts_supplier.supplier_batch import _parse_state_page
+
+
+def make_listing(entries):
+    data = []
+    for i in range(entries):
+        supplier_id = 'supplier-{}'.format(i)
+        record = {
+            'supplier_id': supplier_id,
+            'short_id': 's{}'.format(i),
+            'supplier_name': 'Supplier {}'.format(i),
+            'passwd': 'x' * 16,
+            'supplier_url': 'http://example.com/{}'.format(i),
+            'parts': [{'part_id': 'part-{}-{}'.format(i, j)}
+                      for j in range(3)],
+        }
+        value = ','.join([supplier_id, json.dumps(record)]).encode()
+        data.append({
+            'address': '{:070x}'.format(i),
+            'data': base64.b64encode(value).decode(),
+        })
+    return json.dumps({'data': data, 'paging': {'limit': entries}})
+
+
+def measure(decode, body):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = decode(body)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def decode_yaml(body):
+    entries = yaml.safe_load(body)['data']
+    return len([base64.b64decode(entry['data']) for entry in entries])
+
+
+def decode_json(body):
+    entries, _ = _parse_state_page(body)
+    return sum(1 for entry in entries if base64.b64decode(entry['data']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=50000)
+    args = parser.parse_args()
+
+    body = make_listing(args.entries)
+    print('listing: {} entries, {:.1f} MB'.format(
+        args.entries, len(body) / 1e6))
+
+    for name, decode in (('yaml.safe_load', decode_yaml),
+                         ('json fast path', decode_json)):
+        count, elapsed, peak = measure(decode, body)
+        print('{:<16} {:>8.3f} s  {:>10.0f} entries/s  peak {:>7.1f} MB'
+              .format(name, elapsed, count / elapsed, peak / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Local stand-in for the Sawtooth REST API endpoints the supplier client
+uses: POST /batches, GET and POST /batch_statuses, GET /state, GET
+/state/<address> and GET /blocks.
+
+Submitted batches are applied right away through the real
+SupplierTransactionHandler against in-memory state, all or nothing per
+batch, so reads see what was written and a rejected batch reports
+INVALID. The committed batches of each submission form one new block.
+There are no forks, and state reads ignore ?head= and always see the
+latest state. Like the REST API, requests with a request line longer
+than 8190 bytes are refused. Run it on its own to point the CLI at it:
+
+    python benchmarks/mock_rest_api.py --port 8008
+"""
+
+import argparse
+import base64
+import bisect
+import collections
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+from sawtooth_sdk.processor.exceptions import InternalError
+from sawtooth_sdk.processor.exceptions import InvalidTransaction
+from sawtooth_sdk.protobuf.batch_pb2 import BatchList
+from sawtooth_sdk.protobuf.processor_pb2 import TpProcessRequest
+from sawtooth_sdk.protobuf.transaction_pb2 import TransactionHeader
+
+from sparts_supplier.processor.handler import SupplierTransactionHandler
+from sparts_supplier.processor.memory_state import InMemoryContext
+
+
+# The REST API caps state listings at 1000 entries per page.
+MAX_PAGE_SIZE = 1000
+
+# Longest request line the REST API's HTTP server accepts.
+MAX_REQUEST_LINE = 8190
+
+
+class MockLedger:
+    """State and batch statuses behind the mock endpoints."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handler = SupplierTransactionHandler()
+        self._state = {}
+        self._addresses = []
+        self._statuses = {}
+        self._blocks = []
+
+    def submit(self, batch_list):
+        batches = BatchList()
+        batches.ParseFromString(batch_list)
+        with self._lock:
+            committed = []
+            for batch in batches.batches:
+                status, invalid = self._apply_batch(batch)
+                self._statuses[batch.header_signature] = status, invalid
+                if status == 'COMMITTED':
+                    committed.append(batch)
+            if committed:
+                self._publish(committed)
+        return [batch.header_signature for batch in batches.batches]
+
+    def blocks(self, limit, start=None):
+        """Returns blocks newest first from the block with id start on,
+        and the id of the block the next page starts at, or None.
+        """
+        with self._lock:
+            index = len(self._blocks)
+            if start is not None:
+                ids = [block['header_signature'] for block in self._blocks]
+                index = ids.index(start) + 1 if start in ids else 0
+            page = self._blocks[max(index - limit, 0):index][::-1]
+            if index > limit:
+                return page, self._blocks[index - limit - 1][
+                    'header_signature']
+        return page, None
+
+    def status(self, batch_id):
+        """Returns the status of a batch and its invalid_transactions."""
+        return self._statuses.get(batch_id, ('UNKNOWN', []))
+
+    def get(self, address):
+        return self._state.get(address)
+
+    def list(self, prefix, limit, start=None):
+        """Returns (address, data) pairs under prefix from start on, and
+        the address the next page starts at, or None.
+        """
+        with self._lock:
+            index = bisect.bisect_left(self._addresses, start or prefix)
+            page = []
+            for address in self._addresses[index:index + limit + 1]:
+                if not address.startswith(prefix):
+                    break
+                page.append((address, self._state[address]))
+        if len(page) > limit:
+            return page[:limit], page[limit][0]
+        return page, None
+
+    def _apply_batch(self, batch):
+        writes = {}
+        context = InMemoryContext(
+            state=collections.ChainMap(writes, self._state))
+        for transaction in batch.transactions:
+            request = TpProcessRequest(
+                header=TransactionHeader.FromString(transaction.header),
+                payload=transaction.payload,
+                signature=transaction.header_signature)
+            try:
+                self._handler.apply(request, context)
+            except (InvalidTransaction, InternalError) as err:
+                return 'INVALID', [{'id': transaction.header_signature,
+                                    'message': str(err)}]
+
+        for address in writes:
+            if address not in self._state:
+                bisect.insort(self._addresses, address)
+        self._state.update(writes)
+        return 'COMMITTED', []
+
+    def _publish(self, batches):
+        previous = self._blocks[-1]['header_signature'] if self._blocks \
+            else '0' * 128
+        block_id = hashlib.sha512(previous.encode() + b''.join(
+            batch.header_signature.encode() for batch in batches)).hexdigest()
+        # Like the REST API, 64-bit integers are rendered as strings
+        self._blocks.append({
+            'header_signature': block_id,
+            'header': {
+                'block_num': str(len(self._blocks)),
+                'previous_block_id': previous,
+                'batch_ids': [batch.header_signature for batch in batches],
+            },
+            'batches': [_batch_json(batch) for batch in batches],
+        })
+
+
+def _batch_json(batch):
+    transactions = []
+    for transaction in batch.transactions:
+        header = TransactionHeader.FromString(transaction.header)
+        transactions.append({
+            'header_signature': transaction.header_signature,
+            'header': {
+                'family_name': header.family_name,
+                'family_version': header.family_version,
+                'inputs': list(header.inputs),
+                'outputs': list(header.outputs),
+                'signer_public_key': header.signer_public_key,
+            },
+            'payload': base64.b64encode(transaction.payload).decode(),
+        })
+    return {'header_signature': batch.header_signature,
+            'transactions': transactions}
+
+
+class MockRestApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send each response in one write; small writes stall on Nagle
+    wbufsize = -1
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        url = urlparse(self.path)
+        if url.path == '/batch_statuses':
+            try:
+                ids = json.loads(body.decode())
+            except ValueError as err:
+                return self._send(400, {'error': str(err)})
+            self._delay()
+            return self._send(200, self._statuses(ids))
+
+        if url.path != '/batches':
+            return self._send(404, {'error': 'Not found'})
+        try:
+            batch_ids = self.server.ledger.submit(body)
+        except Exception as err:
+            return self._send(400, {'error': str(err)})
+        self._delay()
+        self._send(202, {'link': '{}/batch_statuses?id={}'.format(
+            self.server.url, ','.join(batch_ids))})
+
+    def do_GET(self):
+        if len(self.requestline) > MAX_REQUEST_LINE:
+            return self._send(400, {'error': 'Request line too long'})
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self._delay()
+        if url.path == '/batch_statuses':
+            ids = ','.join(query.get('id', [''])).split(',')
+            return self._send(200, self._statuses(ids))
+
+        if url.path == '/state':
+            limit = min(int(query.get('limit', [MAX_PAGE_SIZE])[0]),
+                        MAX_PAGE_SIZE)
+            entries, next_position = self.server.ledger.list(
+                query.get('address', [''])[0], limit,
+                query.get('start', [None])[0])
+            paging = {'limit': limit}
+            if next_position is not None:
+                paging['next_position'] = next_position
+            return self._send(200, {
+                'data': [{'address': address,
+                          'data': base64.b64encode(data).decode()}
+                         for address, data in entries],
+                'paging': paging})
+
+        if url.path == '/blocks':
+            limit = min(int(query.get('limit', [MAX_PAGE_SIZE])[0]),
+                        MAX_PAGE_SIZE)
+            blocks, next_position = self.server.ledger.blocks(
+                limit, query.get('start', [None])[0])
+            paging = {'limit': limit}
+            if next_position is not None:
+                paging['next_position'] = next_position
+            return self._send(200, {'data': blocks, 'paging': paging})
+
+        if url.path.startswith('/state/'):
+            data = self.server.ledger.get(url.path[len('/state/'):])
+            if data is None:
+                return self._send(404, {'error': 'Not found'})
+            return self._send(
+                200, {'data': base64.b64encode(data).decode()})
+
+        self._send(404, {'error': 'Not found'})
+
+    def log_message(self, *args):
+        pass
+
+    def _statuses(self, batch_ids):
+        data = []
+        for batch_id in batch_ids:
+            if batch_id:
+                status, invalid = self.server.ledger.status(batch_id)
+                data.append({'id': batch_id, 'status': status,
+                             'invalid_transactions': invalid})
+        return {'data': data}
+
+    def _delay(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def _send(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockRestApi(ThreadingHTTPServer):
+    """Serves a MockLedger on a local port, optionally adding latency
+    seconds to every request to mimic a remote validator.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), MockRestApiHandler)
+        self.ledger = MockLedger()
+        self.latency = latency
+        self.url = 'http://{}:{}'.format(host, self.server_port)
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
+
+    def start(self):
+        # A short poll interval keeps stop() quick
+        self._thread = threading.Thread(
+            target=self.serve_forever, kwargs={'poll_interval': 0.05},
+            daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8008)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added to every request')
+    args = parser.parse_args()
+
+    server = MockRestApi(args.host, args.port, args.latency)
+    print('Serving on {}'.format(server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -46,6 +46,7 @@ setup(
         'sawtooth-sdk',
         'sawtooth-signing',
         'PyYAML',
+        'toml',
     ],
     data_files=data_files,
     entry_points={
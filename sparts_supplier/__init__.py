@@ -16,5 +16,12 @@
 __all__ = [
     'supplier_cli',
     'supplier_batch',
-    'exceptions'
+    'async_supplier_batch',
+    'addressing',
+    'batch_file',
+    'batch_status',
+    'bulk',
+    'codec',
+    'exceptions',
+    'supplier_index'
 ]
@@ -0,0 +1,76 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""State address derivation for the supplier family, shared by the
+transaction processor and the clients.
+"""
+
+import hashlib
+from functools import lru_cache
+
+
+FAMILY_NAME = 'supplier'
+
+# Supplier ids remembered by make_supplier_address and make_part_prefix.
+ADDRESS_CACHE_SIZE = 65536
+
+
+def _sha512(data):
+    return hashlib.sha512(data).hexdigest()
+
+
+NAMESPACE = _sha512(FAMILY_NAME.encode('utf-8'))[:6]
+
+# Family version 1.1 stores each supplier-part link at its own address in
+# this namespace instead of appending it to the supplier record.
+PART_NAMESPACE = _sha512('supplier-part'.encode('utf-8'))[:6]
+
+# Family version 1.1 keeps a secondary index entry per short_id in this
+# namespace, holding the id and address of the supplier that has it.
+SHORT_ID_NAMESPACE = _sha512('supplier-short-id'.encode('utf-8'))[:6]
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def make_supplier_address(supplier_id):
+    return NAMESPACE + _sha512(supplier_id.encode('utf-8'))[:64]
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def make_part_prefix(supplier_id):
+    """Returns the address prefix under which all of a supplier's part
+    links are stored.
+    """
+    return PART_NAMESPACE + _sha512(supplier_id.encode('utf-8'))[:32]
+
+
+def make_part_address(supplier_id, part_id):
+    return make_part_prefix(supplier_id) + \
+        _sha512(part_id.encode('utf-8'))[:32]
+
+
+def make_short_id_address(short_id):
+    return SHORT_ID_NAMESPACE + _sha512(short_id.encode('utf-8'))[:64]
+
+
+def make_supplier_addresses(supplier_ids):
+    """Yields the address of each supplier id in turn.
+
+    Meant for bulk derivation over millions of ids: it bypasses the LRU
+    cache, which would only churn on ids that are each seen once.
+    """
+    sha512 = hashlib.sha512
+    namespace = NAMESPACE
+    for supplier_id in supplier_ids:
+        yield namespace + sha512(supplier_id.encode('utf-8')).hexdigest()[:64]
@@ -0,0 +1,345 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import asyncio
+import base64
+import collections
+import json
+import time
+
+import aiohttp
+
+from sawtooth_sdk.protobuf.batch_pb2 import BatchList
+
+from sparts_supplier.exceptions import SupplierException
+from sparts_supplier.supplier_batch import SupplierClientBase
+from sparts_supplier.supplier_batch import DEFAULT_BATCH_SIZE
+from sparts_supplier.supplier_batch import DEFAULT_BATCHES_PER_LIST
+from sparts_supplier.supplier_batch import DEFAULT_PAGE_SIZE
+from sparts_supplier.supplier_batch import FAMILY_VERSION
+from sparts_supplier.supplier_batch import _basic_auth_header
+from sparts_supplier.supplier_batch import _merge_part_links
+from sparts_supplier.supplier_batch import _parse_state
+from sparts_supplier.supplier_batch import _parse_state_page
+from sparts_supplier.supplier_batch import _parse_status
+from sparts_supplier.supplier_batch import _parse_status_entries
+from sparts_supplier.supplier_batch import _state_page_suffix
+
+
+# Requests allowed in flight at once per AsyncSupplierBatch.
+DEFAULT_MAX_CONCURRENCY = 100
+
+# Seconds the REST API may hold a batch_statuses request open.
+DEFAULT_STATUS_WAIT = 30
+
+# BatchLists submit_many POSTs at once. Above 1 a later BatchList may
+# overtake an earlier one, such as an AddPart overtaking the create of its
+# supplier, so only raise it when no transaction depends on an earlier
+# BatchList.
+DEFAULT_SUBMIT_CONCURRENCY = 1
+
+
+class AsyncSupplierBatch(SupplierClientBase):
+    """asyncio counterpart of SupplierBatch.
+
+    Requests go through one aiohttp session and at most max_concurrency
+    of them are in flight at a time, so a single event loop can drive
+    thousands of concurrent create/AddPart/retrieve calls:
+
+        async with AsyncSupplierBatch(url, keyfile) as client:
+            await asyncio.gather(*[
+                client.retrieve_supplier(i) for i in supplier_ids])
+    """
+
+    def __init__(self, base_url, keyfile=None, session=None,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, timeout=None,
+                 family_version=FAMILY_VERSION, private_key=None):
+        super().__init__(base_url, keyfile, family_version, private_key)
+
+        if max_concurrency < 1:
+            raise SupplierException('max_concurrency must be positive')
+
+        self._owns_session = session is None
+        self._session = session
+        self._max_concurrency = max_concurrency
+        self._semaphore = None
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, tb):
+        await self.close()
+
+    async def close(self):
+        """Closes the aiohttp session if this instance created it."""
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def create(self, supplier_id, short_id, supplier_name, passwd,
+                     supplier_url, auth_user=None, auth_password=None):
+        return await self.create_supplier_transaction(
+            supplier_id, short_id, supplier_name, passwd, supplier_url,
+            "create",
+            auth_user=auth_user,
+            auth_password=auth_password)
+
+    async def add_part(self, supplier_id, part_id, auth_user=None,
+                       auth_password=None):
+        return await self.create_supplier_transaction(
+            supplier_id, "", "", "", "", "AddPart", part_id,
+            auth_user=auth_user,
+            auth_password=auth_password)
+
+    async def add_parts(self, supplier_id, part_ids, auth_user=None,
+                        auth_password=None):
+        batch_list = self._create_batch_list(
+            self.make_add_parts_transactions(supplier_id, part_ids))
+
+        return await self._send_request(
+            "batches", batch_list.SerializeToString(),
+            'application/octet-stream',
+            auth_user=auth_user,
+            auth_password=auth_password)
+
+    async def migrate_parts(self, supplier_id, short_id="", auth_user=None,
+                            auth_password=None):
+        return await self.create_supplier_transaction(
+            supplier_id, short_id, "", "", "", "MigrateParts",
+            auth_user=auth_user,
+            auth_password=auth_password)
+
+    async def list_supplier(self, auth_user=None, auth_password=None):
+        return [
+            entry async for entry in self.iter_suppliers(
+                auth_user=auth_user, auth_password=auth_password)
+        ]
+
+    async def iter_suppliers(self, page_size=DEFAULT_PAGE_SIZE,
+                             auth_user=None, auth_password=None):
+        """Async generator over every supplier record in the namespace,
+        fetching one page of page_size entries at a time.
+        """
+        async for entry in self._iter_state(
+                self._get_prefix(), page_size, auth_user, auth_password):
+            yield entry
+
+    async def _iter_state(self, prefix, page_size=DEFAULT_PAGE_SIZE,
+                          auth_user=None, auth_password=None):
+        start = None
+        while True:
+            result = await self._send_request(
+                _state_page_suffix(prefix, page_size, start),
+                auth_user=auth_user,
+                auth_password=auth_password)
+            encoded_entries, start = _parse_state_page(result)
+
+            for entry in encoded_entries:
+                yield base64.b64decode(entry["data"])
+
+            if start is None:
+                return
+
+    async def retrieve_supplier(self, supplier_id, auth_user=None,
+                                auth_password=None):
+        """Returns the supplier record with its part links merged in, or
+        None if there is no such supplier, as SupplierBatch.retrieve_suppliers
+        does for each id; one missing id does not fail a gather of many.
+        """
+        address = self._get_address(supplier_id)
+
+        result = await self._send_request(
+            "state/{}".format(address), supplier_id=supplier_id,
+            auth_user=auth_user,
+            auth_password=auth_password,
+            missing_ok=True)
+        supplier = None if result is None else _parse_state(result)
+        if supplier is None:
+            return None
+
+        part_links = [
+            link async for link in self._iter_state(
+                self._get_part_prefix(supplier_id),
+                auth_user=auth_user, auth_password=auth_password)
+        ]
+        try:
+            return _merge_part_links(supplier, part_links)
+        except ValueError as err:
+            raise SupplierException(
+                'Malformed supplier record for {}: {}'.format(
+                    supplier_id, err))
+
+    async def get_status(self, batch_id, wait=DEFAULT_STATUS_WAIT,
+                         auth_user=None, auth_password=None):
+        try:
+            result = await self._send_request(
+                'batch_statuses?id={}&wait={}'.format(batch_id, wait),
+                auth_user=auth_user,
+                auth_password=auth_password)
+            return _parse_status(result)
+        except BaseException as err:
+            raise SupplierException(err)
+
+    async def get_statuses(self, batch_ids, wait=0, auth_user=None,
+                           auth_password=None):
+        return {
+            entry['id']: entry['status']
+            for entry in await self.get_status_entries(
+                batch_ids, wait=wait,
+                auth_user=auth_user, auth_password=auth_password)
+        }
+
+    async def get_status_entries(self, batch_ids, wait=0, auth_user=None,
+                                 auth_password=None):
+        try:
+            # POSTed, as in SupplierBatch.get_status_entries
+            result = await self._send_request(
+                'batch_statuses?wait={}'.format(wait),
+                json.dumps(list(batch_ids)), 'application/json',
+                auth_user=auth_user,
+                auth_password=auth_password)
+            return _parse_status_entries(result)
+        except BaseException as err:
+            raise SupplierException(err)
+
+    async def wait_for_batch(self, batch_id, timeout=DEFAULT_STATUS_WAIT,
+                             auth_user=None, auth_password=None):
+        """Long-polls batch_statuses until the batch leaves PENDING or
+        timeout seconds pass, and returns the last status seen.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = max(int(deadline - time.monotonic()), 0)
+            status = await self.get_status(
+                batch_id, wait=remaining,
+                auth_user=auth_user,
+                auth_password=auth_password)
+            if status != 'PENDING' or remaining == 0:
+                return status
+
+    async def create_supplier_transaction(
+            self, supplier_id, short_id="", supplier_name="", passwd="",
+            supplier_url="", action="", part_id="",
+            auth_user=None, auth_password=None):
+        transaction = self.make_transaction(
+            supplier_id, short_id, supplier_name, passwd, supplier_url,
+            action, part_id)
+
+        batch_list = self._create_batch_list([transaction])
+
+        return await self._send_request(
+            "batches", batch_list.SerializeToString(),
+            'application/octet-stream',
+            auth_user=auth_user,
+            auth_password=auth_password)
+
+    async def submit_many(self, transactions, batch_size=DEFAULT_BATCH_SIZE,
+                          batches_per_list=DEFAULT_BATCHES_PER_LIST,
+                          concurrency=DEFAULT_SUBMIT_CONCURRENCY,
+                          auth_user=None, auth_password=None):
+        """Packs transactions into batches like SupplierBatch.submit_many
+        and POSTs the resulting BatchLists in order, with up to
+        concurrency of them in flight. Returns the batch ids.
+
+        If a POST fails, BatchLists not yet started are dropped and the
+        error is raised.
+        """
+        if batch_size < 1 or batches_per_list < 1:
+            raise SupplierException(
+                'batch_size and batches_per_list must be positive')
+        if concurrency < 1:
+            raise SupplierException('concurrency must be positive')
+
+        transactions = list(transactions)
+        batches = [
+            self.make_batch(transactions[i:i + batch_size])
+            for i in range(0, len(transactions), batch_size)
+        ]
+        batch_lists = [
+            batches[i:i + batches_per_list]
+            for i in range(0, len(batches), batches_per_list)
+        ]
+
+        in_flight = collections.deque()
+        try:
+            for chunk in batch_lists:
+                in_flight.append(asyncio.ensure_future(self._send_request(
+                    "batches",
+                    BatchList(batches=chunk).SerializeToString(),
+                    'application/octet-stream',
+                    auth_user=auth_user,
+                    auth_password=auth_password)))
+                if len(in_flight) >= concurrency:
+                    await in_flight.popleft()
+            while in_flight:
+                await in_flight.popleft()
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            raise
+
+        return [batch.header_signature for batch in batches]
+
+    def _get_session(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._max_concurrency),
+                timeout=self._timeout)
+        return self._session
+
+    async def _send_request(
+            self, suffix, data=None,
+            content_type=None, supplier_id=None, auth_user=None,
+            auth_password=None, missing_ok=False):
+        url = "{}/{}".format(self._base_url, suffix)
+
+        headers = {}
+        if auth_user is not None:
+            headers['Authorization'] = \
+                _basic_auth_header(auth_user, auth_password)
+
+        if content_type is not None:
+            headers['Content-Type'] = content_type
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        session = self._get_session()
+        try:
+            async with self._semaphore:
+                if data is not None:
+                    request = session.post(url, headers=headers, data=data)
+                else:
+                    request = session.get(url, headers=headers)
+
+                async with request as result:
+                    if result.status == 404 and missing_ok:
+                        return None
+
+                    elif result.status == 404:
+                        raise SupplierException(
+                            "No such supplier: {}".format(supplier_id))
+
+                    elif result.status >= 400:
+                        raise SupplierException("Error {}: {}".format(
+                            result.status, result.reason))
+
+                    return await result.text()
+
+        except SupplierException:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            raise SupplierException(err)
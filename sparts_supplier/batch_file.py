@@ -0,0 +1,169 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Files of pre-signed BatchLists, so signing and submitting can happen
+at different times.
+
+A batch file starts with MAGIC and holds one record per BatchList: a
+4-byte big-endian length followed by the serialized BatchList. Records
+are addressed by their byte offset, which is what a failed submission
+reports and what submit_batch_file resumes from:
+
+    with BulkTransactionFactory(private_key) as factory:
+        write_batch_file('load.batches', factory.iter_batch_lists(specs))
+
+    submit_batch_file(client, 'load.batches')
+
+Specs for BulkTransactionFactory can be read from JSON lines, one
+transaction per line, with read_specs.
+"""
+
+import collections
+import json
+import mmap
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from sparts_supplier.exceptions import SupplierException
+
+
+MAGIC = b'SPBATCH1'
+
+# BatchLists POSTed at once by submit_batch_file. Above 1 a later
+# BatchList may overtake an earlier one, such as an AddPart overtaking
+# the create of its supplier, so only raise it when no record depends on
+# an earlier one.
+DEFAULT_CONCURRENCY = 1
+
+_RECORD_HEADER = struct.Struct('>I')
+
+# Keys a JSON line may set; the rest of the spec defaults to "".
+_SPEC_KEYS = frozenset((
+    'supplier_id', 'short_id', 'supplier_name', 'passwd', 'supplier_url',
+    'action', 'part_id', 'part_ids'))
+
+
+def read_specs(lines):
+    """Yields a transaction spec for every non-blank JSON line, e.g.
+    {"action": "AddPart", "supplier_id": "s1", "part_id": "p1"}.
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            spec = json.loads(line)
+        except ValueError as err:
+            raise SupplierException(
+                'Line {}: invalid JSON: {}'.format(number, err))
+        if not isinstance(spec, dict) or not spec.get('action') \
+                or not spec.get('supplier_id'):
+            raise SupplierException(
+                'Line {}: supplier_id and action are required'.format(number))
+        unknown = set(spec) - _SPEC_KEYS
+        if unknown:
+            raise SupplierException('Line {}: unknown keys: {}'.format(
+                number, ', '.join(sorted(unknown))))
+        yield spec
+
+
+def write_batch_file(path, batch_lists):
+    """Writes serialized BatchLists to a new batch file as they arrive and
+    returns how many were written.
+    """
+    count = 0
+    with open(path, 'wb') as out:
+        out.write(MAGIC)
+        for batch_list in batch_lists:
+            out.write(_RECORD_HEADER.pack(len(batch_list)))
+            out.write(batch_list)
+            count += 1
+    return count
+
+
+def iter_batch_file(path, offset=None):
+    """Yields (offset, serialized BatchList) for each record of a batch
+    file, starting at offset.
+
+    The file is memory-mapped, so only the records being submitted are
+    paged in however large it is.
+    """
+    with open(path, 'rb') as fd:
+        if fd.read(len(MAGIC)) != MAGIC:
+            raise SupplierException('Not a batch file: {}'.format(path))
+        if fd.seek(0, 2) == len(MAGIC):
+            return
+        with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            position = len(MAGIC) if offset is None else offset
+            if position < len(MAGIC) or position > len(data):
+                raise SupplierException(
+                    'Offset {} is outside {}'.format(position, path))
+            while position < len(data):
+                start = position + _RECORD_HEADER.size
+                if start > len(data):
+                    raise SupplierException(
+                        'Truncated record at offset {}'.format(position))
+                length, = _RECORD_HEADER.unpack_from(data, position)
+                end = start + length
+                if end > len(data):
+                    raise SupplierException(
+                        'Truncated record at offset {}'.format(position))
+                yield position, data[start:end]
+                position = end
+
+
+def submit_batch_file(client, path, offset=None,
+                      concurrency=DEFAULT_CONCURRENCY, auth_user=None,
+                      auth_password=None, progress=None):
+    """POSTs every record of a batch file from offset on with up to
+    concurrency requests in flight, and returns the number sent.
+
+    If a POST fails, records not yet started are dropped and a
+    SupplierException names the offset to resume from. Resubmitting a
+    batch that was already accepted is harmless; the validator drops
+    duplicate batches. progress, if given, is called with the offset
+    following each record sent.
+    """
+    if concurrency < 1:
+        raise SupplierException('concurrency must be positive')
+
+    sent = 0
+    in_flight = collections.deque()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        records = iter_batch_file(path, offset)
+        while True:
+            for record_offset, batch_list in records:
+                in_flight.append((
+                    record_offset + _RECORD_HEADER.size + len(batch_list),
+                    record_offset,
+                    executor.submit(
+                        client.send_batch_list, batch_list,
+                        auth_user=auth_user, auth_password=auth_password)))
+                if len(in_flight) >= concurrency:
+                    break
+            if not in_flight:
+                return sent
+
+            next_offset, record_offset, future = in_flight.popleft()
+            try:
+                future.result()
+            except SupplierException as err:
+                for _, _, pending in in_flight:
+                    pending.cancel()
+                raise SupplierException(
+                    'Failed to submit record at offset {}, resume from '
+                    'there: {}'.format(record_offset, err))
+            sent += 1
+            if progress is not None:
+                progress(next_offset)
@@ -0,0 +1,181 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import asyncio
+import time
+
+
+COMMITTED = 'COMMITTED'
+INVALID = 'INVALID'
+PENDING = 'PENDING'
+UNKNOWN = 'UNKNOWN'
+
+FINAL_STATUSES = (COMMITTED, INVALID)
+
+# Batch ids per batch_statuses request. They are POSTed as a JSON list,
+# so this only bounds the request body, at about 130 bytes per id.
+DEFAULT_IDS_PER_REQUEST = 1000
+
+# Seconds the REST API may hold each batch_statuses request open.
+DEFAULT_POLL_WAIT = 30
+
+
+class BatchStatusTracker:
+    """Tracks many submitted batches until they are committed or invalid.
+
+    Each poll POSTs the ids of the batches that are still pending to
+    batch_statuses and long-polls for them, so a bulk submit is followed
+    with one request per cycle rather than one per batch:
+
+        tracker = BatchStatusTracker(client.submit_many(transactions))
+        tracker.wait(client, timeout=300)
+        print(tracker.counts())
+
+    wait() drives a SupplierBatch; wait_async() an AsyncSupplierBatch.
+    """
+
+    def __init__(self, batch_ids=(), ids_per_request=DEFAULT_IDS_PER_REQUEST):
+        self._ids_per_request = ids_per_request
+        self._submitted = {}
+        self._statuses = {}
+        self._latencies = {}
+        self._invalid_transactions = {}
+        self.add(batch_ids)
+
+    def add(self, batch_ids, submitted_at=None):
+        """Starts tracking batch_ids, submitted at submitted_at (a
+        time.monotonic() value, defaulting to now).
+        """
+        if submitted_at is None:
+            submitted_at = time.monotonic()
+        for batch_id in batch_ids:
+            self._submitted.setdefault(batch_id, submitted_at)
+            self._statuses.setdefault(batch_id, PENDING)
+
+    @property
+    def statuses(self):
+        return dict(self._statuses)
+
+    @property
+    def latencies(self):
+        """Seconds from submission until each finished batch was first
+        seen committed or invalid.
+        """
+        return dict(self._latencies)
+
+    @property
+    def invalid_transactions(self):
+        """The invalid_transactions the REST API gave for each invalid
+        batch: lists of dicts with the transaction id and a message.
+        """
+        return dict(self._invalid_transactions)
+
+    def pending(self):
+        return [
+            batch_id for batch_id, status in self._statuses.items()
+            if status not in FINAL_STATUSES
+        ]
+
+    def done(self):
+        return not self.pending()
+
+    def counts(self):
+        counts = {COMMITTED: 0, INVALID: 0, PENDING: 0, UNKNOWN: 0}
+        for status in self._statuses.values():
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def poll(self, client, wait=0, auth_user=None, auth_password=None):
+        """Queries the status of every pending batch once. Long-polls take
+        about wait seconds in all, however many requests the pending
+        batches need.
+        """
+        deadline = time.monotonic() + wait
+        chunk_wait = wait
+        for chunk in self._pending_chunks():
+            self._update(client.get_status_entries(
+                chunk, wait=chunk_wait,
+                auth_user=auth_user, auth_password=auth_password))
+            chunk_wait = _poll_wait(wait, deadline)
+        return self.counts()
+
+    def wait(self, client, timeout=None, wait=DEFAULT_POLL_WAIT,
+             auth_user=None, auth_password=None):
+        """Re-polls the pending batches until none are left or timeout
+        seconds pass. Returns the final counts.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.done():
+            poll_wait = _poll_wait(wait, deadline)
+            self.poll(client, wait=poll_wait,
+                      auth_user=auth_user, auth_password=auth_password)
+            # The REST API takes whole seconds, so less than one left would
+            # only re-poll without waiting
+            if deadline is not None and deadline - time.monotonic() < 1:
+                break
+        return self.counts()
+
+    async def poll_async(self, client, wait=0, auth_user=None,
+                         auth_password=None):
+        """Like poll, with the requests for all pending batches in flight
+        at once.
+        """
+        results = await asyncio.gather(*(
+            client.get_status_entries(
+                chunk, wait=wait,
+                auth_user=auth_user, auth_password=auth_password)
+            for chunk in self._pending_chunks()))
+        for entries in results:
+            self._update(entries)
+        return self.counts()
+
+    async def wait_async(self, client, timeout=None, wait=DEFAULT_POLL_WAIT,
+                         auth_user=None, auth_password=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.done():
+            poll_wait = _poll_wait(wait, deadline)
+            await self.poll_async(
+                client, wait=poll_wait,
+                auth_user=auth_user, auth_password=auth_password)
+            # The REST API takes whole seconds, so less than one left would
+            # only re-poll without waiting
+            if deadline is not None and deadline - time.monotonic() < 1:
+                break
+        return self.counts()
+
+    def _pending_chunks(self):
+        pending = self.pending()
+        for i in range(0, len(pending), self._ids_per_request):
+            yield pending[i:i + self._ids_per_request]
+
+    def _update(self, entries):
+        now = time.monotonic()
+        for entry in entries:
+            batch_id = entry['id']
+            status = entry['status']
+            if batch_id not in self._statuses:
+                continue
+            self._statuses[batch_id] = status
+            if status == INVALID:
+                self._invalid_transactions[batch_id] = \
+                    entry.get('invalid_transactions') or []
+            if status in FINAL_STATUSES and batch_id not in self._latencies:
+                self._latencies[batch_id] = now - self._submitted[batch_id]
+
+
+def _poll_wait(wait, deadline):
+    if deadline is None:
+        return wait
+    return max(0, min(wait, int(deadline - time.monotonic())))
@@ -0,0 +1,158 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Parallel construction of signed supplier batches for bulk loads.
+
+Payload hashing and secp256k1 signing are CPU bound, so
+BulkTransactionFactory hands each batch to a process pool and streams
+the signed batches back in submission order:
+
+    factory = BulkTransactionFactory(private_key_hex, workers=8)
+    with factory:
+        for batch_list in factory.iter_batch_lists(specs):
+            client.send_batch_list(batch_list)
+
+Each spec is a dict of SupplierClientBase.make_transaction keyword
+arguments, e.g. {'action': 'AddPart', 'supplier_id': s, 'part_id': p}.
+"""
+
+import collections
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from sparts_supplier.codec import write_varint
+from sparts_supplier.exceptions import SupplierException
+from sparts_supplier.supplier_batch import SupplierClientBase
+from sparts_supplier.supplier_batch import DEFAULT_BATCH_SIZE
+from sparts_supplier.supplier_batch import DEFAULT_BATCHES_PER_LIST
+from sparts_supplier.supplier_batch import FAMILY_VERSION
+
+
+# Batches queued per worker ahead of the one being consumed.
+DEFAULT_PREFETCH = 4
+
+# Field 1 (batches), wire type 2 (length-delimited) of a BatchList.
+_BATCH_LIST_TAG = b'\x0a'
+
+# Transaction builder of the current worker process.
+_worker_client = None
+
+
+def _init_worker(private_key, family_version):
+    global _worker_client
+    _worker_client = SupplierClientBase(
+        '', family_version=family_version, private_key=private_key)
+
+
+def _build_batch(specs):
+    transactions = [
+        _worker_client.make_transaction(**spec) for spec in specs
+    ]
+    batch = _worker_client.make_batch(transactions)
+    return batch.header_signature, batch.SerializeToString()
+
+
+class BulkTransactionFactory:
+    def __init__(self, private_key, workers=None,
+                 batch_size=DEFAULT_BATCH_SIZE,
+                 family_version=FAMILY_VERSION,
+                 prefetch=DEFAULT_PREFETCH):
+        if batch_size < 1:
+            raise SupplierException('batch_size must be positive')
+
+        self._private_key = private_key
+        self._workers = workers or os.cpu_count() or 1
+        self._batch_size = batch_size
+        self._family_version = family_version
+        self._prefetch = max(prefetch, 1)
+        self._executor = None
+
+        # Fail fast on a bad key rather than in every worker
+        SupplierClientBase(
+            '', family_version=family_version, private_key=private_key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def iter_batches(self, specs):
+        """Yields (batch_id, serialized Batch) for every batch_size specs,
+        in the order the specs were given.
+
+        At most workers * prefetch batches are in flight, so memory stays
+        bounded however long the spec stream is.
+        """
+        executor = self._get_executor()
+        window = self._workers * self._prefetch
+        pending = collections.deque()
+
+        specs = iter(specs)
+        while True:
+            chunk = list(itertools.islice(specs, self._batch_size))
+            if chunk:
+                pending.append(executor.submit(_build_batch, chunk))
+            if pending and (len(pending) >= window or not chunk):
+                yield pending.popleft().result()
+            elif not chunk:
+                return
+
+    def iter_batch_lists(self, specs,
+                         batches_per_list=DEFAULT_BATCHES_PER_LIST,
+                         batch_ids=None):
+        """Yields serialized BatchLists of up to batches_per_list batches.
+
+        The BatchList is assembled from the workers' serialized batches
+        directly, without parsing them again. If batch_ids is a list, the
+        id of each batch is appended to it as the batch is produced.
+        """
+        if batches_per_list < 1:
+            raise SupplierException('batches_per_list must be positive')
+
+        chunk = []
+        for batch_id, batch in self.iter_batches(specs):
+            if batch_ids is not None:
+                batch_ids.append(batch_id)
+            chunk.append(batch)
+            if len(chunk) == batches_per_list:
+                yield encode_batch_list(chunk)
+                chunk = []
+        if chunk:
+            yield encode_batch_list(chunk)
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers,
+                initializer=_init_worker,
+                initargs=(self._private_key, self._family_version))
+        return self._executor
+
+
+def encode_batch_list(batches):
+    """Serializes a BatchList from already serialized Batch messages."""
+    out = bytearray()
+    for batch in batches:
+        out += _BATCH_LIST_TAG
+        write_varint(out, len(batch))
+        out += batch
+    return bytes(out)
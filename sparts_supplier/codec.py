@@ -0,0 +1,153 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Encoding of supplier records in state.
+
+Family version 1.0 stores a record as "<supplier_id>," followed by the
+record as JSON. Later versions use a versioned binary layout:
+
+    0x00 <codec version>
+    varint-prefixed UTF-8 supplier_id, short_id, supplier_name, passwd,
+    supplier_url
+    varint part count, varint byte length, part ids joined by 0x00
+
+A legacy record always starts with its supplier id, which the handler
+requires to be non-empty and free of control characters, so a leading NUL
+byte tells the two apart. decode_supplier reads both.
+"""
+
+import json
+
+
+MAGIC = b'\x00'
+
+# Codec version written by encode_supplier.
+BINARY_V1 = 1
+
+_FIELDS = ('supplier_id', 'short_id', 'supplier_name', 'passwd',
+           'supplier_url')
+
+_PART_SEPARATOR = b'\x00'
+
+
+class CodecError(ValueError):
+    pass
+
+
+def encode_supplier(supplier):
+    """Encodes a supplier record dict with the current binary codec."""
+    out = bytearray(MAGIC)
+    out.append(BINARY_V1)
+
+    for field in _FIELDS:
+        write_bytes(out, supplier[field].encode('utf-8'))
+
+    part_ids = [part['part_id'].encode('utf-8')
+                for part in supplier['parts']]
+    joined = _PART_SEPARATOR.join(part_ids)
+    if joined.count(_PART_SEPARATOR) != max(len(part_ids) - 1, 0):
+        raise CodecError('Part IDs may not contain NUL characters')
+
+    write_varint(out, len(part_ids))
+    write_bytes(out, joined)
+
+    return bytes(out)
+
+
+def encode_legacy_supplier(supplier):
+    """Encodes a supplier record in the family version 1.0 layout."""
+    return ",".join([supplier['supplier_id'], json.dumps(supplier)]).encode()
+
+
+def decode_supplier(data):
+    """Decodes a supplier record written by either codec into a dict with
+    the supplier fields and a 'parts' list of {'part_id': ...} dicts.
+    """
+    if not data.startswith(MAGIC):
+        return _decode_legacy(data)
+
+    if len(data) < 2 or data[1] != BINARY_V1:
+        raise CodecError('Unknown supplier codec version')
+
+    view = memoryview(data)
+    offset = 2
+    supplier = {}
+    try:
+        for field in _FIELDS:
+            value, offset = read_bytes(view, offset)
+            supplier[field] = value.decode('utf-8')
+
+        count, offset = read_varint(view, offset)
+        joined, offset = read_bytes(view, offset)
+        part_ids = joined.decode('utf-8').split('\x00') if count else []
+    except IndexError:
+        raise CodecError('Truncated supplier record')
+    except UnicodeDecodeError as err:
+        raise CodecError('Malformed supplier record: {}'.format(err))
+
+    supplier['parts'] = [{'part_id': part_id} for part_id in part_ids]
+
+    if len(supplier['parts']) != count:
+        raise CodecError('Corrupt supplier part list')
+
+    return supplier
+
+
+def _decode_legacy(data):
+    try:
+        _, stored_supplier = data.decode().split(",", 1)
+        return json.loads(stored_supplier)
+    except ValueError as err:
+        raise CodecError('Malformed supplier record: {}'.format(err))
+
+
+def write_varint(out, value):
+    """Appends value to the bytearray out as a base-128 varint."""
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def write_bytes(out, value):
+    """Appends value to out, prefixed by its length as a varint."""
+    write_varint(out, len(value))
+    out += value
+
+
+def read_varint(view, offset):
+    """Returns the varint at offset in view and the offset after it.
+    Raises IndexError if view ends first.
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = view[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def read_bytes(view, offset):
+    """Returns the length-prefixed bytes at offset in view and the offset
+    after them. Raises IndexError if view ends first.
+    """
+    length, offset = read_varint(view, offset)
+    end = offset + length
+    if end > len(view):
+        raise IndexError(end)
+    return bytes(view[offset:end]), end
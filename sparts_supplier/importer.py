@@ -0,0 +1,377 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Streaming bulk import of suppliers and supplier-part links.
+
+Rows come from CSV (with a header line) or JSON lines and use the
+transaction field names: supplier_id, short_id, supplier_name, passwd,
+supplier_url, part_id and optionally action. A row without an action is
+a create, or an AddPart if it has a part_id. Consecutive AddPart rows
+for the same supplier are folded into one AddParts transaction.
+
+Rows are checked with the processor's validate_transaction, so a row the
+processor would reject is reported instead of submitted. Valid rows are
+signed by a BulkTransactionFactory and the BatchLists are POSTed in file
+order while the next ones are being signed; at no point is more than a
+few BatchLists of the file held in memory:
+
+    with SupplierImporter(client, private_key) as importer:
+        report = importer.run(read_rows(open('suppliers.csv'), 'csv'))
+
+The chain applies a batch all or nothing, so a row it rejects, such as a
+create with a short_id already in use, takes the other rows of its batch
+down with it. run() only knows the batches were accepted for
+submission, and the report's status is 'submitted'. Passing the final
+batch statuses to ImportReport.add_batch_statuses adds every row of an
+invalid batch to the errors:
+
+    tracker = BatchStatusTracker(report.batch_ids)
+    tracker.wait(client, timeout=300)
+    report.add_batch_statuses(tracker)
+"""
+
+import collections
+import csv
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sawtooth_sdk.processor.exceptions import InvalidTransaction
+
+from sparts_supplier.batch_status import INVALID
+from sparts_supplier.batch_status import PENDING
+from sparts_supplier.batch_status import UNKNOWN
+from sparts_supplier.bulk import BulkTransactionFactory
+from sparts_supplier.exceptions import SupplierException
+from sparts_supplier.processor.handler import validate_transaction
+from sparts_supplier.supplier_batch import DEFAULT_BATCH_SIZE
+from sparts_supplier.supplier_batch import DEFAULT_BATCHES_PER_LIST
+from sparts_supplier.supplier_batch import FAMILY_VERSION
+from sparts_supplier.supplier_batch import MAX_PARTS_PER_TRANSACTION
+
+
+# Part IDs folded into a single AddParts transaction.
+DEFAULT_PARTS_PER_TRANSACTION = 100
+
+# BatchLists POSTed at once. Above 1 a later BatchList may overtake an
+# earlier one, so only raise it when no row depends on an earlier row.
+DEFAULT_MAX_IN_FLIGHT = 1
+
+# Seconds between progress callbacks.
+PROGRESS_INTERVAL = 1.0
+
+# Errors kept in the report; the rest are only counted.
+MAX_REPORTED_ERRORS = 100
+
+FIELDS = ('supplier_id', 'short_id', 'supplier_name', 'passwd',
+          'supplier_url', 'action', 'part_id')
+
+
+def read_rows(lines, fmt):
+    """Yields (line number, row dict) from CSV or JSON lines."""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    if fmt != 'jsonl':
+        raise SupplierException('Unknown import format: {}'.format(fmt))
+
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as err:
+            row = err
+        yield number, row
+
+
+def detect_format(filename):
+    if filename.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return 'csv'
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.invalid_rows = 0
+        self.transactions = 0
+        self.batch_lists = 0
+        self.failed_batch_lists = 0
+        # Rows in batches that failed to submit or were rejected on chain
+        self.failed_rows = 0
+        self.errors = []
+        self.error_count = 0
+        self.batch_ids = []
+        # [first, last] line ranges of the rows in each batch
+        self.batch_rows = {}
+        # Batch status counts, once add_batch_statuses has been called
+        self.batches = None
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def add_batch_error(self, batch_id, message):
+        """Adds every row of a batch to the errors."""
+        for first, last in self.batch_rows.get(batch_id, ()):
+            for line in range(first, last + 1):
+                self.failed_rows += 1
+                self.add_error(line, message)
+
+    def add_batch_statuses(self, tracker):
+        """Records the batch statuses a BatchStatusTracker of batch_ids
+        ended with, and adds every row of an invalid batch to the errors,
+        with the messages the REST API gave for it.
+        """
+        self.batches = tracker.counts()
+        statuses = tracker.statuses
+        invalid_transactions = tracker.invalid_transactions
+        for batch_id in self.batch_ids:
+            if statuses.get(batch_id) != INVALID:
+                continue
+            messages = [
+                transaction['message']
+                for transaction in invalid_transactions.get(batch_id, ())
+                if transaction.get('message')
+            ]
+            message = 'Rejected on chain with the rest of its batch'
+            if messages:
+                message += ': ' + '; '.join(messages)
+            self.add_batch_error(batch_id, message)
+
+    @property
+    def status(self):
+        """'failed' if any row was not imported, 'submitted' if the batch
+        statuses were not checked, 'pending' if some batches were not
+        final yet when they were, else 'success'.
+        """
+        if self.error_count:
+            return 'failed'
+        if self.batches is None:
+            return 'submitted'
+        if self.batches[PENDING] or self.batches[UNKNOWN]:
+            return 'pending'
+        return 'success'
+
+    def as_dict(self):
+        result = {
+            'status': self.status,
+            'rows': self.rows,
+            'invalid_rows': self.invalid_rows,
+            'failed_rows': self.failed_rows,
+            'transactions': self.transactions,
+            'batch_lists': self.batch_lists,
+            'failed_batch_lists': self.failed_batch_lists,
+            'elapsed': round(self.elapsed, 3),
+            'rows_per_sec': round(self.rows_per_sec, 1),
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+        if self.batches is not None:
+            result['batches'] = self.batches
+        return result
+
+
+class SupplierImporter:
+    def __init__(self, client, private_key, workers=None,
+                 batch_size=DEFAULT_BATCH_SIZE,
+                 batches_per_list=DEFAULT_BATCHES_PER_LIST,
+                 parts_per_transaction=DEFAULT_PARTS_PER_TRANSACTION,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 family_version=FAMILY_VERSION,
+                 auth_user=None, auth_password=None):
+        if max_in_flight < 1:
+            raise SupplierException('max_in_flight must be positive')
+        if parts_per_transaction > MAX_PARTS_PER_TRANSACTION:
+            raise SupplierException(
+                'parts_per_transaction may be at most {}'.format(
+                    MAX_PARTS_PER_TRANSACTION))
+
+        self._client = client
+        self._factory = BulkTransactionFactory(
+            private_key, workers=workers, batch_size=batch_size,
+            family_version=family_version)
+        self._batch_size = batch_size
+        self._batches_per_list = batches_per_list
+        self._family_version = family_version
+        self._max_in_flight = max_in_flight
+        self._auth_user = auth_user
+        self._auth_password = auth_password
+
+        # AddParts only exists from family version 1.1 on
+        if family_version == '1.0':
+            parts_per_transaction = 1
+        self._parts_per_transaction = max(parts_per_transaction, 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def close(self):
+        self._factory.close()
+
+    def run(self, rows, progress=None):
+        """Imports (line number, row) pairs and returns an ImportReport.
+
+        progress, if given, is called with the report about once every
+        PROGRESS_INTERVAL seconds.
+        """
+        report = ImportReport()
+        # Line ranges of the rows of every batch not yet signed
+        batch_rows = collections.deque()
+        batch_ids = report.batch_ids
+        specs = self._iter_specs(rows, report, batch_rows)
+
+        in_flight = collections.deque()
+        listed = 0
+        next_progress = time.monotonic() + PROGRESS_INTERVAL
+        with ThreadPoolExecutor(max_workers=self._max_in_flight) as executor:
+            for batch_list in self._factory.iter_batch_lists(
+                    specs, self._batches_per_list, batch_ids):
+                list_ids = batch_ids[listed:]
+                listed = len(batch_ids)
+                for batch_id in list_ids:
+                    report.batch_rows[batch_id] = batch_rows.popleft()
+
+                in_flight.append((list_ids, executor.submit(
+                    self._client.send_batch_list, batch_list,
+                    auth_user=self._auth_user,
+                    auth_password=self._auth_password)))
+                report.batch_lists += 1
+
+                while len(in_flight) >= self._max_in_flight:
+                    self._finish(in_flight.popleft(), report)
+
+                if progress is not None and \
+                        time.monotonic() >= next_progress:
+                    report.elapsed = time.monotonic() - report.started
+                    progress(report)
+                    next_progress = time.monotonic() + PROGRESS_INTERVAL
+
+            while in_flight:
+                self._finish(in_flight.popleft(), report)
+
+        report.elapsed = time.monotonic() - report.started
+        return report
+
+    def _finish(self, submission, report):
+        list_ids, future = submission
+        try:
+            future.result()
+        except SupplierException as err:
+            report.failed_batch_lists += 1
+            for batch_id in list_ids:
+                report.add_batch_error(
+                    batch_id, 'Failed to submit: {}'.format(err))
+
+    def _iter_specs(self, rows, report, batch_rows):
+        pending = None
+        pending_lines = None
+        count = 0
+        for line, row in rows:
+            report.rows += 1
+            try:
+                spec = self._make_spec(row)
+            except (InvalidTransaction, SupplierException) as err:
+                report.invalid_rows += 1
+                report.add_error(line, str(err))
+                continue
+
+            if pending is not None and spec['action'] == 'AddPart' \
+                    and spec['supplier_id'] == pending['supplier_id'] \
+                    and len(pending['part_ids']) < \
+                    self._parts_per_transaction:
+                pending['part_ids'].append(spec['part_id'])
+                pending_lines.append(line)
+                continue
+
+            if pending is not None:
+                count = self._emit(count, pending_lines, batch_rows)
+                report.transactions += 1
+                yield pending
+                pending = None
+
+            if spec['action'] == 'AddPart' \
+                    and self._parts_per_transaction > 1:
+                pending = {'action': 'AddParts',
+                           'supplier_id': spec['supplier_id'],
+                           'part_ids': [spec['part_id']]}
+                pending_lines = [line]
+                continue
+
+            count = self._emit(count, [line], batch_rows)
+            report.transactions += 1
+            yield spec
+
+        if pending is not None:
+            self._emit(count, pending_lines, batch_rows)
+            report.transactions += 1
+            yield pending
+
+    def _emit(self, count, lines, batch_rows):
+        # Every batch_size transactions make a batch
+        if count % self._batch_size == 0:
+            batch_rows.append([])
+        ranges = batch_rows[-1]
+        for line in lines:
+            if ranges and ranges[-1][1] == line - 1:
+                ranges[-1][1] = line
+            else:
+                ranges.append([line, line])
+        return count + 1
+
+    def _make_spec(self, row):
+        if not isinstance(row, dict):
+            raise SupplierException('Invalid row: {}'.format(row))
+
+        part_ids = row.get('part_ids')
+        spec = {key: _field(row, key) for key in FIELDS}
+        if not spec['action']:
+            spec['action'] = 'AddPart' if spec['part_id'] else 'create'
+
+        validate_transaction(
+            spec['supplier_id'], spec['short_id'], spec['supplier_name'],
+            spec['passwd'], spec['supplier_url'], spec['action'],
+            spec['part_id'], self._family_version, part_ids)
+
+        if self._family_version == '1.0':
+            # 1.0 payloads are comma-separated
+            if any(',' in value for value in spec.values()):
+                raise SupplierException('Fields may not contain commas')
+        elif any('\x00' in part_id
+                 for part_id in (part_ids or [spec['part_id']])):
+            raise SupplierException('Part IDs may not contain NUL characters')
+
+        if part_ids is not None:
+            spec['part_ids'] = list(part_ids)
+        return spec
+
+
+def _field(row, key):
+    value = row.get(key)
+    return "" if value is None else str(value).strip()
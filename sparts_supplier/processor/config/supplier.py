@@ -0,0 +1,184 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import collections
+import logging
+import os
+
+import toml
+
+from sawtooth_sdk.processor.exceptions import LocalConfigurationError
+
+from sparts_supplier.processor.record_cache import DEFAULT_CACHE_SIZE
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Seconds the supervisor waits before restarting a crashed worker.
+DEFAULT_RESTART_DELAY = 1.0
+
+
+def load_default_supplier_config():
+    """Returns the default SupplierConfig."""
+    return SupplierConfig(
+        connect='tcp://localhost:4004',
+        workers=1,
+        cache_size=DEFAULT_CACHE_SIZE,
+        metrics_host='127.0.0.1',
+        restart_delay=DEFAULT_RESTART_DELAY)
+
+
+def load_toml_supplier_config(filename):
+    """Returns a SupplierConfig created by loading a TOML file from the
+    filesystem.
+
+    Args:
+        filename (string): The name of the file to load the config from
+
+    Returns:
+        config (SupplierConfig): The SupplierConfig created from the stored
+            toml file.
+
+    Raises:
+        LocalConfigurationError
+    """
+    if not os.path.exists(filename):
+        LOGGER.info(
+            "Skipping transaction processor config loading from non-existent"
+            " config file: %s", filename)
+        return SupplierConfig()
+
+    LOGGER.info("Loading transaction processor information from config: %s",
+                filename)
+
+    try:
+        with open(filename) as fd:
+            raw_config = fd.read()
+    except IOError as e:
+        raise LocalConfigurationError(
+            "Unable to load transaction processor configuration file:"
+            " {}".format(str(e)))
+
+    try:
+        toml_config = toml.loads(raw_config)
+    except toml.TomlDecodeError as e:
+        raise LocalConfigurationError(
+            "Unable to parse {}: {}".format(filename, str(e)))
+
+    invalid_keys = set(toml_config.keys()).difference(SupplierConfig.KEYS)
+    if invalid_keys:
+        raise LocalConfigurationError(
+            "Invalid keys in transaction processor config: "
+            "{}".format(", ".join(sorted(list(invalid_keys)))))
+
+    return SupplierConfig(**toml_config)
+
+
+def merge_supplier_config(configs):
+    """Given a list of SupplierConfig objects, merges them into a single
+    SupplierConfig, giving priority in the order of the configs
+    (first has highest priority).
+
+    Args:
+        config (list of SupplierConfig): The list of SupplierConfig objects
+            to merge together.
+
+    Returns:
+        config (SupplierConfig): The merged SupplierConfig.
+    """
+    merged = {}
+    for key in SupplierConfig.KEYS:
+        for config in configs:
+            value = getattr(config, key)
+            if value is not None:
+                merged[key] = value
+                break
+
+    return SupplierConfig(**merged)
+
+
+class SupplierConfig:
+    """Settings of the supplier transaction processor. Any of them may be
+    None, meaning unset at this level of configuration.
+
+    connect: validator endpoint
+    workers: processor processes to run under the supervisor
+    cache_size: decoded records kept by each handler's record cache
+    metrics_host, metrics_port: metrics endpoint of the first worker;
+        worker N listens on metrics_port + N
+    restart_delay: seconds before a crashed worker is restarted
+    """
+
+    KEYS = ('connect', 'workers', 'cache_size', 'metrics_host',
+            'metrics_port', 'restart_delay')
+
+    def __init__(self, connect=None, workers=None, cache_size=None,
+                 metrics_host=None, metrics_port=None, restart_delay=None):
+        self._connect = connect
+        self._workers = _checked('workers', workers, 1)
+        self._cache_size = _checked('cache_size', cache_size, 0)
+        self._metrics_host = metrics_host
+        self._metrics_port = _checked('metrics_port', metrics_port, 0)
+        self._restart_delay = _checked(
+            'restart_delay', restart_delay, 0, (int, float))
+
+    @property
+    def connect(self):
+        return self._connect
+
+    @property
+    def workers(self):
+        return self._workers
+
+    @property
+    def cache_size(self):
+        return self._cache_size
+
+    @property
+    def metrics_host(self):
+        return self._metrics_host
+
+    @property
+    def metrics_port(self):
+        return self._metrics_port
+
+    @property
+    def restart_delay(self):
+        return self._restart_delay
+
+    def __repr__(self):
+        return "{}({})".format(
+            self.__class__.__name__,
+            ", ".join("{}={}".format(key, repr(getattr(self, key)))
+                      for key in self.KEYS))
+
+    def to_dict(self):
+        return collections.OrderedDict(
+            (key, getattr(self, key)) for key in self.KEYS
+            if getattr(self, key) is not None)
+
+    def to_toml_string(self):
+        return str(toml.dumps(self.to_dict())).strip().split('\n')
+
+
+def _checked(name, value, minimum, types=(int,)):
+    if value is None:
+        return value
+    if isinstance(value, bool) or not isinstance(value, types) \
+            or value < minimum:
+        raise LocalConfigurationError(
+            "{} must be a number no less than {}, not {!r}".format(
+                name, minimum, value))
+    return value
@@ -14,24 +14,63 @@
 # ------------------------------------------------------------------------------
 
 
-import hashlib
 import logging
 import json
+import re
 from collections import OrderedDict
 
 from sawtooth_sdk.processor.handler import TransactionHandler
 from sawtooth_sdk.processor.exceptions import InvalidTransaction
 from sawtooth_sdk.processor.exceptions import InternalError
 
+from sparts_supplier import addressing
+from sparts_supplier import codec
+from sparts_supplier.processor.record_cache import DEFAULT_CACHE_SIZE
+from sparts_supplier.processor.record_cache import SupplierRecordCache
+from sparts_supplier.processor.record_cache import copy_supplier
+
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+SUPPLIER_NAMESPACE = addressing.NAMESPACE
+
+PART_NAMESPACE = addressing.PART_NAMESPACE
+
+SHORT_ID_NAMESPACE = addressing.SHORT_ID_NAMESPACE
+
+# A 1.0 record starts with the supplier id, and codec tells it from a
+# binary record by its first byte, so ids may not contain these.
+_CONTROL_CHARACTERS = re.compile('[\x00-\x1f\x7f]')
+
+# Part IDs one AddParts transaction may carry. The handler reads the link
+# address of each, so this bounds the state reads of a transaction.
+MAX_PART_IDS = 1000
+
+
 class SupplierTransactionHandler(TransactionHandler):
 
-    def __init__(self, namespace_prefix):
+    def __init__(self, namespace_prefix=SUPPLIER_NAMESPACE,
+                 part_namespace_prefix=PART_NAMESPACE,
+                 cache_size=DEFAULT_CACHE_SIZE,
+                 short_id_namespace_prefix=SHORT_ID_NAMESPACE):
         self._namespace_prefix = namespace_prefix
+        self._part_namespace_prefix = part_namespace_prefix
+        self._short_id_namespace_prefix = short_id_namespace_prefix
+        self._record_cache = SupplierRecordCache(cache_size)
+        self._last_action = None
+
+    @property
+    def record_cache(self):
+        return self._record_cache
+
+    @property
+    def last_action(self):
+        """Action of the payload the last apply parsed, or None if it
+        could not be parsed.
+        """
+        return self._last_action
 
     @property
     def family_name(self):
@@ -39,44 +78,56 @@ class SupplierTransactionHandler(TransactionHandler):
 
     @property
     def family_versions(self):
-        return ['1.0']
+        return ['1.0', '1.1']
 
     @property
     def encodings(self):
-        return ['csv-utf8']
+        # Family version 1.0 payloads are CSV, 1.1 payloads JSON
+        return ['csv-utf8', 'json-utf8']
 
     @property
     def namespaces(self):
-        return [self._namespace_prefix]
+        return [self._namespace_prefix, self._part_namespace_prefix,
+                self._short_id_namespace_prefix]
 
     def apply(self, transaction, context):
 
         header = transaction.header
 
         self._context = context
+        self._last_action = None
         stored_supplier = ""
-        try:
-            supplier_id,short_id,supplier_name,passwd,supplier_url,action,part_id = transaction.payload.decode().split(",")
-        except ValueError:
-            raise InvalidTransaction("Invalid payload serialization")
+        supplier_id,short_id,supplier_name,passwd,supplier_url,action,part_id,part_ids = \
+            parse_payload(transaction.payload, header.family_version)
+        self._last_action = action
 
-        validate_transaction(supplier_id,short_id,supplier_name,passwd,supplier_url,action,part_id)
+        validate_transaction(supplier_id,short_id,supplier_name,passwd,supplier_url,action,part_id,
+                             header.family_version, part_ids)
                
         data_address = make_supplier_address(self._namespace_prefix,supplier_id)
+
+        if header.family_version == '1.1' and action == "AddPart":
+            self._add_part_links(data_address, supplier_id, [part_id])
+            return
+
+        if action == "AddParts":
+            self._add_part_links(data_address, supplier_id, part_ids)
+            return
+
+        if header.family_version == '1.1' and action == "create" \
+                and short_id:
+            self._create_indexed(data_address, supplier_id, short_id,
+                                 supplier_name, passwd, supplier_url)
+            return
         
         state_entries = self._context.get_state(
                 [data_address])
           
       
         if len(state_entries) != 0:
-            try:
-                   
-                    stored_supplier_id, stored_supplier = \
-                    state_entries[0].data.decode().split(",",1)
-                             
-                    stored_supplier = json.loads(stored_supplier)
-            except ValueError:
-                raise InternalError("Failed to deserialize data.")
+            stored_supplier, stored_part_ids = \
+                self._decode_supplier(data_address, state_entries[0].data)
+            stored_supplier_id = stored_supplier['supplier_id']
             
         else:
             stored_supplier_id = stored_supplier = None
@@ -84,6 +135,15 @@ class SupplierTransactionHandler(TransactionHandler):
       
         if action == "create" and stored_supplier_id is not None:
             raise InvalidTransaction("Invalid Action-supplier already exists.")
+
+        if action == "MigrateParts":
+            if stored_supplier_id is None:
+                raise InvalidTransaction(
+                    "Invalid Action-supplier does not exist.")
+            self._migrate_parts(data_address, stored_supplier_id,
+                                stored_supplier, header.family_version,
+                                short_id)
+            return
                
            
         if action == "create":
@@ -95,16 +155,119 @@ class SupplierTransactionHandler(TransactionHandler):
         
            
         if action == "AddPart":
-            if part_id not in stored_supplier:
-                supplier = add_part(part_id,stored_supplier)
-                stored_supplier = supplier  
+            if stored_supplier_id is None:
+                raise InvalidTransaction(
+                    "Invalid Action-supplier does not exist.")
+            if part_id in stored_part_ids:
+                # Nothing changes, so leave state untouched
+                return
+            supplier = add_part(part_id,copy_supplier(stored_supplier))
+            stored_supplier = supplier  
             
         # Put data back in state storage
-        stored_supp_json = json.dumps(stored_supplier)
-        data=",".join([stored_supplier_id, stored_supp_json]).encode()
+        data = encode_supplier_record(stored_supplier, header.family_version)
        
         self._context.set_state(
             {data_address: data})
+
+    def _create_indexed(self, data_address, supplier_id, short_id,
+                        supplier_name, passwd, supplier_url):
+        # Reads the supplier and its short_id entry together, so a unique
+        # create still costs one get_state and one set_state.
+        short_id_address = make_short_id_address(
+            self._short_id_namespace_prefix, short_id)
+        state_entries = self._context.get_state(
+            [data_address, short_id_address])
+        addresses = {entry.address for entry in state_entries}
+
+        if data_address in addresses:
+            raise InvalidTransaction("Invalid Action-supplier already exists.")
+        if short_id_address in addresses:
+            raise InvalidTransaction(
+                "Invalid Action-short_id already in use.")
+
+        supplier = create_supplier(
+            supplier_id, short_id, supplier_name, passwd, supplier_url)
+        data = encode_supplier_record(supplier, '1.1')
+        self._context.set_state({
+            data_address: data,
+            short_id_address: encode_short_id_link(supplier_id, data_address),
+        })
+        _display("Created a supplier.")
+
+    def _decode_supplier(self, address, data):
+        try:
+            return self._record_cache.get(address, data)
+        except (ValueError, KeyError):
+            raise InternalError("Failed to deserialize data.")
+
+    def _add_part_links(self, data_address, supplier_id, part_ids):
+        part_addresses = OrderedDict(
+            (make_part_address(
+                self._part_namespace_prefix, supplier_id, part_id), part_id)
+            for part_id in part_ids)
+
+        state_entries = self._context.get_state(
+            [data_address] + list(part_addresses))
+        entries = {entry.address: entry.data for entry in state_entries}
+
+        if data_address not in entries:
+            raise InvalidTransaction("Invalid Action-supplier does not exist.")
+
+        new_links = OrderedDict(
+            (address, part_id)
+            for address, part_id in part_addresses.items()
+            if address not in entries)
+        if not new_links:
+            return
+
+        # Records written by 1.0 may still hold the part inline
+        _, inline_part_ids = \
+            self._decode_supplier(data_address, entries[data_address])
+
+        updates = {
+            address: encode_part_link(part_id)
+            for address, part_id in new_links.items()
+            if part_id not in inline_part_ids
+        }
+        if updates:
+            self._context.set_state(updates)
+
+    def _migrate_parts(self, data_address, supplier_id, stored_supplier,
+                       family_version, short_id):
+        updates = {}
+        if short_id:
+            # Gives a supplier created by 1.0, which never wrote one, its
+            # short_id entry. 1.0 creates do not check the entries, so
+            # another supplier may hold the short_id already.
+            if short_id != stored_supplier['short_id']:
+                raise InvalidTransaction(
+                    "Invalid Action-short_id does not match the supplier.")
+            short_id_address = make_short_id_address(
+                self._short_id_namespace_prefix, short_id)
+            state_entries = self._context.get_state([short_id_address])
+            if not state_entries:
+                updates[short_id_address] = \
+                    encode_short_id_link(supplier_id, data_address)
+            elif json.loads(state_entries[0].data.decode())[
+                    'supplier_id'] != supplier_id:
+                raise InvalidTransaction(
+                    "Invalid Action-short_id already in use.")
+
+        for part in stored_supplier['parts']:
+            part_address = make_part_address(
+                self._part_namespace_prefix, supplier_id, part['part_id'])
+            updates[part_address] = encode_part_link(part['part_id'])
+
+        if not updates:
+            return
+
+        if stored_supplier['parts']:
+            stored_supplier = dict(stored_supplier, parts=[])
+            updates[data_address] = \
+                encode_supplier_record(stored_supplier, family_version)
+
+        self._context.set_state(updates)
         
 
 
@@ -122,19 +285,99 @@ def create_supplier(supplier_id,short_id,supplier_name,passwd,supplier_url):
          
 
 
-def validate_transaction( supplier_id,short_id,supplier_name,passwd,supplier_url,action,part_id):
+def parse_payload(payload, family_version):
+    # 1.0 payloads are comma-separated; later versions send a JSON object
+    # so an AddParts payload can carry a list of part ids.
+    if family_version == '1.0':
+        try:
+            supplier_id,short_id,supplier_name,passwd,supplier_url,action,part_id = payload.decode().split(",")
+        except ValueError:
+            raise InvalidTransaction("Invalid payload serialization")
+        return supplier_id,short_id,supplier_name,passwd,supplier_url,action,part_id,None
+
+    try:
+        data = json.loads(payload.decode())
+        fields = tuple(
+            str(data.get(key) or "")
+            for key in ('supplier_id', 'short_id', 'supplier_name',
+                        'passwd', 'supplier_url', 'action', 'part_id'))
+        part_ids = data.get('part_ids')
+    except (ValueError, AttributeError):
+        raise InvalidTransaction("Invalid payload serialization")
+
+    return fields + (part_ids,)
+
+
+def validate_transaction( supplier_id,short_id,supplier_name,passwd,supplier_url,action,part_id,
+                          family_version='1.0', part_ids=None):
     if not supplier_id:
         raise InvalidTransaction('Supplier ID is required') 
+    if _CONTROL_CHARACTERS.search(supplier_id):
+        raise InvalidTransaction(
+            'Supplier ID may not contain control characters')
     if not action:
         raise InvalidTransaction('Action is required')
 
-    if action not in ('create',"AddPart"):
+    actions = ('create', "AddPart")
+    if family_version == '1.1':
+        actions += ("AddParts", "MigrateParts")
+
+    if action not in actions:
         raise InvalidTransaction('Invalid action: {}'.format(action))
 
+    if action == "AddPart" and family_version == '1.1' and not part_id:
+        raise InvalidTransaction('Part ID is required')
+
+    if action == "AddParts":
+        if not isinstance(part_ids, list) or not part_ids:
+            raise InvalidTransaction('Part IDs are required')
+        if len(part_ids) > MAX_PART_IDS:
+            raise InvalidTransaction(
+                'At most {} Part IDs per transaction'.format(MAX_PART_IDS))
+        if not all(isinstance(p, str) and p for p in part_ids):
+            raise InvalidTransaction('Invalid part ID in Part IDs')
+
     
+# The hashed part of each address comes from sparts_supplier.addressing,
+# which memoizes it; only the namespace prefix is swapped in here.
 def make_supplier_address(namespace_prefix, supplier_id):
     return namespace_prefix + \
-        hashlib.sha512(supplier_id.encode('utf-8')).hexdigest()[:64]
+        addressing.make_supplier_address(supplier_id)[6:]
+
+
+def make_part_prefix(part_namespace_prefix, supplier_id):
+    return part_namespace_prefix + \
+        addressing.make_part_prefix(supplier_id)[6:]
+
+
+def make_part_address(part_namespace_prefix, supplier_id, part_id):
+    return part_namespace_prefix + \
+        addressing.make_part_address(supplier_id, part_id)[6:]
+
+
+def make_short_id_address(short_id_namespace_prefix, short_id):
+    return short_id_namespace_prefix + \
+        addressing.make_short_id_address(short_id)[6:]
+
+
+def encode_supplier_record(supplier, family_version):
+    # Records written by 1.0 transactions keep the original CSV+JSON layout
+    # so processors that predate the binary codec still agree on state.
+    if family_version == '1.0':
+        return codec.encode_legacy_supplier(supplier)
+    try:
+        return codec.encode_supplier(supplier)
+    except codec.CodecError as err:
+        raise InvalidTransaction(str(err))
+
+
+def encode_part_link(part_id):
+    return json.dumps({'part_id': part_id}).encode()
+
+
+def encode_short_id_link(supplier_id, address):
+    return json.dumps(
+        {'supplier_id': supplier_id, 'address': address}).encode()
 
 
 
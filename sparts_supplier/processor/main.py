@@ -17,15 +17,29 @@
 import sys
 import os
 import argparse
+import signal
 import pkg_resources
 
 from sawtooth_sdk.processor.core import TransactionProcessor
+from sawtooth_sdk.processor.exceptions import LocalConfigurationError
 from sawtooth_sdk.processor.log import init_console_logging
 from sawtooth_sdk.processor.log import log_configuration
 from sawtooth_sdk.processor.config import get_log_config
 from sawtooth_sdk.processor.config import get_log_dir
 from sawtooth_sdk.processor.config import get_config_dir
+from sparts_supplier.processor.config.supplier import \
+    load_default_supplier_config
+from sparts_supplier.processor.config.supplier import \
+    load_toml_supplier_config
+from sparts_supplier.processor.config.supplier import merge_supplier_config
+from sparts_supplier.processor.config.supplier import SupplierConfig
 from sparts_supplier.processor.handler import SupplierTransactionHandler
+from sparts_supplier.processor.metrics import InstrumentedHandler
+from sparts_supplier.processor.metrics import ProcessorMetrics
+from sparts_supplier.processor.metrics import start_metrics_server
+from sparts_supplier.processor.profiling import DEFAULT_PROFILE_CALLS
+from sparts_supplier.processor.profiling import ProfilingHandler
+from sparts_supplier.processor.supervisor import Supervisor
 
 
 DISTRIBUTION_NAME = 'sparts-supplier'
@@ -39,11 +53,45 @@ def parse_args(args):
         '-C', '--connect',
         help='Endpoint for the validator connection')
 
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        help='Number of processor processes to run (default: 1)')
+
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        help='Decoded supplier records cached by each worker')
+
     parser.add_argument('-v', '--verbose',
                         action='count',
                         default=0,
                         help='Increase output sent to stderr')
 
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        help='Serve Prometheus metrics on this port (disabled by default);'
+        ' worker N listens on this port + N')
+
+    parser.add_argument(
+        '--metrics-host',
+        help='Interface the metrics endpoint listens on '
+        '(default: 127.0.0.1)')
+
+    parser.add_argument(
+        '--profile',
+        type=int,
+        nargs='?',
+        const=DEFAULT_PROFILE_CALLS,
+        metavar='N',
+        help='Profile the first N apply calls (default: {}); SIGUSR1 '
+        'profiles the next N at any time'.format(DEFAULT_PROFILE_CALLS))
+
+    parser.add_argument(
+        '--profile-dir',
+        help='Directory for profiles (default: the log directory)')
+
     try:
         version = pkg_resources.get_distribution(DISTRIBUTION_NAME).version
     except pkg_resources.DistributionNotFound:
@@ -71,17 +119,41 @@ def load_supplier_config(first_config):
 
 
 def create_supplier_config(args):
-    return SupplierConfig(connect=args.connect)
+    return SupplierConfig(
+        connect=args.connect,
+        workers=args.workers,
+        cache_size=args.cache_size,
+        metrics_host=args.metrics_host,
+        metrics_port=args.metrics_port)
 
 
 def main(args=None):
     if args is None:
         args = sys.argv[1:]
     opts = parse_args(args)
-    processor = None
     try:
         arg_config = create_supplier_config(opts)
         supplier_config = load_supplier_config(arg_config)
+    except LocalConfigurationError as e:
+        print("Error: {}".format(e))
+        sys.exit(1)
+
+    if supplier_config.workers == 1:
+        run_processor(supplier_config, opts)
+        return
+
+    init_console_logging(verbose_level=opts.verbose)
+    Supervisor(supplier_config.workers, run_processor,
+               args=(supplier_config, opts),
+               restart_delay=supplier_config.restart_delay).run()
+
+
+def run_processor(supplier_config, opts, worker=0):
+    """Runs one transaction processor until it is interrupted. Worker
+    processes started by the supervisor each call this with their index.
+    """
+    processor = None
+    try:
         processor = TransactionProcessor(url=supplier_config.connect)
         log_config = get_log_config(filename="supplier_log_config.toml")
 
@@ -100,7 +172,20 @@ def main(args=None):
 
         init_console_logging(verbose_level=opts.verbose)
 
-        handler = SupplierTransactionHandler()
+        handler = ProfilingHandler(
+            SupplierTransactionHandler(cache_size=supplier_config.cache_size),
+            opts.profile_dir or get_log_dir(),
+            default_calls=opts.profile or DEFAULT_PROFILE_CALLS)
+        handler.install_signal(signal.SIGUSR1)
+        if opts.profile:
+            handler.arm()
+
+        if supplier_config.metrics_port is not None:
+            metrics = ProcessorMetrics()
+            start_metrics_server(
+                metrics, host=supplier_config.metrics_host,
+                port=supplier_config.metrics_port + worker)
+            handler = InstrumentedHandler(handler, metrics)
 
         processor.add_handler(handler)
 
@@ -0,0 +1,77 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""In-memory stand-in for the validator's state context, so
+SupplierTransactionHandler.apply can be driven outside a validator:
+
+    context = InMemoryContext()
+    handler.apply(make_request(payload), context)
+"""
+
+from collections import namedtuple
+
+from sawtooth_sdk.protobuf.processor_pb2 import TpProcessRequest
+from sawtooth_sdk.protobuf.transaction_pb2 import TransactionHeader
+
+
+StateEntry = namedtuple('StateEntry', ['address', 'data'])
+
+
+class InMemoryContext:
+    """Implements the get_state/set_state/delete_state calls of
+    sawtooth_sdk.processor.context.Context over a dict, and counts the
+    calls and bytes moved in each direction.
+    """
+
+    def __init__(self, state=None):
+        self.state = {} if state is None else state
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.reads = 0
+        self.writes = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def get_state(self, addresses, timeout=None):
+        self.reads += 1
+        entries = []
+        for address in addresses:
+            data = self.state.get(address)
+            if data is not None:
+                self.bytes_read += len(data)
+                entries.append(StateEntry(address, data))
+        return entries
+
+    def set_state(self, entries, timeout=None):
+        self.writes += 1
+        self.bytes_written += sum(len(data) for data in entries.values())
+        self.state.update(entries)
+        return list(entries)
+
+    def delete_state(self, addresses, timeout=None):
+        return [address for address in addresses
+                if self.state.pop(address, None) is not None]
+
+    def size(self):
+        """Returns the total bytes held in state."""
+        return sum(len(data) for data in self.state.values())
+
+
+def make_request(payload, family_version, family_name='supplier'):
+    """Wraps a payload in the TpProcessRequest handed to apply()."""
+    header = TransactionHeader(
+        family_name=family_name, family_version=family_version)
+    return TpProcessRequest(header=header, payload=payload)
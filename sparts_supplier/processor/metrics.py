@@ -0,0 +1,294 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Prometheus metrics for the supplier transaction processor.
+
+InstrumentedHandler wraps a SupplierTransactionHandler and records apply
+latency per action, get_state/set_state latency and byte counts, and
+rejected transactions by reason. start_metrics_server serves them in the
+Prometheus text format:
+
+    metrics = ProcessorMetrics()
+    processor.add_handler(InstrumentedHandler(handler, metrics))
+    start_metrics_server(metrics, port=9108)
+
+Nothing here runs unless the processor is started with --metrics-port;
+without it the plain handler is registered and pays no overhead.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+from sawtooth_sdk.processor.exceptions import InternalError
+from sawtooth_sdk.processor.exceptions import InvalidTransaction
+from sawtooth_sdk.processor.handler import TransactionHandler
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Action label values; anything else in a payload is counted as "other".
+ACTIONS = frozenset(('create', 'AddPart', 'AddParts', 'MigrateParts'))
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append('{}_bucket{} {}'.format(
+                name, _labels(labels, le=bound), cumulative))
+        lines.append('{}_sum{} {}'.format(name, _labels(labels), self.sum))
+        lines.append('{}_count{} {}'.format(
+            name, _labels(labels), self.count))
+        return lines
+
+
+class ProcessorMetrics:
+    """Histograms and counters keyed by label values, rendered together.
+
+    Updates come from the processor thread and renders from the HTTP
+    thread, so both take the same lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._apply = {}
+        self._state = {}
+        self._state_bytes = {}
+        self._invalid = {}
+        self._internal_errors = 0
+
+    def observe_apply(self, action, status, seconds):
+        with self._lock:
+            _histogram(self._apply, (action, status)).observe(seconds)
+
+    def observe_state(self, operation, seconds, size):
+        with self._lock:
+            _histogram(self._state, (operation,)).observe(seconds)
+            self._state_bytes[operation] = \
+                self._state_bytes.get(operation, 0) + size
+
+    def count_invalid(self, reason):
+        with self._lock:
+            self._invalid[reason] = self._invalid.get(reason, 0) + 1
+
+    def count_internal_error(self):
+        with self._lock:
+            self._internal_errors += 1
+
+    def render(self):
+        with self._lock:
+            lines = [
+                '# HELP supplier_apply_seconds Time spent in apply() by '
+                'action and outcome.',
+                '# TYPE supplier_apply_seconds histogram',
+            ]
+            for (action, status), histogram in sorted(self._apply.items()):
+                lines += histogram.render(
+                    'supplier_apply_seconds',
+                    {'action': action, 'status': status})
+
+            lines += [
+                '# HELP supplier_state_seconds Time spent in state calls.',
+                '# TYPE supplier_state_seconds histogram',
+            ]
+            for (operation,), histogram in sorted(self._state.items()):
+                lines += histogram.render(
+                    'supplier_state_seconds', {'operation': operation})
+
+            lines += [
+                '# HELP supplier_state_bytes_total Bytes read from or '
+                'written to state.',
+                '# TYPE supplier_state_bytes_total counter',
+            ]
+            for operation, size in sorted(self._state_bytes.items()):
+                lines.append('supplier_state_bytes_total{} {}'.format(
+                    _labels({'operation': operation}), size))
+
+            lines += [
+                '# HELP supplier_invalid_transactions_total Transactions '
+                'rejected, by reason.',
+                '# TYPE supplier_invalid_transactions_total counter',
+            ]
+            for reason, count in sorted(self._invalid.items()):
+                lines.append(
+                    'supplier_invalid_transactions_total{} {}'.format(
+                        _labels({'reason': reason}), count))
+
+            lines += [
+                '# HELP supplier_internal_errors_total Transactions that '
+                'failed with an internal error.',
+                '# TYPE supplier_internal_errors_total counter',
+                'supplier_internal_errors_total {}'.format(
+                    self._internal_errors),
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+class InstrumentedContext:
+    """Times and sizes the state calls a handler makes on a context."""
+
+    def __init__(self, context, metrics):
+        self._context = context
+        self._metrics = metrics
+
+    def get_state(self, addresses, timeout=None):
+        start = time.perf_counter()
+        entries = self._context.get_state(addresses, timeout)
+        self._metrics.observe_state(
+            'get', time.perf_counter() - start,
+            sum(len(entry.data) for entry in entries))
+        return entries
+
+    def set_state(self, entries, timeout=None):
+        start = time.perf_counter()
+        addresses = self._context.set_state(entries, timeout)
+        self._metrics.observe_state(
+            'set', time.perf_counter() - start,
+            sum(len(data) for data in entries.values()))
+        return addresses
+
+    def delete_state(self, addresses, timeout=None):
+        start = time.perf_counter()
+        deleted = self._context.delete_state(addresses, timeout)
+        self._metrics.observe_state('delete', time.perf_counter() - start, 0)
+        return deleted
+
+    def __getattr__(self, name):
+        return getattr(self._context, name)
+
+
+class InstrumentedHandler(TransactionHandler):
+    def __init__(self, handler, metrics):
+        self._handler = handler
+        self._metrics = metrics
+
+    @property
+    def family_name(self):
+        return self._handler.family_name
+
+    @property
+    def family_versions(self):
+        return self._handler.family_versions
+
+    @property
+    def namespaces(self):
+        return self._handler.namespaces
+
+    def __getattr__(self, name):
+        return getattr(self._handler, name)
+
+    def apply(self, transaction, context):
+        start = time.perf_counter()
+        try:
+            self._handler.apply(
+                transaction, InstrumentedContext(context, self._metrics))
+        except InvalidTransaction as err:
+            self._metrics.observe_apply(
+                self._action(), 'invalid', time.perf_counter() - start)
+            self._metrics.count_invalid(_reason(err))
+            raise
+        except InternalError:
+            self._metrics.observe_apply(
+                self._action(), 'error', time.perf_counter() - start)
+            self._metrics.count_internal_error()
+            raise
+        self._metrics.observe_apply(
+            self._action(), 'ok', time.perf_counter() - start)
+
+    def _action(self):
+        # The wrapped handler records the action of the payload it parsed,
+        # so the payload is not decoded a second time for the label.
+        action = self._handler.last_action
+        if action is None:
+            return 'unparsable'
+        return action if action in ACTIONS else 'other'
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(metrics, host='127.0.0.1', port=9108):
+    """Serves metrics at http://host:port/metrics from a daemon thread and
+    returns the server.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    server.daemon_threads = True
+    server.metrics = metrics
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    LOGGER.info('Serving metrics on http://%s:%s/metrics', host, port)
+    return server
+
+
+def _histogram(histograms, key):
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = Histogram()
+    return histogram
+
+
+def _reason(err):
+    # Keep the label set small: messages such as "Invalid action: X"
+    # are counted under the text before the colon.
+    return str(err).split(':')[0].strip() or 'unknown'
+
+
+def _labels(labels, **extra):
+    labels = dict(labels, **{key: str(value) for key, value in extra.items()})
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(key, _escape(value))
+        for key, value in labels.items()) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n') \
+        .replace('"', '\\"')
@@ -0,0 +1,216 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""On-demand profiling of SupplierTransactionHandler.apply in a running
+processor.
+
+ProfilingHandler wraps the handler. Once armed, by the --profile flag at
+start-up or by SIGUSR1 later, it runs the next N apply calls under
+cProfile and splits each call into phases:
+
+    payload    parse_payload
+    validate   validate_transaction
+    get_state  context.get_state
+    decode     decoding the stored supplier record
+    encode     encoding the record and part links
+    set_state  context.set_state
+    mutate     everything else in apply
+
+It then writes supplier-profile-<time>.pstats and a -phases.txt summary
+to the output directory, and the processor carries on. While not armed,
+apply costs one extra attribute check.
+
+Phase times include cProfile's own overhead, which weighs most on phases
+that make many small calls; compare shares between runs rather than
+reading them as absolute costs.
+"""
+
+import cProfile
+import logging
+import os
+import signal
+import threading
+import time
+
+from sawtooth_sdk.processor.handler import TransactionHandler
+
+from sparts_supplier.processor import handler as handler_module
+
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_CALLS = 100
+
+PHASES = ('payload', 'validate', 'get_state', 'decode', 'mutate', 'encode',
+          'set_state')
+
+# Handler module functions timed as a phase, by phase.
+_MODULE_PHASES = (
+    ('parse_payload', 'payload'),
+    ('validate_transaction', 'validate'),
+    ('encode_supplier_record', 'encode'),
+    ('encode_part_link', 'encode'),
+)
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.calls = 0
+        self.elapsed = 0.0
+
+    def wrap(self, phase, func):
+        totals = self.totals
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                totals[phase] += time.perf_counter() - start
+        return timed
+
+    def summary(self):
+        measured = sum(self.totals[phase] for phase in PHASES
+                       if phase != 'mutate')
+        totals = dict(self.totals, mutate=max(self.elapsed - measured, 0.0))
+        lines = ['{} apply calls, {:.3f} ms total, {:.1f} us per call'.format(
+            self.calls, self.elapsed * 1e3,
+            self.elapsed / max(self.calls, 1) * 1e6)]
+        lines.append('{:<10} {:>12} {:>12} {:>7}'.format(
+            'phase', 'total ms', 'us/call', 'share'))
+        for phase in PHASES:
+            lines.append('{:<10} {:>12.3f} {:>12.1f} {:>6.1f}%'.format(
+                phase, totals[phase] * 1e3,
+                totals[phase] / max(self.calls, 1) * 1e6,
+                totals[phase] / self.elapsed * 100 if self.elapsed else 0))
+        return '\n'.join(lines) + '\n'
+
+
+class _TimedContext:
+    def __init__(self, context, timer):
+        self.get_state = timer.wrap('get_state', context.get_state)
+        self.set_state = timer.wrap('set_state', context.set_state)
+        self._context = context
+
+    def __getattr__(self, name):
+        return getattr(self._context, name)
+
+
+class ProfilingHandler(TransactionHandler):
+    """Wraps a SupplierTransactionHandler (not another wrapper, since the
+    decode phase is timed on the handler itself) and profiles apply calls
+    while armed. Every other attribute is passed through.
+    """
+
+    def __init__(self, handler, output_dir,
+                 default_calls=DEFAULT_PROFILE_CALLS):
+        self._handler = handler
+        self._output_dir = output_dir
+        self._default_calls = default_calls
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._profile = None
+        self._timer = None
+
+    @property
+    def family_name(self):
+        return self._handler.family_name
+
+    @property
+    def family_versions(self):
+        return self._handler.family_versions
+
+    @property
+    def namespaces(self):
+        return self._handler.namespaces
+
+    def __getattr__(self, name):
+        return getattr(self._handler, name)
+
+    def arm(self, calls=None):
+        """Profiles the next calls apply calls (default_calls if None)."""
+        with self._lock:
+            if self._remaining:
+                LOGGER.info('Profiling already in progress')
+                return
+            self._profile = cProfile.Profile()
+            self._timer = PhaseTimer()
+            self._remaining = calls = calls or self._default_calls
+        LOGGER.info('Profiling the next %s apply calls', calls)
+
+    def install_signal(self, signum):
+        """Arms the profiler whenever the process receives signum."""
+        # arm() takes a lock the interrupted thread may be holding
+        signal.signal(signum, lambda *_: threading.Thread(
+            target=self.arm, daemon=True).start())
+
+    def apply(self, transaction, context):
+        if not self._remaining:
+            return self._handler.apply(transaction, context)
+        return self._profiled_apply(transaction, context)
+
+    def _profiled_apply(self, transaction, context):
+        # arm() runs on another thread; work on this run's own profile and
+        # timer so a re-arm can never swap them out mid-call.
+        with self._lock:
+            profile = self._profile
+            timer = self._timer
+        if profile is None:
+            return self._handler.apply(transaction, context)
+        handler = self._handler
+        originals = [(name, getattr(handler_module, name))
+                     for name, _ in _MODULE_PHASES]
+        for name, phase in _MODULE_PHASES:
+            setattr(handler_module, name,
+                    timer.wrap(phase, getattr(handler_module, name)))
+        handler._decode_supplier = \
+            timer.wrap('decode', handler._decode_supplier)
+
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            return handler.apply(transaction, _TimedContext(context, timer))
+        finally:
+            profile.disable()
+            timer.elapsed += time.perf_counter() - start
+            timer.calls += 1
+            del handler._decode_supplier
+            for name, original in originals:
+                setattr(handler_module, name, original)
+            with self._lock:
+                self._remaining -= 1
+                finished = not self._remaining
+                if finished:
+                    # Disarm before writing, so that an arm() during the
+                    # dump starts a fresh run rather than being cleared.
+                    self._profile = None
+                    self._timer = None
+            if finished:
+                self._dump(profile, timer)
+
+    def _dump(self, profile, timer):
+        stem = os.path.join(self._output_dir, 'supplier-profile-{}'.format(
+            time.strftime('%Y%m%d-%H%M%S')))
+        try:
+            os.makedirs(self._output_dir, exist_ok=True)
+            profile.dump_stats(stem + '.pstats')
+            with open(stem + '-phases.txt', 'w') as out:
+                out.write(timer.summary())
+        except OSError as err:
+            LOGGER.warning('Failed to write profile %s: %s', stem, err)
+        else:
+            LOGGER.info('Wrote profile %s.pstats and %s-phases.txt',
+                        stem, stem)
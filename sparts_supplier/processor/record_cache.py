@@ -0,0 +1,87 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import hashlib
+from collections import OrderedDict
+
+from sparts_supplier import codec
+
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+class SupplierRecordCache:
+    """Bounded LRU cache of decoded supplier records.
+
+    Entries are keyed by state address and a digest of the raw state
+    bytes, so a lookup only hits when the bytes are unchanged and a stale
+    record can never be returned. Only the latest bytes seen for an
+    address are kept, so a hot supplier that changes on every transaction
+    occupies a single slot. Records are only ever what decode_supplier
+    returned for the bytes read from state, never what the handler meant
+    to write, so a hit decides exactly as a miss would. Cached records
+    are shared between transactions and must not be mutated; callers
+    copy a record before changing it (see copy_supplier).
+    """
+
+    def __init__(self, size=DEFAULT_CACHE_SIZE):
+        self._size = size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, address, data):
+        """Returns (record, frozenset of part ids) for the raw state bytes
+        at address, decoding them only on a miss.
+        """
+        digest = _digest(data)
+        entry = self._entries.get(address)
+        if entry is not None and entry[0] == digest:
+            self.hits += 1
+            self._entries.move_to_end(address)
+            return entry[1:]
+
+        self.misses += 1
+        record = codec.decode_supplier(data)
+        part_ids = _part_ids(record)
+        self._put(address, (digest, record, part_ids))
+        return record, part_ids
+
+    def clear(self):
+        self._entries.clear()
+
+    def _put(self, address, entry):
+        if self._size <= 0:
+            return
+        self._entries[address] = entry
+        self._entries.move_to_end(address)
+        while len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+
+
+def copy_supplier(supplier):
+    """Returns a copy of a cached record that is safe to modify."""
+    return dict(supplier, parts=list(supplier['parts']))
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _part_ids(record):
+    return frozenset(part['part_id'] for part in record['parts'])
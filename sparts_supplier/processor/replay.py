@@ -0,0 +1,313 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Replays a transaction log through SupplierTransactionHandler against
+in-memory state, for capacity planning outside a validator.
+
+The log is a batch file written by `supplier make-batch-file`, JSON
+lines of transaction specs, or a seeded synthetic workload. For every
+transaction the replay records apply time, the bytes read and written
+and the size of the namespace afterwards, and it can checkpoint state
+every N transactions and resume from a checkpoint later:
+
+    python -m sparts_supplier.processor.replay --synthetic 100000 \\
+        --series series.csv --addresses addresses.csv \\
+        --checkpoint-dir checkpoints --checkpoint-every 10000
+
+Given the same log (or seed) and starting state, the state after every
+transaction is the same on every run; only timings vary.
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import time
+
+from sawtooth_sdk.processor.exceptions import InternalError
+from sawtooth_sdk.processor.exceptions import InvalidTransaction
+from sawtooth_sdk.protobuf.batch_pb2 import BatchList
+from sawtooth_sdk.protobuf.processor_pb2 import TpProcessRequest
+from sawtooth_sdk.protobuf.transaction_pb2 import TransactionHeader
+
+from sparts_supplier import batch_file
+from sparts_supplier.codec import read_bytes
+from sparts_supplier.codec import write_bytes
+from sparts_supplier.exceptions import SupplierException
+from sparts_supplier.processor.handler import SupplierTransactionHandler
+from sparts_supplier.processor.memory_state import InMemoryContext
+from sparts_supplier.processor.memory_state import make_request
+from sparts_supplier.supplier_batch import FAMILY_VERSION
+from sparts_supplier.supplier_batch import SupplierClientBase
+
+
+CHECKPOINT_MAGIC = b'SPSTATE1'
+
+SERIES_FIELDS = (
+    'index', 'action', 'status', 'apply_us', 'reads', 'bytes_read',
+    'writes', 'bytes_written', 'largest_write', 'state_entries',
+    'state_bytes')
+
+
+class RecordingContext(InMemoryContext):
+    """InMemoryContext that also keeps I/O totals per address and the
+    size of state as it changes.
+    """
+
+    def __init__(self, state=None):
+        super().__init__(state)
+        self.state_bytes = sum(len(data) for data in self.state.values())
+        self.address_io = {}
+        self.largest_write = 0
+
+    def get_state(self, addresses, timeout=None):
+        entries = super().get_state(addresses, timeout)
+        for entry in entries:
+            io = self._io(entry.address)
+            io[0] += 1
+            io[1] += len(entry.data)
+        return entries
+
+    def set_state(self, entries, timeout=None):
+        for address, data in entries.items():
+            io = self._io(address)
+            io[2] += 1
+            io[3] += len(data)
+            self.state_bytes += len(data) - len(self.state.get(address, b''))
+            self.largest_write = max(self.largest_write, len(data))
+        return super().set_state(entries, timeout)
+
+    def delete_state(self, addresses, timeout=None):
+        for address in addresses:
+            self.state_bytes -= len(self.state.get(address, b''))
+        return super().delete_state(addresses, timeout)
+
+    def reset_counters(self):
+        super().reset_counters()
+        self.largest_write = 0
+
+    def _io(self, address):
+        io = self.address_io.get(address)
+        if io is None:
+            # reads, bytes read, writes, bytes written
+            io = self.address_io[address] = [0, 0, 0, 0]
+        return io
+
+
+class ReplayEngine:
+    def __init__(self, state=None, handler=None):
+        self.context = RecordingContext(state)
+        self.handler = handler or SupplierTransactionHandler()
+        self.applied = 0
+
+    def replay(self, requests, series=None, checkpoint_dir=None,
+               checkpoint_every=0):
+        """Applies (action, TpProcessRequest) pairs in order, writing one
+        SERIES_FIELDS row per transaction to the csv writer series, and
+        returns counts of applied and invalid transactions.
+        """
+        context = self.context
+        counts = {'applied': 0, 'invalid': 0}
+        clock = time.perf_counter_ns
+        for action, request in requests:
+            context.reset_counters()
+            start = clock()
+            try:
+                self.handler.apply(request, context)
+                status = 'ok'
+            except (InvalidTransaction, InternalError):
+                status = 'invalid'
+            elapsed = clock() - start
+
+            self.applied += 1
+            counts['applied' if status == 'ok' else 'invalid'] += 1
+            if series is not None:
+                series.writerow((
+                    self.applied, action, status, elapsed / 1e3,
+                    context.reads, context.bytes_read, context.writes,
+                    context.bytes_written, context.largest_write,
+                    len(context.state), context.state_bytes))
+
+            if checkpoint_dir and checkpoint_every and \
+                    self.applied % checkpoint_every == 0:
+                write_checkpoint(
+                    os.path.join(checkpoint_dir,
+                                 'state-{:012d}.bin'.format(self.applied)),
+                    context.state)
+        return counts
+
+    def write_address_summary(self, out):
+        writer = csv.writer(out)
+        writer.writerow(('address', 'reads', 'bytes_read', 'writes',
+                         'bytes_written', 'size'))
+        for address, io in sorted(self.context.address_io.items()):
+            writer.writerow([address] + io + [
+                len(self.context.state.get(address, b''))])
+
+
+def write_checkpoint(path, state):
+    """Writes state as MAGIC followed by varint-prefixed address and
+    data pairs, sorted by address.
+    """
+    out = bytearray(CHECKPOINT_MAGIC)
+    for address in sorted(state):
+        for value in (address.encode(), state[address]):
+            write_bytes(out, value)
+    with open(path, 'wb') as fd:
+        fd.write(out)
+
+
+def read_checkpoint(path):
+    with open(path, 'rb') as fd:
+        data = fd.read()
+    if not data.startswith(CHECKPOINT_MAGIC):
+        raise SupplierException('Not a state checkpoint: {}'.format(path))
+
+    view = memoryview(data)
+    offset = len(CHECKPOINT_MAGIC)
+    state = {}
+    try:
+        while offset < len(view):
+            address, offset = read_bytes(view, offset)
+            state[address.decode()], offset = read_bytes(view, offset)
+    except IndexError:
+        raise SupplierException('Truncated state checkpoint: {}'.format(path))
+    return state
+
+
+def requests_from_batch_file(path):
+    """Yields (action, request) for every transaction of a batch file."""
+    for _, data in batch_file.iter_batch_file(path):
+        batch_list = BatchList()
+        batch_list.ParseFromString(data)
+        for batch in batch_list.batches:
+            for transaction in batch.transactions:
+                header = TransactionHeader.FromString(transaction.header)
+                yield _action(transaction.payload, header.family_version), \
+                    TpProcessRequest(
+                        header=header, payload=transaction.payload,
+                        signature=transaction.header_signature)
+
+
+def requests_from_specs(specs, family_version=FAMILY_VERSION):
+    """Yields (action, request) for transaction specs, such as those read
+    by batch_file.read_specs; nothing is signed.
+    """
+    client = SupplierClientBase('', family_version=family_version)
+    for spec in specs:
+        payload = client.make_payload(**spec)
+        yield spec['action'], make_request(payload, family_version)
+
+
+def synthetic_specs(count, suppliers=1000, parts_per_call=1, seed=0):
+    """Yields count deterministic specs: each supplier is created the
+    first time it is picked, and later picks add parts to it.
+    """
+    rng = random.Random(seed)
+    created = set()
+    for i in range(count):
+        supplier_id = 'supplier-{}'.format(rng.randrange(suppliers))
+        if supplier_id not in created:
+            created.add(supplier_id)
+            yield {'action': 'create', 'supplier_id': supplier_id,
+                   'short_id': supplier_id[-8:],
+                   'supplier_name': 'Supplier {}'.format(supplier_id),
+                   'passwd': '{:064x}'.format(rng.getrandbits(256)),
+                   'supplier_url': 'http://example.com/' + supplier_id}
+        elif parts_per_call > 1:
+            yield {'action': 'AddParts', 'supplier_id': supplier_id,
+                   'part_ids': ['part-{}-{}'.format(i, j)
+                                for j in range(parts_per_call)]}
+        else:
+            yield {'action': 'AddPart', 'supplier_id': supplier_id,
+                   'part_id': 'part-{}'.format(i)}
+
+
+def _action(payload, family_version):
+    try:
+        if family_version == '1.0':
+            return payload.decode().split(',')[5]
+        return json.loads(payload.decode())['action']
+    except (ValueError, IndexError, KeyError):
+        return ''
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--batch-file',
+                        help='batch file written by make-batch-file')
+    source.add_argument('--specs', type=argparse.FileType('r'),
+                        help='JSON lines of transaction specs')
+    source.add_argument('--synthetic', type=int, metavar='COUNT',
+                        help='replay COUNT synthetic transactions')
+    parser.add_argument('--suppliers', type=int, default=1000,
+                        help='distinct suppliers in the synthetic log')
+    parser.add_argument('--parts-per-call', type=int, default=1,
+                        help='part IDs per synthetic AddParts (1: AddPart)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--family-version', default=FAMILY_VERSION,
+                        help='family version for specs and synthetic logs')
+    parser.add_argument('--from-checkpoint',
+                        help='start from state saved in a checkpoint')
+    parser.add_argument('--series', type=argparse.FileType('w'),
+                        help='CSV time series, one row per transaction')
+    parser.add_argument('--addresses', type=argparse.FileType('w'),
+                        help='CSV of I/O totals and final size per address')
+    parser.add_argument('--checkpoint-dir')
+    parser.add_argument('--checkpoint-every', type=int, default=0,
+                        help='transactions between checkpoints')
+    args = parser.parse_args(args)
+
+    if args.batch_file:
+        requests = requests_from_batch_file(args.batch_file)
+    else:
+        if args.specs:
+            specs = batch_file.read_specs(args.specs)
+        else:
+            specs = synthetic_specs(args.synthetic, args.suppliers,
+                                    args.parts_per_call, args.seed)
+        requests = requests_from_specs(specs, args.family_version)
+
+    state = None
+    if args.from_checkpoint:
+        state = read_checkpoint(args.from_checkpoint)
+    if args.checkpoint_dir:
+        os.makedirs(args.checkpoint_dir, exist_ok=True)
+
+    engine = ReplayEngine(state)
+    series = None
+    if args.series:
+        series = csv.writer(args.series)
+        series.writerow(SERIES_FIELDS)
+
+    started = time.perf_counter()
+    counts = engine.replay(requests, series, args.checkpoint_dir,
+                           args.checkpoint_every)
+    elapsed = time.perf_counter() - started
+
+    if args.addresses:
+        engine.write_address_summary(args.addresses)
+
+    print(json.dumps(dict(
+        counts, elapsed=round(elapsed, 3),
+        state_entries=len(engine.context.state),
+        state_bytes=engine.context.state_bytes)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Runs several transaction processor processes and keeps them running.
+
+Each worker is a separate process with its own TransactionProcessor and
+handler, registered with the validator like a standalone processor; the
+validator spreads supplier transactions across them. The supervisor
+restarts a worker that exits, forwards SIGUSR1 to every worker, and on
+SIGINT or SIGTERM stops them all and waits for them to exit.
+"""
+
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import time
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Seconds workers get to exit after SIGTERM before they are killed.
+SHUTDOWN_TIMEOUT = 10.0
+
+# Restart delays double for a worker that keeps crashing, up to this.
+MAX_RESTART_DELAY = 60.0
+
+# A worker that ran at least this long counts as healthy again.
+HEALTHY_RUNTIME = 60.0
+
+
+class Supervisor:
+    def __init__(self, workers, target, args=(), restart_delay=1.0):
+        """Runs target(*args, worker_index) in workers processes."""
+        self._count = workers
+        self._target = target
+        self._args = tuple(args)
+        self._restart_delay = restart_delay
+        self._workers = {}
+        self._stopping = False
+        # Written by the signal handler to wake the supervise loop
+        self._wakeup = None
+
+    def run(self):
+        """Starts the workers and supervises them until SIGINT/SIGTERM."""
+        previous = {
+            signum: signal.signal(signum, self._handle_stop)
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        previous[signal.SIGUSR1] = \
+            signal.signal(signal.SIGUSR1, self._forward)
+        self._wakeup = os.pipe()
+        try:
+            for index in range(self._count):
+                self._start(index, self._restart_delay)
+            self._supervise()
+        finally:
+            self._stop_all()
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+            for fd in self._wakeup:
+                os.close(fd)
+            self._wakeup = None
+
+    def _start(self, index, delay):
+        process = multiprocessing.Process(
+            target=_run_worker, args=(self._target, self._args + (index,)),
+            name='supplier-worker-{}'.format(index))
+        process.start()
+        LOGGER.info('Started worker %s (pid %s)', index, process.pid)
+        self._workers[index] = (process, time.monotonic(), delay)
+
+    def _supervise(self):
+        pending = []
+        while not self._stopping:
+            sentinels = [process.sentinel
+                         for process, _, _ in self._workers.values()]
+            sentinels.append(self._wakeup[0])
+            timeout = None
+            if pending:
+                timeout = max(min(due for due, _, _ in pending)
+                              - time.monotonic(), 0)
+            multiprocessing.connection.wait(sentinels, timeout)
+            if self._stopping:
+                return
+
+            now = time.monotonic()
+            for index, (process, started, delay) in \
+                    list(self._workers.items()):
+                if process.is_alive():
+                    continue
+                process.join()
+                del self._workers[index]
+                if now - started >= HEALTHY_RUNTIME:
+                    delay = self._restart_delay
+                LOGGER.warning(
+                    'Worker %s (pid %s) exited with code %s; restarting in '
+                    '%.1fs', index, process.pid, process.exitcode, delay)
+                pending.append((now + delay, index,
+                                min(delay * 2, MAX_RESTART_DELAY)))
+
+            for entry in [entry for entry in pending if entry[0] <= now]:
+                pending.remove(entry)
+                self._start(entry[1], entry[2])
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+        os.write(self._wakeup[1], b'\0')
+
+    def _forward(self, signum, frame):
+        for process, _, _ in self._workers.values():
+            if process.pid is not None and process.is_alive():
+                os.kill(process.pid, signum)
+
+    def _stop_all(self):
+        processes = [process for process, _, _ in self._workers.values()]
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for process in processes:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                LOGGER.warning('Killing worker pid %s', process.pid)
+                process.kill()
+                process.join()
+        self._workers.clear()
+
+
+def _run_worker(target, args):
+    # SIGTERM from the supervisor unwinds the worker like Ctrl-C, so the
+    # processor disconnects from the validator cleanly.
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    target(*args)
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt()
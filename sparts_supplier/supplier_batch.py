@@ -17,47 +17,195 @@
 import hashlib
 import base64
 from base64 import b64encode
+import json
 import time
+from functools import lru_cache
 import requests
-import yaml
+from requests.adapters import HTTPAdapter
 
-from sawtooth_signing import create_context
-from sawtooth_signing import CryptoFactory
-from sawtooth_signing import ParseError
-from sawtooth_signing.secp256k1 import Secp256k1PrivateKey
-
-from sawtooth_sdk.protobuf.transaction_pb2 import TransactionHeader
-from sawtooth_sdk.protobuf.transaction_pb2 import Transaction
-from sawtooth_sdk.protobuf.batch_pb2 import BatchList
-from sawtooth_sdk.protobuf.batch_pb2 import BatchHeader
-from sawtooth_sdk.protobuf.batch_pb2 import Batch
+# sawtooth_signing, the protobuf messages and yaml are imported by the
+# functions that use them, so read-only clients (and the read-only CLI
+# commands) do not pay for loading them.
 
+from sparts_supplier import addressing
+from sparts_supplier import codec
 from sparts_supplier.exceptions import SupplierException
 
 
+# Transactions per Batch and Batches per BatchList used by the bulk API.
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_BATCHES_PER_LIST = 100
+
+# State entries requested per page when listing the supplier namespace;
+# the REST API caps this at 1000.
+DEFAULT_PAGE_SIZE = 100
+
+# Family version used for new transactions. A processor that does not
+# support a version leaves its transactions pending forever, so the
+# default stays at 1.0, which every processor understands. Pass
+# family_version='1.1' (--family-version 1.1 on the CLI) once every
+# processor of the network runs 1.1; it keeps each supplier-part link at
+# its own address and adds AddParts and MigrateParts.
+FAMILY_VERSION = '1.0'
+
+# Connections kept alive per host by the session SupplierBatch creates.
+DEFAULT_POOL_SIZE = 10
+
+# (connect, read) timeout in seconds, or None to wait indefinitely.
+DEFAULT_TIMEOUT = None
+
+# Part IDs per AddParts transaction; the handler rejects longer lists
+# (processor.handler.MAX_PART_IDS). add_parts splits longer lists.
+MAX_PARTS_PER_TRANSACTION = 1000
+
+# Suppliers retrieve_suppliers fetches at once; matches the connections
+# the default session keeps per host.
+DEFAULT_RETRIEVE_CONCURRENCY = DEFAULT_POOL_SIZE
+
+# Seconds a SupplierIndex may go without a sync before a read-through
+# read syncs it. 0 syncs before every read, which costs one request for
+# the newest block while the chain has not moved.
+DEFAULT_INDEX_MAX_AGE = 0
+
+
 def _sha512(data):
     return hashlib.sha512(data).hexdigest()
 
 
-class SupplierBatch:
-    def __init__(self, base_url, keyfile=None):
+def create_session(pool_size=DEFAULT_POOL_SIZE, keep_alive=True,
+                   max_retries=0, pool_block=False):
+    """Returns a requests.Session backed by a keep-alive connection pool.
+
+    The session may be handed to any number of SupplierBatch instances
+    (and threads) so they share connections to the REST API.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=max_retries,
+        pool_block=pool_block)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+
+    return session
+
+
+@lru_cache(maxsize=32)
+def _basic_auth_header(auth_user, auth_password):
+    auth_string = "{}:{}".format(auth_user, auth_password)
+    b64_string = b64encode(auth_string.encode()).decode()
+    return 'Basic {}'.format(b64_string)
+
+
+def _load_response(result):
+    """Decodes a REST API response body.
+
+    The REST API answers in JSON, which json parses far faster than YAML;
+    yaml.safe_load is kept only as a fallback for bodies that are not JSON.
+    """
+    try:
+        return json.loads(result)
+    except ValueError:
+        import yaml
+        return yaml.safe_load(result)
+
+
+def _parse_state_page(result):
+    """Returns the encoded entries of one page of a state listing and the
+    paging cursor of the next page, or None on the last page.
+    """
+    try:
+        response = _load_response(result)
+        encoded_entries = response["data"]
+    except BaseException as err:
+        raise SupplierException(
+            'Malformed state listing: {}'.format(err))
+
+    paging = response.get("paging") or {}
+    return encoded_entries, paging.get("next_position")
+
+
+def _state_page_suffix(prefix, page_size, start, head=None):
+    suffix = "state?address={}&limit={}".format(prefix, page_size)
+    if start is not None:
+        suffix += "&start={}".format(start)
+    if head is not None:
+        suffix += "&head={}".format(head)
+    return suffix
+
+
+def _parse_state(result):
+    try:
+        return base64.b64decode(_load_response(result)["data"])
 
-        self._base_url = base_url
+    except BaseException:
+        return None
 
-        if keyfile is None:
-            self._signer = None
+
+def _merge_part_links(supplier, part_links):
+    """Appends the parts stored at per-part addresses (family version 1.1)
+    to a supplier record's inline part list and returns the record in the
+    family version 1.0 layout, whichever codec it was stored with.
+    """
+    stored_supplier = codec.decode_supplier(supplier)
+    stored_supplier['parts'].extend(json.loads(link) for link in part_links)
+    return codec.encode_legacy_supplier(stored_supplier)
+
+
+def _parse_status(result):
+    return _load_response(result)['data'][0]['status']
+
+
+def read_private_key(keyfile):
+    """Returns the hex private key stored in keyfile."""
+    try:
+        with open(keyfile) as fd:
+            return fd.read().strip()
+    except OSError as err:
+        raise SupplierException(
+            'Failed to read private key {}: {}'.format(keyfile, str(err)))
+
+
+def _parse_status_entries(result):
+    return _load_response(result)['data']
+
+
+class SupplierClientBase:
+    """Payload, address and signing logic shared by SupplierBatch and
+    AsyncSupplierBatch; subclasses provide the transport.
+    """
+
+    def __init__(self, base_url, keyfile=None, family_version=FAMILY_VERSION,
+                 private_key=None):
+
+        self._family_version = family_version
+
+        if not base_url.startswith(("http://", "https://")):
+            base_url = "http://{}".format(base_url)
+        self._base_url = base_url.rstrip("/")
+
+        self._signer = None
+        self._public_key = None
+        self._header_template = None
+
+        if keyfile is not None:
+            private_key = read_private_key(keyfile)
+
+        if private_key is None:
             return
 
-        try:
-            with open(keyfile) as fd:
-                private_key_str = fd.read().strip()
-        except OSError as err:
-            raise SupplierException(
-                'Failed to read private key {}: {}'.format(
-                    keyfile, str(err)))
+        from sawtooth_signing import create_context
+        from sawtooth_signing import CryptoFactory
+        from sawtooth_signing import ParseError
+        from sawtooth_signing.secp256k1 import Secp256k1PrivateKey
+        from sawtooth_sdk.protobuf.transaction_pb2 import TransactionHeader
 
         try:
-            private_key = Secp256k1PrivateKey.from_hex(private_key_str)
+            private_key = Secp256k1PrivateKey.from_hex(private_key)
         except ParseError as e:
             raise SupplierException(
                 'Unable to load private key: {}'.format(str(e)))
@@ -65,6 +213,184 @@ class SupplierBatch:
         self._signer = CryptoFactory(create_context('secp256k1')) \
             .new_signer(private_key)
 
+        # Deriving the public key is not free; do it once per client, and
+        # build the fields every transaction header shares once as well.
+        self._public_key = self._signer.get_public_key().as_hex()
+        self._header_template = TransactionHeader(
+            signer_public_key=self._public_key,
+            family_name="supplier",
+            family_version=self._family_version,
+            dependencies=[],
+            batcher_public_key=self._public_key)
+
+
+    def make_create_transaction(self, supplier_id, short_id, supplier_name,
+                                passwd, supplier_url):
+        return self.make_transaction(
+            supplier_id, short_id, supplier_name, passwd, supplier_url,
+            "create")
+
+
+    def make_add_part_transaction(self, supplier_id, part_id):
+        return self.make_transaction(
+            supplier_id, "", "", "", "", "AddPart", part_id)
+
+
+    def make_add_parts_transaction(self, supplier_id, part_ids):
+        return self.make_transaction(
+            supplier_id, action="AddParts", part_ids=list(part_ids))
+
+
+    def make_add_parts_transactions(self, supplier_id, part_ids):
+        """Returns AddParts transactions of up to MAX_PARTS_PER_TRANSACTION
+        part ids each, linking all of part_ids.
+        """
+        part_ids = list(part_ids)
+        return [
+            self.make_add_parts_transaction(
+                supplier_id,
+                part_ids[i:i + MAX_PARTS_PER_TRANSACTION])
+            for i in range(0, len(part_ids), MAX_PARTS_PER_TRANSACTION)
+        ]
+
+
+    def make_migrate_parts_transaction(self, supplier_id, short_id=""):
+        return self.make_transaction(
+            supplier_id, short_id, "", "", "", "MigrateParts")
+
+
+    def _get_prefix(self):
+        return addressing.NAMESPACE
+
+
+    def _get_address(self, supplier_id):
+        return addressing.make_supplier_address(supplier_id)
+
+
+    def _get_part_prefix(self, supplier_id):
+        return addressing.make_part_prefix(supplier_id)
+
+
+    def _get_short_id_address(self, short_id):
+        return addressing.make_short_id_address(str(short_id))
+
+
+    def make_transaction(self, supplier_id, short_id="", supplier_name="",
+                         passwd="", supplier_url="", action="",
+                         part_id="", part_ids=None):
+        """Builds and signs a supplier transaction. The keyword arguments
+        are also the spec format of bulk.BulkTransactionFactory.
+        """
+        from sawtooth_sdk.protobuf.transaction_pb2 import TransactionHeader
+        from sawtooth_sdk.protobuf.transaction_pb2 import Transaction
+
+        if part_ids is not None and \
+                len(part_ids) > MAX_PARTS_PER_TRANSACTION:
+            raise SupplierException(
+                'At most {} part IDs per AddParts transaction'.format(
+                    MAX_PARTS_PER_TRANSACTION))
+
+        payload = self.make_payload(
+            supplier_id, short_id, supplier_name, passwd, supplier_url,
+            action, part_id, part_ids)
+
+        # Construct the address
+        address = self._get_address(supplier_id)
+        addresses = [address]
+        if self._family_version != "1.0":
+            addresses.append(self._get_part_prefix(supplier_id))
+            if action in ("create", "MigrateParts") and short_id:
+                addresses.append(self._get_short_id_address(short_id))
+
+        header = TransactionHeader()
+        header.CopyFrom(self._header_template)
+        header.inputs.extend(addresses)
+        header.outputs.extend(addresses)
+        header.payload_sha512 = _sha512(payload)
+        header.nonce = time.time().hex()
+        header = header.SerializeToString()
+
+        signature = self._signer.sign(header)
+
+        return Transaction(
+            header=header,
+            payload=payload,
+            header_signature=signature
+        )
+
+
+    def make_payload(self, supplier_id, short_id="", supplier_name="",
+                     passwd="", supplier_url="", action="", part_id="",
+                     part_ids=None):
+        """Returns the encoded payload make_transaction would sign, for the
+        client's family version.
+        """
+        if self._family_version == "1.0":
+            if part_ids is not None:
+                raise SupplierException(
+                    '{} requires family version 1.1'.format(action))
+            return ",".join([supplier_id,str(short_id),str(supplier_name),str(passwd),str(supplier_url), action,str(part_id)]).encode()
+
+        payload = {
+            'supplier_id': supplier_id,
+            'short_id': str(short_id),
+            'supplier_name': str(supplier_name),
+            'passwd': str(passwd),
+            'supplier_url': str(supplier_url),
+            'action': action,
+            'part_id': str(part_id),
+        }
+        if part_ids is not None:
+            payload['part_ids'] = part_ids
+        return json.dumps(payload, sort_keys=True).encode()
+
+
+    def make_batch(self, transactions):
+        """Signs a Batch holding transactions."""
+        from sawtooth_sdk.protobuf.batch_pb2 import BatchHeader
+        from sawtooth_sdk.protobuf.batch_pb2 import Batch
+
+        transaction_signatures = [t.header_signature for t in transactions]
+
+        header = BatchHeader(
+            signer_public_key=self._public_key,
+            transaction_ids=transaction_signatures
+        ).SerializeToString()
+
+        signature = self._signer.sign(header)
+
+        return Batch(
+            header=header,
+            transactions=transactions,
+            header_signature=signature
+        )
+
+
+    def _create_batch_list(self, transactions):
+        from sawtooth_sdk.protobuf.batch_pb2 import BatchList
+
+        return BatchList(batches=[self.make_batch(transactions)])
+
+
+class SupplierBatch(SupplierClientBase):
+    def __init__(self, base_url, keyfile=None, session=None,
+                 timeout=DEFAULT_TIMEOUT, family_version=FAMILY_VERSION,
+                 private_key=None, index=None,
+                 index_max_age=DEFAULT_INDEX_MAX_AGE):
+        """index, a SupplierIndex, turns on read-through mode: retrieves
+        and listings are answered from it, and a supplier it does not
+        hold is fetched from the REST API. The index is synced first
+        unless it was synced less than index_max_age seconds ago, or, if
+        index_max_age is None, unless it was ever synced.
+        """
+        super().__init__(base_url, keyfile, family_version, private_key)
+
+        self._owns_session = session is None
+        self._session = create_session() if session is None else session
+        self._timeout = timeout
+        self._index = index
+        self._index_max_age = index_max_age
+
         
     def create(self,supplier_id,short_id,supplier_name,passwd,supplier_url, auth_user=None, auth_password=None):
         return self.create_supplier_transaction(supplier_id,short_id,supplier_name,passwd,supplier_url, "create",
@@ -73,41 +399,222 @@ class SupplierBatch:
 
    
         
-    def add_part(self,supplier_id,part_id):
-        return self.create_supplier_transaction(supplier_id,"","","","","AddPart",part_id)
+    def add_part(self,supplier_id,part_id, auth_user=None, auth_password=None):
+        return self.create_supplier_transaction(supplier_id,"","","","","AddPart",part_id,
+                                 auth_user=auth_user,
+                                 auth_password=auth_password)
 
-        
-    def list_supplier(self, auth_user=None, auth_password=None):
-        supplier_prefix = self._get_prefix()
 
-        result = self._send_request(
-            "state?address={}".format(supplier_prefix),
+    def add_parts(self, supplier_id, part_ids, auth_user=None,
+                  auth_password=None):
+        """Links many parts to a supplier. Lists longer than
+        MAX_PARTS_PER_TRANSACTION are split over several AddParts
+        transactions, sent together in one batch.
+        """
+        batch_list = self._create_batch_list(
+            self.make_add_parts_transactions(supplier_id, part_ids))
+
+        return self._send_request(
+            "batches", batch_list.SerializeToString(),
+            'application/octet-stream',
             auth_user=auth_user,
             auth_password=auth_password
         )
 
-        try:
-            encoded_entries = yaml.safe_load(result)["data"]
 
-            return [
-                base64.b64decode(entry["data"]) for entry in encoded_entries
-            ]
+    def migrate_parts(self, supplier_id, short_id="", auth_user=None,
+                      auth_password=None):
+        """Moves the parts held inside a supplier record written by family
+        version 1.0 to their own addresses. Given the supplier's short_id,
+        it also writes the short_id entry a 1.0 create does not, so
+        retrieve_supplier_by_short_id finds the supplier; the transaction
+        is rejected if another supplier holds the short_id.
+        """
+        return self.create_supplier_transaction(
+            supplier_id, short_id, "", "", "", "MigrateParts",
+            auth_user=auth_user,
+            auth_password=auth_password)
 
-        except BaseException:
-            return None
+        
+    def list_supplier(self, auth_user=None, auth_password=None):
+        return list(self.iter_suppliers(
+            auth_user=auth_user, auth_password=auth_password))
+
+
+    def iter_suppliers(self, page_size=DEFAULT_PAGE_SIZE, auth_user=None,
+                       auth_password=None):
+        """Yields every supplier record in the namespace, one at a time.
+
+        Pages of page_size entries are fetched on demand by following the
+        REST API's paging cursor, so only one page is held in memory.
+        """
+        if self._index is not None:
+            self._refresh_index(auth_user, auth_password)
+            return self._index.iter_suppliers()
+
+        return self._iter_state(
+            self._get_prefix(), page_size, auth_user, auth_password)
+
+
+    def _iter_state(self, prefix, page_size=DEFAULT_PAGE_SIZE,
+                    auth_user=None, auth_password=None):
+        for _, data in self.iter_state_entries(
+                prefix, page_size, auth_user=auth_user,
+                auth_password=auth_password):
+            yield data
+
+
+    def iter_state_entries(self, prefix, page_size=DEFAULT_PAGE_SIZE,
+                           head=None, auth_user=None, auth_password=None):
+        """Yields (address, data) for every entry under prefix, as of
+        block head if given.
+        """
+        return self._iter_pages(
+            lambda start: _state_page_suffix(prefix, page_size, start, head),
+            lambda entry: (entry["address"], base64.b64decode(entry["data"])),
+            auth_user, auth_password)
+
+
+    def iter_blocks(self, page_size=DEFAULT_PAGE_SIZE, auth_user=None,
+                    auth_password=None):
+        """Yields the blocks of the chain as REST API JSON, newest first."""
+        return self._iter_pages(
+            lambda start: "blocks?limit={}".format(page_size) + (
+                "" if start is None else "&start={}".format(start)),
+            lambda block: block,
+            auth_user, auth_password)
+
+
+    def _iter_pages(self, make_suffix, convert, auth_user, auth_password):
+        start = None
+        while True:
+            result = self._send_request(
+                make_suffix(start),
+                auth_user=auth_user,
+                auth_password=auth_password
+            )
+            items, start = _parse_state_page(result)
+
+            for item in items:
+                yield convert(item)
+
+            if start is None:
+                return
+
+
+    def get_state(self, address, head=None, auth_user=None,
+                  auth_password=None):
+        """Returns the data at address, as of block head if given, or None
+        if there is none.
+        """
+        suffix = "state/{}".format(address)
+        if head is not None:
+            suffix += "?head={}".format(head)
+        result = self._send_request(suffix, missing_ok=True,
+                                    auth_user=auth_user,
+                                    auth_password=auth_password)
+        return None if result is None else _parse_state(result)
 
         
     def retrieve_supplier(self, supplier_id, auth_user=None, auth_password=None):
+        if self._index is not None:
+            self._refresh_index(auth_user, auth_password)
+            supplier = self._index.retrieve_supplier(supplier_id)
+            if supplier is not None:
+                return supplier
+
+        return self._fetch_supplier(supplier_id, False, auth_user,
+                                    auth_password)
+
+
+    def retrieve_suppliers(self, supplier_ids,
+                           concurrency=DEFAULT_RETRIEVE_CONCURRENCY,
+                           auth_user=None, auth_password=None):
+        """Retrieves many suppliers, up to concurrency at a time over the
+        client's connection pool.
+
+        Returns a dict of supplier id to the record retrieve_supplier
+        would return, in the order the ids were given, with None for ids
+        that have no supplier. Any other error, including a record that
+        cannot be decoded, fails the whole call.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        supplier_ids = list(dict.fromkeys(supplier_ids))
+        suppliers = dict.fromkeys(supplier_ids)
+        missing = supplier_ids
+        if self._index is not None:
+            self._refresh_index(auth_user, auth_password)
+            for supplier_id in supplier_ids:
+                suppliers[supplier_id] = \
+                    self._index.retrieve_supplier(supplier_id)
+            missing = [supplier_id for supplier_id in supplier_ids
+                       if suppliers[supplier_id] is None]
+
+        if not missing:
+            return suppliers
+
+        with ThreadPoolExecutor(
+                max_workers=max(min(concurrency, len(missing)), 1)) as pool:
+            fetched = pool.map(
+                lambda supplier_id: self._fetch_supplier(
+                    supplier_id, True, auth_user, auth_password),
+                missing)
+            suppliers.update(zip(missing, fetched))
+        return suppliers
+
+
+    def _fetch_supplier(self, supplier_id, missing_ok, auth_user,
+                        auth_password):
         address = self._get_address(supplier_id)
 
         result = self._send_request("state/{}".format(address), supplier_id=supplier_id,
                                     auth_user=auth_user,
-                                    auth_password=auth_password)
-        try:
-            return base64.b64decode(yaml.safe_load(result)["data"])
+                                    auth_password=auth_password,
+                                    missing_ok=missing_ok)
+        supplier = None if result is None else _parse_state(result)
+        if supplier is None:
+            return None
 
-        except BaseException:
+        part_links = self._iter_state(
+            self._get_part_prefix(supplier_id),
+            auth_user=auth_user, auth_password=auth_password)
+        try:
+            return _merge_part_links(supplier, part_links)
+        except ValueError as err:
+            raise SupplierException(
+                'Malformed supplier record for {}: {}'.format(
+                    supplier_id, err))
+
+
+    def retrieve_supplier_by_short_id(self, short_id, auth_user=None,
+                                      auth_password=None):
+        """Returns the supplier with short_id, like retrieve_supplier, or
+        None. Suppliers are found through their short_id index entry,
+        which a family version 1.1 create writes; a supplier created by
+        1.0 has one once migrate_parts was given its short_id.
+        """
+        if self._index is not None:
+            self._refresh_index(auth_user, auth_password)
+            # Suppliers created by 1.0 may share a short_id; leave those
+            # to the index entry on chain
+            suppliers = self._index.find_by_short_id(short_id)
+            if len(suppliers) == 1:
+                return self._index.retrieve_supplier(
+                    codec.decode_supplier(suppliers[0])['supplier_id'])
+
+        link = self.get_state(self._get_short_id_address(short_id),
+                              auth_user=auth_user,
+                              auth_password=auth_password)
+        if link is None:
             return None
+        try:
+            supplier_id = json.loads(link.decode())['supplier_id']
+        except (ValueError, KeyError):
+            raise SupplierException(
+                'Malformed short_id entry for {}'.format(short_id))
+        return self.retrieve_supplier(supplier_id, auth_user=auth_user,
+                                      auth_password=auth_password)
 
 
     def _get_status(self, batch_id, wait, auth_user=None, auth_password=None):
@@ -116,44 +623,88 @@ class SupplierBatch:
                 'batch_statuses?id={}&wait={}'.format(batch_id, wait),
                 auth_user=auth_user,
                 auth_password=auth_password)
-            return yaml.safe_load(result)['data'][0]['status']
+            return _parse_status(result)
         except BaseException as err:
             raise SupplierException(err)
 
-    def _get_prefix(self):
-        return _sha512('supplier'.encode('utf-8'))[0:6]
+    def get_statuses(self, batch_ids, wait=0, auth_user=None,
+                     auth_password=None):
+        """Returns a dict of batch id to status for many batches in one
+        batch_statuses request, long-polling up to wait seconds for them
+        all to be committed or invalid.
+        """
+        return {
+            entry['id']: entry['status']
+            for entry in self.get_status_entries(
+                batch_ids, wait=wait,
+                auth_user=auth_user, auth_password=auth_password)
+        }
+
+    def get_status_entries(self, batch_ids, wait=0, auth_user=None,
+                           auth_password=None):
+        """Like get_statuses, but returns the status entries as the REST
+        API sends them: dicts with the batch id, its status and, for an
+        invalid batch, the invalid_transactions with their messages.
+
+        The ids are POSTed as a JSON list: comma-joined in the query
+        string, about 60 of them already exceed the request line limit
+        of the REST API.
+        """
+        try:
+            result = self._send_request(
+                'batch_statuses?wait={}'.format(wait),
+                json.dumps(list(batch_ids)), 'application/json',
+                auth_user=auth_user,
+                auth_password=auth_password)
+            return _parse_status_entries(result)
+        except BaseException as err:
+            raise SupplierException(err)
+
+    def _refresh_index(self, auth_user, auth_password):
+        synced_at = self._index.synced_at
+        if synced_at is None or (
+                self._index_max_age is not None and
+                time.time() - synced_at >= self._index_max_age):
+            self._index.sync(self, auth_user=auth_user,
+                             auth_password=auth_password)
+
+    def close(self):
+        """Closes the connection pool if this instance created it."""
+        if self._owns_session:
+            self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
 
-    def _get_address(self, supplier_id):
-        supplier_prefix = self._get_prefix()
-        address = _sha512(supplier_id.encode('utf-8'))[0:64]
-        return supplier_prefix + address
-    
-    
     def _send_request(
             self, suffix, data=None,
-            content_type=None, supplier_id=None, auth_user=None, auth_password=None):
-        if self._base_url.startswith("http://"):
-            url = "{}/{}".format(self._base_url, suffix)
-        else:
-            url = "http://{}/{}".format(self._base_url, suffix)
+            content_type=None, supplier_id=None, auth_user=None, auth_password=None,
+            missing_ok=False):
+        url = "{}/{}".format(self._base_url, suffix)
 
         headers = {}
         if auth_user is not None:
-            auth_string = "{}:{}".format(auth_user, auth_password)
-            b64_string = b64encode(auth_string.encode()).decode()
-            auth_header = 'Basic {}'.format(b64_string)
-            headers['Authorization'] = auth_header
+            headers['Authorization'] = \
+                _basic_auth_header(auth_user, auth_password)
 
         if content_type is not None:
             headers['Content-Type'] = content_type
 
         try:
             if data is not None:
-                result = requests.post(url, headers=headers, data=data)
+                result = self._session.post(
+                    url, headers=headers, data=data, timeout=self._timeout)
             else:
-                result = requests.get(url, headers=headers)
+                result = self._session.get(
+                    url, headers=headers, timeout=self._timeout)
+
+            if result.status_code == 404 and missing_ok:
+                return None
 
-            if result.status_code == 404:
+            elif result.status_code == 404:
                 raise SupplierException("No such supplier: {}".format(supplier_id))
 
             elif not result.ok:
@@ -168,57 +719,139 @@ class SupplierBatch:
     
     def create_supplier_transaction(self, supplier_id,short_id="",supplier_name="",passwd="",supplier_url="", action="",part_id="",
                      auth_user=None, auth_password=None):
-        
-        payload = ",".join([supplier_id,str(short_id),str(supplier_name),str(passwd),str(supplier_url), action,str(part_id)]).encode()
-
-        # Construct the address
-        address = self._get_address(supplier_id)
 
-        header = TransactionHeader(
-            signer_pubkey=self._signer.get_public_key().as_hex(),
-            family_name="supplier",
-            family_version="1.0",
-            inputs=[address],
-            outputs=[address],
-            dependencies=[],
-            payload_encoding="csv-utf8",
-            payload_sha512=_sha512(payload),
-            batcher_pubkey=self._signer.get_public_key().as_hex(),
-            nonce=time.time().hex().encode()
-        ).SerializeToString()
+        transaction = self.make_transaction(
+            supplier_id, short_id, supplier_name, passwd, supplier_url,
+            action, part_id)
 
-        signature = self._signer.sign(header)
+        batch_list = self._create_batch_list([transaction])
 
-        transaction = Transaction(
-            header=header,
-            payload=payload,
-            header_signature=signature
+        return self._send_request(
+            "batches", batch_list.SerializeToString(),
+            'application/octet-stream',
+            auth_user=auth_user,
+            auth_password=auth_password
         )
 
-        batch_list = self._create_batch_list([transaction])
-        batch_id = batch_list.batches[0].header_signature
-        
+
+    def submit_many(self, transactions, batch_size=DEFAULT_BATCH_SIZE,
+                    batches_per_list=DEFAULT_BATCHES_PER_LIST,
+                    auth_user=None, auth_password=None):
+        """Packs transactions into batches of at most batch_size and POSTs
+        them to /batches, batches_per_list batches per BatchList.
+
+        Transactions keep their order, so an AddPart queued after the
+        create of the same supplier is applied after it. Returns the
+        header signatures (batch ids) of every batch submitted.
+        """
+        builder = self.batch_builder(
+            batch_size=batch_size, batches_per_list=batches_per_list,
+            auth_user=auth_user, auth_password=auth_password)
+        with builder:
+            for transaction in transactions:
+                builder.add(transaction)
+
+        return builder.batch_ids
+
+
+    def batch_builder(self, batch_size=DEFAULT_BATCH_SIZE,
+                      batches_per_list=DEFAULT_BATCHES_PER_LIST,
+                      auth_user=None, auth_password=None):
+        return SupplierBatchBuilder(
+            self, batch_size=batch_size, batches_per_list=batches_per_list,
+            auth_user=auth_user, auth_password=auth_password)
+
+
+    def send_batch_list(self, batch_list, auth_user=None, auth_password=None):
+        """POSTs an already serialized BatchList to /batches."""
         return self._send_request(
+            "batches", batch_list,
+            'application/octet-stream',
+            auth_user=auth_user,
+            auth_password=auth_password
+        )
+
+
+    def _send_batches(self, batches, auth_user=None, auth_password=None):
+        from sawtooth_sdk.protobuf.batch_pb2 import BatchList
+
+        batch_list = BatchList(batches=batches)
+        self._send_request(
             "batches", batch_list.SerializeToString(),
             'application/octet-stream',
             auth_user=auth_user,
             auth_password=auth_password
         )
+        return [batch.header_signature for batch in batches]
 
-    
-    def _create_batch_list(self, transactions):
-        transaction_signatures = [t.header_signature for t in transactions]
 
-        header = BatchHeader(
-            signer_public_key=self._signer.get_public_key().as_hex(),
-            transaction_ids=transaction_signatures
-        ).SerializeToString()
+class SupplierBatchBuilder:
+    """Collects create/AddPart transactions and submits them in bulk.
 
-        signature = self._signer.sign(header)
+    Used as a context manager; batches are shipped whenever
+    batches_per_list of them are full and once more on exit:
 
-        batch = Batch(
-            header=header,
-            transactions=transactions,
-            header_signature=signature
-        )
-        return BatchList(batches=[batch])
\ No newline at end of file
+        with client.batch_builder(batch_size=500) as builder:
+            builder.create(supplier_id, short_id, name, passwd, url)
+            builder.add_part(supplier_id, part_id)
+        print(builder.batch_ids)
+    """
+
+    def __init__(self, client, batch_size=DEFAULT_BATCH_SIZE,
+                 batches_per_list=DEFAULT_BATCHES_PER_LIST,
+                 auth_user=None, auth_password=None):
+        if batch_size < 1 or batches_per_list < 1:
+            raise SupplierException(
+                'batch_size and batches_per_list must be positive')
+
+        self._client = client
+        self._batch_size = batch_size
+        self._batches_per_list = batches_per_list
+        self._auth_user = auth_user
+        self._auth_password = auth_password
+        self._transactions = []
+        self._batches = []
+        self.batch_ids = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.flush()
+
+    def create(self, supplier_id, short_id, supplier_name, passwd,
+               supplier_url):
+        self.add(self._client.make_create_transaction(
+            supplier_id, short_id, supplier_name, passwd, supplier_url))
+
+    def add_part(self, supplier_id, part_id):
+        self.add(self._client.make_add_part_transaction(supplier_id, part_id))
+
+    def add_parts(self, supplier_id, part_ids):
+        for transaction in self._client.make_add_parts_transactions(
+                supplier_id, part_ids):
+            self.add(transaction)
+
+    def add(self, transaction):
+        self._transactions.append(transaction)
+        if len(self._transactions) == self._batch_size:
+            self._seal_batch()
+            if len(self._batches) == self._batches_per_list:
+                self._send()
+
+    def flush(self):
+        if self._transactions:
+            self._seal_batch()
+        if self._batches:
+            self._send()
+        return self.batch_ids
+
+    def _seal_batch(self):
+        self._batches.append(self._client.make_batch(self._transactions))
+        self._transactions = []
+
+    def _send(self):
+        self.batch_ids.extend(self._client._send_batches(
+            self._batches, self._auth_user, self._auth_password))
+        self._batches = []
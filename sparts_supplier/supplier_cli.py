@@ -16,19 +16,22 @@
 
 from __future__ import print_function
 
+# Scripts run this CLI thousands of times, so module import time is most
+# of a read-only command's latency. Only the standard library modules
+# every command needs are imported here; each do_* function imports what
+# its subcommand uses, so retrieve and list-supplier never load signing,
+# protobuf or the bulk machinery, and colorlog and pkg_resources are
+# loaded only when something is logged or --version is given.
+# benchmarks/bench_cli_import.py tracks the cost per subcommand.
+
 import argparse
 import getpass
 import logging
 import os
 import traceback
 import sys
-import pkg_resources
 import json
-import re
-
-from colorlog import ColoredFormatter
 
-from sparts_supplier.supplier_batch import SupplierBatch
 from sparts_supplier.exceptions import SupplierException
 
 
@@ -38,9 +41,21 @@ DISTRIBUTION_NAME = 'sparts-supplier'
 DEFAULT_URL = 'http://127.0.0.1:8080'
 
 
-def create_console_handler(verbose_level):
-    clog = logging.StreamHandler()
-    formatter = ColoredFormatter(
+class _ColoredStreamHandler(logging.StreamHandler):
+    """StreamHandler that creates its colorlog formatter, and so imports
+    colorlog, when the first record is emitted.
+    """
+
+    def format(self, record):
+        if self.formatter is None:
+            self.setFormatter(create_colored_formatter())
+        return super().format(record)
+
+
+def create_colored_formatter():
+    from colorlog import ColoredFormatter
+
+    return ColoredFormatter(
         "%(log_color)s[%(asctime)s %(levelname)-8s%(module)s]%(reset)s "
         "%(white)s%(message)s",
         datefmt="%H:%M:%S",
@@ -53,7 +68,9 @@ def create_console_handler(verbose_level):
             'CRITICAL': 'red',
         })
 
-    clog.setFormatter(formatter)
+
+def create_console_handler(verbose_level):
+    clog = _ColoredStreamHandler()
 
     if verbose_level == 0:
         clog.setLevel(logging.WARN)
@@ -136,6 +153,9 @@ def add_create_parser(subparsers, parent_parser):
         default=False,
         help='disable client validation')
 
+    add_family_version_arg(parser)
+    add_wait_arg(parser)
+
 
 def add_list_parser(subparsers, parent_parser):
     parser = subparsers.add_parser(
@@ -143,6 +163,8 @@ def add_list_parser(subparsers, parent_parser):
         help='List all the suppliers',
         parents=[parent_parser])
 
+    add_index_args(parser)
+
     parser.add_argument(
         '--url',
         type=str,
@@ -175,14 +197,34 @@ def add_retrieve_parser(subparsers, parent_parser):
     parser = subparsers.add_parser(
         'retrieve',
         help='Get the supplier by supplier ID',
-        description='',
+        description='Prints one supplier as JSON, or with several IDs or '
+        '--ids-file one JSON line per ID, fetched concurrently',
         parents=[parent_parser])
 
     parser.add_argument(
-        'supplier_id',
+        'supplier_ids',
+        metavar='supplier_id',
         type=str,
+        nargs='*',
         help='an identifier for the supplier')
 
+    parser.add_argument(
+        '--ids-file',
+        type=argparse.FileType('r'),
+        help='file with one supplier ID per line, or - for stdin')
+
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        help='suppliers fetched at once')
+
+    parser.add_argument(
+        '--short-id',
+        type=str,
+        help='find the supplier by its short identifier instead')
+
+    add_index_args(parser)
+
     parser.add_argument(
         '--url',
         type=str,
@@ -223,7 +265,252 @@ def add_part_parser(subparsers, parent_parser):
         'part_id',
         type=str,
         help='the identifier for Part')
-    
+
+    add_connection_args(parser)
+    add_family_version_arg(parser)
+    add_wait_arg(parser)
+
+
+def add_parts_parser(subparsers, parent_parser):
+    parser = subparsers.add_parser(
+        'AddParts',
+        help='Links many parts to a supplier in one transaction',
+        description='Reads part IDs, one per line, from a file or stdin '
+        'and links them to the supplier in one batch of AddParts '
+        'transactions of up to 1000 part IDs each. AddParts is a family '
+        'version 1.1 action, so every processor must support 1.1',
+        parents=[parent_parser])
+
+    parser.add_argument(
+        'supplier_id',
+        type=str,
+        help='the identifier for the supplier')
+
+    parser.add_argument(
+        'parts_file',
+        type=argparse.FileType('r'),
+        nargs='?',
+        default='-',
+        help='file with one part ID per line (default: stdin)')
+
+    add_connection_args(parser)
+    add_wait_arg(parser)
+
+
+def add_make_batch_file_parser(subparsers, parent_parser):
+    parser = subparsers.add_parser(
+        'make-batch-file',
+        help='Signs transactions into a batch file for later submission',
+        description='Reads transactions as JSON lines, e.g. '
+        '{"action": "AddPart", "supplier_id": "s1", "part_id": "p1"}, '
+        'and writes them as signed BatchLists to a batch file',
+        parents=[parent_parser])
+
+    parser.add_argument(
+        'input_file',
+        type=argparse.FileType('r'),
+        help='file with one JSON transaction per line, or - for stdin')
+
+    parser.add_argument(
+        'output_file',
+        type=str,
+        help='batch file to write')
+
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        help='transactions per batch')
+
+    parser.add_argument(
+        '--batches-per-list',
+        type=int,
+        help='batches per BatchList')
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help='signing processes (default: one per CPU)')
+
+    parser.add_argument(
+        '--username',
+        type=str,
+        help="identify name of user's private key file")
+
+    parser.add_argument(
+        '--key-dir',
+        type=str,
+        help="identify directory of user's private key file")
+
+    add_family_version_arg(parser)
+
+
+def add_submit_file_parser(subparsers, parent_parser):
+    parser = subparsers.add_parser(
+        'submit-file',
+        help='Submits a batch file written by make-batch-file',
+        description='POSTs the BatchLists of a batch file to the REST API',
+        parents=[parent_parser])
+
+    parser.add_argument(
+        'batch_file',
+        type=str,
+        help='batch file to submit')
+
+    parser.add_argument(
+        '--offset',
+        type=int,
+        help='byte offset of the first record to submit, as reported '
+        'by a failed submission')
+
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        help='BatchLists POSTed at once (default: 1); above 1 a BatchList '
+        'may overtake an earlier one, which is only safe when no '
+        'transaction depends on an earlier one')
+
+    add_connection_args(parser)
+
+
+def add_sync_index_parser(subparsers, parent_parser):
+    parser = subparsers.add_parser(
+        'sync-index',
+        help='Brings a local supplier index up to the chain head',
+        description='Creates or updates the SQLite index that retrieve '
+        'and list-supplier read with --index',
+        parents=[parent_parser])
+
+    parser.add_argument(
+        'index',
+        type=str,
+        help='index database file')
+
+    add_connection_args(parser)
+
+
+def add_import_parser(subparsers, parent_parser):
+    parser = subparsers.add_parser(
+        'import',
+        help='Imports suppliers and part links from a CSV or JSONL file',
+        description='Streams rows with supplier_id, short_id, '
+        'supplier_name, passwd, supplier_url and part_id fields into '
+        'batched submissions and reports the rows that were rejected. '
+        'A batch the chain rejects loses all of its rows; only with '
+        '--wait are the batch statuses checked and such rows reported, '
+        'otherwise the status is "submitted"',
+        parents=[parent_parser])
+
+    parser.add_argument(
+        'input_file',
+        type=argparse.FileType('r'),
+        help='CSV file with a header line or JSON lines, or - for stdin')
+
+    parser.add_argument(
+        '--format',
+        choices=['csv', 'jsonl'],
+        help='input format (default: from the file extension, else csv)')
+
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        help='transactions per batch')
+
+    parser.add_argument(
+        '--batches-per-list',
+        type=int,
+        help='batches per BatchList')
+
+    parser.add_argument(
+        '--parts-per-transaction',
+        type=int,
+        help='consecutive part links of a supplier folded into one '
+        'AddParts transaction')
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help='signing processes (default: one per CPU)')
+
+    parser.add_argument(
+        '--max-in-flight',
+        type=int,
+        help='BatchLists POSTed at once; above 1 rows may be applied out '
+        'of order')
+
+    parser.add_argument(
+        '--quiet',
+        action='store_true',
+        default=False,
+        help='do not print progress to stderr')
+
+    add_connection_args(parser)
+    add_family_version_arg(parser)
+    add_wait_arg(parser)
+
+
+def add_connection_args(parser):
+    parser.add_argument(
+        '--url',
+        type=str,
+        help='specify URL of REST API')
+
+    parser.add_argument(
+        '--username',
+        type=str,
+        help="identify name of user's private key file")
+
+    parser.add_argument(
+        '--key-dir',
+        type=str,
+        help="identify directory of user's private key file")
+
+    parser.add_argument(
+        '--auth-user',
+        type=str,
+        help='specify username for authentication if REST API '
+        'is using Basic Auth')
+
+    parser.add_argument(
+        '--auth-password',
+        type=str,
+        help='specify password for authentication if REST API '
+        'is using Basic Auth')
+
+
+def add_index_args(parser):
+    parser.add_argument(
+        '--index',
+        type=str,
+        help='answer from this local index database, brought up to the '
+        'chain head first; suppliers it lacks are fetched from the REST '
+        'API')
+
+    parser.add_argument(
+        '--index-max-age',
+        type=float,
+        metavar='SECONDS',
+        help='skip syncing the index if it was synced less than SECONDS '
+        'ago (default: 0, sync every time)')
+
+
+def add_family_version_arg(parser):
+    parser.add_argument(
+        '--family-version',
+        choices=['1.0', '1.1'],
+        help='family version of the transactions (default: 1.0); use 1.1 '
+        'only once every processor supports it, as transactions of a '
+        'version no processor handles stay pending')
+
+
+def add_wait_arg(parser):
+    parser.add_argument(
+        '--wait',
+        type=int,
+        nargs='?',
+        const=30,
+        metavar='SECONDS',
+        help='wait up to SECONDS (default: 30) for the batch to be '
+        'committed and report its final status')
 
 
 
@@ -235,21 +522,36 @@ def create_parent_parser(prog_name):
         action='count',
         help='enable more verbose output')
 
-    try:
-        version = pkg_resources.get_distribution(DISTRIBUTION_NAME).version
-    except pkg_resources.DistributionNotFound:
-        version = 'UNKNOWN'
-
     parent_parser.add_argument(
         '-V', '--version',
-        action='version',
-        version=(DISTRIBUTION_NAME + ' (Hyperledger Sawtooth) version {}')
-        .format(version),
+        action=_VersionAction,
         help='display version information')
 
     return parent_parser
 
 
+class _VersionAction(argparse.Action):
+    """--version that looks the version up only when it is given."""
+
+    def __init__(self, option_strings, dest=argparse.SUPPRESS,
+                 default=argparse.SUPPRESS, help=None):
+        super().__init__(option_strings=option_strings, dest=dest,
+                         default=default, nargs=0, help=help)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        import pkg_resources
+
+        try:
+            version = \
+                pkg_resources.get_distribution(DISTRIBUTION_NAME).version
+        except pkg_resources.DistributionNotFound:
+            version = 'UNKNOWN'
+
+        print((DISTRIBUTION_NAME + ' (Hyperledger Sawtooth) version {}')
+              .format(version))
+        parser.exit()
+
+
 def create_parser(prog_name):
     parent_parser = create_parent_parser(prog_name)
 
@@ -264,62 +566,87 @@ def create_parser(prog_name):
     add_create_parser(subparsers, parent_parser)
     add_list_parser(subparsers, parent_parser)
     add_retrieve_parser(subparsers, parent_parser)
+    add_part_parser(subparsers, parent_parser)
+    add_parts_parser(subparsers, parent_parser)
+    add_make_batch_file_parser(subparsers, parent_parser)
+    add_submit_file_parser(subparsers, parent_parser)
+    add_import_parser(subparsers, parent_parser)
+    add_sync_index_parser(subparsers, parent_parser)
 
     return parser
 
 
 def do_list_supplier(args):
+    from sparts_supplier.supplier_batch import SupplierBatch
+
     url = _get_url(args)
     auth_user, auth_password = _get_auth_info(args)
 
-    client = SupplierBatch(base_url=url, keyfile=None)
+    client = SupplierBatch(base_url=url, keyfile=None,
+                           index=_open_index(args),
+                           index_max_age=_get_index_max_age(args))
 
     result = client.list_supplier(auth_user=auth_user,
                                  auth_password=auth_password)
 
     if result is not None:
-        out = refine_output_supplier(str(result))
-        output = refine_output(out)
+        output = refine_output(result)
         print(output)
     else:
         raise SupplierException("Could not retrieve supplier listing.")
     
     
-def refine_output_supplier(inputstr):
-    inputstr = inputstr[1:-1]
-    output = re.sub(r'\[.*?\]', '',inputstr)
-    output = "["+output+"]"  
-    return output
-
-def refine_output(inputstr):
-    
-                subpartstr = "\"parts\": ,"
-                outputstr=inputstr.replace(subpartstr,"").replace('b\'','').replace('}\'','}').replace(", \"parts\": ","")
-                outputstr=outputstr.replace('b\'','').replace('}\'','}')
-                slist = outputstr.split("},")
-                supplierlist = []
-                for line in slist:
-                        record = "{"+line.split(",{",1)[-1]+"}"
-                        supplierlist.append(record)
-                joutput = str(supplierlist)
-                joutput = joutput.replace("'{","{").replace("}'","}").replace(", { {",", {").replace("}]}]","}]")
-                joutput = amend_supplier_fields(joutput)
-                return joutput
-
-def amend_supplier_fields(inputstr):
-        output = inputstr.replace("\\","").replace('supplier_id','uuid').replace('supplier_name','name').replace('supplier_url','url')
-        return output
-
-
-def do_retrieve(args, config):
-    supplier_id = args.supplier_id
+def refine_output(entries):
+    from sparts_supplier import codec
+
+    supplierlist = []
+    for entry in entries:
+        supplier = codec.decode_supplier(entry)
+        del supplier['parts']
+        supplierlist.append(amend_supplier_fields(supplier))
+    return json.dumps(supplierlist)
+
+_FIELD_NAMES = {
+    'supplier_id': 'uuid',
+    'supplier_name': 'name',
+    'supplier_url': 'url',
+}
+
+def amend_supplier_fields(supplier):
+    return {_FIELD_NAMES.get(key, key): value
+            for key, value in supplier.items()}
+
+
+def do_retrieve(args):
+    from sparts_supplier.supplier_batch import SupplierBatch
+
+    supplier_ids = list(args.supplier_ids)
+    if args.ids_file is not None:
+        with args.ids_file as ids_file:
+            supplier_ids += [line.strip() for line in ids_file
+                             if line.strip()]
+    if bool(supplier_ids) == (args.short_id is not None):
+        raise SupplierException(
+            "Give either supplier IDs or --short-id")
 
     url = _get_url(args)
     auth_user, auth_password = _get_auth_info(args)
 
-    client = SupplierBatch(base_url=url, keyfile=None)
+    if args.short_id is None and (
+            len(supplier_ids) != 1 or args.ids_file is not None):
+        _retrieve_many(args, supplier_ids, url, auth_user, auth_password)
+        return
 
-    result = client.retrieve_supplier(supplier_id, auth_user=auth_user, auth_password=auth_password).decode()
+    supplier_id = args.short_id or supplier_ids[0]
+    client = SupplierBatch(base_url=url, keyfile=None,
+                           index=_open_index(args),
+                           index_max_age=_get_index_max_age(args))
+
+    if args.short_id is not None:
+        result = client.retrieve_supplier_by_short_id(
+            args.short_id, auth_user=auth_user, auth_password=auth_password)
+    else:
+        result = client.retrieve_supplier(supplier_id, auth_user=auth_user, auth_password=auth_password)
 
     if result is not None:
         result = filter_output(result)
@@ -328,29 +655,86 @@ def do_retrieve(args, config):
     else:
         raise SupplierException("Supplier not found: {}".format(supplier_id))
 
+def _retrieve_many(args, supplier_ids, url, auth_user, auth_password):
+    from sparts_supplier.supplier_batch import DEFAULT_RETRIEVE_CONCURRENCY
+    from sparts_supplier.supplier_batch import SupplierBatch
+    from sparts_supplier.supplier_batch import create_session
+
+    concurrency = _or_default(args.concurrency,
+                              DEFAULT_RETRIEVE_CONCURRENCY)
+
+    with create_session(pool_size=concurrency) as session:
+        client = SupplierBatch(base_url=url, session=session,
+                               index=_open_index(args),
+                               index_max_age=_get_index_max_age(args))
+        suppliers = client.retrieve_suppliers(
+            supplier_ids, concurrency=concurrency,
+            auth_user=auth_user, auth_password=auth_password)
+
+    for supplier_id, result in suppliers.items():
+        if result is None:
+            print(json.dumps({'uuid': supplier_id,
+                              'status': '404 Not Found'}))
+        else:
+            print(filter_output(result))
+
 def removekey(d,key):
     r = dict(d)
     del r[key]
     return r
 
 def print_msg(response):
-    if "batch_status?id" in response:
+    if "batch_status" in response:
         print ("{\"status\":\"success\"}")
     else:
         print ("{\"status\":\"exception\"}")
 
+
+def report_response(client, response, args, auth_user, auth_password):
+    batch_ids = _batch_ids_from_response(response)
+    if args.wait is None or not batch_ids:
+        print_msg(response)
+        return
+
+    from sparts_supplier.batch_status import BatchStatusTracker
+    from sparts_supplier.batch_status import COMMITTED
+    from sparts_supplier.batch_status import INVALID
+
+    tracker = BatchStatusTracker(batch_ids)
+    tracker.wait(client, timeout=args.wait, wait=args.wait,
+                 auth_user=auth_user, auth_password=auth_password)
+    counts = tracker.counts()
+    if counts[INVALID]:
+        raise SupplierException("Batch is invalid")
+    if counts[COMMITTED] == len(batch_ids):
+        print ("{\"status\":\"success\"}")
+    else:
+        print (json.dumps({'status': 'pending'}))
+
+
+def _batch_ids_from_response(response):
+    from urllib.parse import parse_qs
+    from urllib.parse import urlparse
+
+    try:
+        link = json.loads(response)['link']
+    except (ValueError, KeyError, TypeError):
+        return []
+    ids = parse_qs(urlparse(link).query).get('id', [])
+    return [batch_id for value in ids for batch_id in value.split(',')]
+
 def filter_output(result):
-    
-    supplierlist = result.split(',',1)
-    suppstr = supplierlist[1]
-    jsonStr = suppstr.replace('supplier_id','uuid').replace('supplier_name','name').replace('supplier_url','url')
-    data = json.loads(jsonStr)
+    from sparts_supplier import codec
+
+    data = amend_supplier_fields(codec.decode_supplier(result))
     jsonStr = json.dumps(data)
     return jsonStr
 
 
 
 def do_create(args):
+    from sparts_supplier.supplier_batch import SupplierBatch
+
     supplier_id = args.supplier_id
     short_id = args.short_id
     supplier_name = args.supplier_name
@@ -361,14 +745,15 @@ def do_create(args):
     keyfile = _get_keyfile(args)
     auth_user, auth_password = _get_auth_info(args)
 
-    client = SupplierBatch(base_url=url, keyfile=keyfile)
+    client = SupplierBatch(base_url=url, keyfile=keyfile,
+                           family_version=_get_family_version(args))
 
     response = client.create(
             supplier_id,short_id,supplier_name,passwd,supplier_url,
             auth_user=auth_user,
             auth_password=auth_password)
 
-    print_msg(response)
+    report_response(client, response, args, auth_user, auth_password)
 
 
 def _get_url(args):
@@ -383,6 +768,18 @@ def _get_keyfile(args):
     return '{}/{}.priv'.format(key_dir, username)
 
 
+def _get_family_version(args):
+    from sparts_supplier.supplier_batch import FAMILY_VERSION
+
+    return _or_default(args.family_version, FAMILY_VERSION)
+
+
+def _or_default(value, default):
+    # Option defaults that live in modules the parser must not import are
+    # filled in by the subcommand.
+    return default if value is None else value
+
+
 def _get_auth_info(args):
     auth_user = args.auth_user
     auth_password = args.auth_password
@@ -413,11 +810,23 @@ def main(prog_name=os.path.basename(sys.argv[0]), args=None):
         do_retrieve(args)
     elif args.command == 'AddPart':
         do_addpart(args) 
+    elif args.command == 'AddParts':
+        do_addparts(args)
+    elif args.command == 'make-batch-file':
+        do_make_batch_file(args)
+    elif args.command == 'submit-file':
+        do_submit_file(args)
+    elif args.command == 'import':
+        do_import(args)
+    elif args.command == 'sync-index':
+        do_sync_index(args)
         
     else:
         raise SupplierException("invalid command: {}".format(args.command))
 
 def do_addpart(args):
+    from sparts_supplier.supplier_batch import SupplierBatch
+
     supplier_id = args.supplier_id
     part_id = args.part_id
    
@@ -426,9 +835,156 @@ def do_addpart(args):
     auth_user, auth_password = _get_auth_info(args)
 
     client = SupplierBatch(base_url=url,
-                      keyfile=keyfile)
-    response = client.add_part(supplier_id,part_id)
-    print_msg(response)
+                      keyfile=keyfile,
+                      family_version=_get_family_version(args))
+    response = client.add_part(supplier_id,part_id,
+                               auth_user=auth_user,
+                               auth_password=auth_password)
+    report_response(client, response, args, auth_user, auth_password)
+
+def do_addparts(args):
+    from sparts_supplier.supplier_batch import SupplierBatch
+
+    with args.parts_file as parts_file:
+        part_ids = [line.strip() for line in parts_file if line.strip()]
+
+    if not part_ids:
+        raise SupplierException("No part IDs given")
+
+    url = _get_url(args)
+    keyfile = _get_keyfile(args)
+    auth_user, auth_password = _get_auth_info(args)
+
+    client = SupplierBatch(base_url=url, keyfile=keyfile,
+                           family_version='1.1')
+    response = client.add_parts(args.supplier_id, part_ids,
+                                auth_user=auth_user,
+                                auth_password=auth_password)
+    report_response(client, response, args, auth_user, auth_password)
+
+def do_make_batch_file(args):
+    from sparts_supplier import batch_file
+    from sparts_supplier.bulk import BulkTransactionFactory
+    from sparts_supplier.supplier_batch import DEFAULT_BATCH_SIZE
+    from sparts_supplier.supplier_batch import DEFAULT_BATCHES_PER_LIST
+    from sparts_supplier.supplier_batch import read_private_key
+
+    private_key = read_private_key(_get_keyfile(args))
+
+    factory = BulkTransactionFactory(
+        private_key, workers=args.workers,
+        batch_size=_or_default(args.batch_size, DEFAULT_BATCH_SIZE),
+        family_version=_get_family_version(args))
+    with args.input_file as input_file, factory:
+        count = batch_file.write_batch_file(
+            args.output_file,
+            factory.iter_batch_lists(
+                batch_file.read_specs(input_file),
+                batches_per_list=_or_default(
+                    args.batches_per_list, DEFAULT_BATCHES_PER_LIST)))
+
+    print(json.dumps({'status': 'success', 'batch_lists': count}))
+
+def do_submit_file(args):
+    from sparts_supplier import batch_file
+    from sparts_supplier.supplier_batch import SupplierBatch
+    from sparts_supplier.supplier_batch import create_session
+
+    url = _get_url(args)
+    auth_user, auth_password = _get_auth_info(args)
+    concurrency = _or_default(args.concurrency,
+                              batch_file.DEFAULT_CONCURRENCY)
+
+    # One pooled connection per request in flight
+    with create_session(pool_size=concurrency) as session:
+        client = SupplierBatch(base_url=url, session=session)
+        count = batch_file.submit_batch_file(
+            client, args.batch_file, offset=args.offset,
+            concurrency=concurrency,
+            auth_user=auth_user, auth_password=auth_password)
+
+    print(json.dumps({'status': 'success', 'batch_lists': count}))
+
+def do_import(args):
+    from sparts_supplier import importer
+    from sparts_supplier.batch_status import BatchStatusTracker
+    from sparts_supplier.supplier_batch import DEFAULT_BATCH_SIZE
+    from sparts_supplier.supplier_batch import DEFAULT_BATCHES_PER_LIST
+    from sparts_supplier.supplier_batch import SupplierBatch
+    from sparts_supplier.supplier_batch import create_session
+    from sparts_supplier.supplier_batch import read_private_key
+
+    url = _get_url(args)
+    private_key = read_private_key(_get_keyfile(args))
+    auth_user, auth_password = _get_auth_info(args)
+    fmt = args.format or importer.detect_format(args.input_file.name)
+    max_in_flight = _or_default(args.max_in_flight,
+                                importer.DEFAULT_MAX_IN_FLIGHT)
+
+    progress = None if args.quiet else _print_progress
+
+    with create_session(pool_size=max_in_flight) as session:
+        client = SupplierBatch(base_url=url, session=session)
+        with args.input_file as input_file, importer.SupplierImporter(
+                client, private_key, workers=args.workers,
+                batch_size=_or_default(args.batch_size, DEFAULT_BATCH_SIZE),
+                batches_per_list=_or_default(
+                    args.batches_per_list, DEFAULT_BATCHES_PER_LIST),
+                parts_per_transaction=_or_default(
+                    args.parts_per_transaction,
+                    importer.DEFAULT_PARTS_PER_TRANSACTION),
+                max_in_flight=max_in_flight,
+                family_version=_get_family_version(args),
+                auth_user=auth_user,
+                auth_password=auth_password) as rows_importer:
+            report = rows_importer.run(
+                importer.read_rows(input_file, fmt), progress)
+
+        if progress is not None:
+            _print_progress(report)
+            print(file=sys.stderr)
+
+        if args.wait is not None and report.batch_ids:
+            tracker = BatchStatusTracker(report.batch_ids)
+            tracker.wait(client, timeout=args.wait, wait=args.wait,
+                         auth_user=auth_user, auth_password=auth_password)
+            report.add_batch_statuses(tracker)
+
+    print(json.dumps(report.as_dict()))
+    if report.status == 'failed':
+        sys.exit(1)
+
+def do_sync_index(args):
+    from sparts_supplier.supplier_batch import SupplierBatch
+    from sparts_supplier.supplier_index import SupplierIndex
+
+    url = _get_url(args)
+    auth_user, auth_password = _get_auth_info(args)
+
+    with SupplierIndex(args.index) as index, \
+            SupplierBatch(base_url=url) as client:
+        refreshed = index.sync(client, auth_user=auth_user,
+                               auth_password=auth_password)
+        print(json.dumps({'status': 'success', 'head': index.head,
+                          'refreshed': refreshed}))
+
+def _open_index(args):
+    if args.index is None:
+        return None
+
+    from sparts_supplier.supplier_index import SupplierIndex
+
+    return SupplierIndex(args.index)
+
+def _get_index_max_age(args):
+    from sparts_supplier.supplier_batch import DEFAULT_INDEX_MAX_AGE
+
+    return _or_default(args.index_max_age, DEFAULT_INDEX_MAX_AGE)
+
+def _print_progress(report):
+    print('\r{} rows, {:.0f} rows/s, {} errors'.format(
+        report.rows, report.rows_per_sec, report.error_count),
+        end='', file=sys.stderr, flush=True)
 
 def main_wrapper():
     try:
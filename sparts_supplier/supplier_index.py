@@ -0,0 +1,355 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""A local SQLite copy of the supplier namespace for fast lookups.
+
+SupplierIndex keeps every supplier record and part link, indexed by
+supplier_id, short_id, supplier name and part_id, so reads don't need the
+REST API:
+
+    index = SupplierIndex('suppliers.db')
+    with SupplierBatch(url, index=index, index_max_age=60) as client:
+        client.retrieve_supplier('acme')
+
+sync() brings it up to the chain head. The first sync copies the whole
+namespace. Later syncs walk back from the head to the block synced last
+and re-read only the addresses that supplier transactions in the newer
+blocks wrote; when the head has not moved, a sync costs one request for
+the newest block. If the last synced block is no longer on the chain (a
+fork), sync copies the namespace again. Reads see the index as of its
+last sync.
+"""
+
+import base64
+import json
+import sqlite3
+import threading
+import time
+
+from sparts_supplier import addressing
+from sparts_supplier import codec
+from sparts_supplier.exceptions import SupplierException
+
+
+# Length of an address under addressing.make_part_prefix.
+PART_PREFIX_LENGTH = 38
+
+ADDRESS_LENGTH = 70
+
+# Part links of one transaction read one by one during a sync; beyond
+# this the supplier's whole part prefix is listed instead.
+MAX_LINK_READS = 100
+
+# The short_id entries are not copied; the suppliers table indexes
+# short_id itself.
+_INDEXED_NAMESPACES = (addressing.NAMESPACE, addressing.PART_NAMESPACE)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS suppliers (
+    address TEXT PRIMARY KEY,
+    supplier_id TEXT NOT NULL,
+    short_id TEXT NOT NULL,
+    supplier_name TEXT NOT NULL,
+    part_prefix TEXT NOT NULL,
+    record BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS suppliers_supplier_id ON suppliers (supplier_id);
+CREATE INDEX IF NOT EXISTS suppliers_short_id ON suppliers (short_id);
+CREATE INDEX IF NOT EXISTS suppliers_name ON suppliers (supplier_name);
+CREATE INDEX IF NOT EXISTS suppliers_part_prefix ON suppliers (part_prefix);
+
+-- Part links (inline = 0) live at their own address. Parts held inside a
+-- family version 1.0 record (inline = 1) are listed under the address of
+-- the record.
+CREATE TABLE IF NOT EXISTS parts (
+    address TEXT NOT NULL,
+    part_id TEXT NOT NULL,
+    part_prefix TEXT NOT NULL,
+    inline INTEGER NOT NULL,
+    PRIMARY KEY (address, part_id)
+);
+CREATE INDEX IF NOT EXISTS parts_part_id ON parts (part_id);
+CREATE INDEX IF NOT EXISTS parts_part_prefix ON parts (part_prefix, inline);
+
+CREATE TABLE IF NOT EXISTS sync (
+    key TEXT PRIMARY KEY,
+    value
+);
+'''
+
+
+class SupplierIndex:
+    def __init__(self, path):
+        """Opens, or creates, the index database at path (':memory:' for
+        one that is not kept).
+        """
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            # Lets other processes read while a sync is writing
+            self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    @property
+    def head(self):
+        """Id of the block the index was last synced to, or None."""
+        return self._get_sync('head')
+
+    @property
+    def synced_at(self):
+        """Time of the last sync, or None if there never was one."""
+        return self._get_sync('synced_at')
+
+    def retrieve_supplier(self, supplier_id):
+        """Returns the supplier record with its part links merged in, in
+        the layout SupplierBatch.retrieve_supplier returns, or None.
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT record, part_prefix FROM suppliers '
+                'WHERE supplier_id = ?', (supplier_id,)).fetchone()
+            if row is None:
+                return None
+            part_ids = self._db.execute(
+                'SELECT part_id FROM parts '
+                'WHERE part_prefix = ? AND inline = 0 ORDER BY address',
+                (row[1],)).fetchall()
+
+        supplier = codec.decode_supplier(row[0])
+        supplier['parts'].extend(
+            {'part_id': part_id} for part_id, in part_ids)
+        return codec.encode_legacy_supplier(supplier)
+
+    def iter_suppliers(self):
+        """Yields every supplier record as stored, in address order."""
+        return self._records('SELECT record FROM suppliers ORDER BY address')
+
+    def find_by_short_id(self, short_id):
+        return self._records(
+            'SELECT record FROM suppliers WHERE short_id = ? '
+            'ORDER BY address', (short_id,))
+
+    def find_by_name(self, supplier_name):
+        return self._records(
+            'SELECT record FROM suppliers WHERE supplier_name = ? '
+            'ORDER BY address', (supplier_name,))
+
+    def find_by_part(self, part_id):
+        """Returns the records of the suppliers linked to part_id."""
+        return self._records(
+            'SELECT DISTINCT suppliers.address, suppliers.record '
+            'FROM parts JOIN suppliers '
+            'ON suppliers.part_prefix = parts.part_prefix '
+            'WHERE parts.part_id = ? ORDER BY suppliers.address',
+            (part_id,), column=1)
+
+    def sync(self, client, auth_user=None, auth_password=None):
+        """Brings the index up to the chain head through client, a
+        SupplierBatch, and returns the number of addresses re-read (every
+        entry of the namespace when it is copied in full).
+        """
+        # Look at the head alone first, so a sync with nothing to do
+        # stays cheap enough to run before every read
+        newest = next(client.iter_blocks(
+            page_size=1, auth_user=auth_user, auth_password=auth_password),
+            None)
+        if newest is None:
+            self._finish_sync(None, [])
+            return 0
+
+        last_head = self.head
+        if newest['header_signature'] == last_head:
+            self._finish_sync(newest, [])
+            return 0
+
+        blocks = client.iter_blocks(
+            auth_user=auth_user, auth_password=auth_password)
+        newest = next(blocks)
+
+        touched = None
+        if last_head is not None:
+            touched = _touched_since(
+                newest, blocks, last_head, int(self._get_sync('block_num')))
+
+        if touched is None:
+            return self._copy_namespace(
+                client, newest, auth_user, auth_password)
+        return self._refresh(
+            client, newest, touched, auth_user, auth_password)
+
+    def _copy_namespace(self, client, newest, auth_user, auth_password):
+        head = newest['header_signature']
+        statements = [('DELETE FROM suppliers', ()),
+                      ('DELETE FROM parts', ())]
+        count = 0
+        for prefix in (addressing.NAMESPACE, addressing.PART_NAMESPACE):
+            for address, data in client.iter_state_entries(
+                    prefix, head=head, auth_user=auth_user,
+                    auth_password=auth_password):
+                statements += _put(address, data)
+                count += 1
+        self._finish_sync(newest, statements)
+        return count
+
+    def _refresh(self, client, newest, touched, auth_user, auth_password):
+        head = newest['header_signature']
+        addresses, prefixes = touched
+        statements = []
+        for address in sorted(addresses):
+            data = client.get_state(address, head=head, auth_user=auth_user,
+                                    auth_password=auth_password)
+            statements += _delete(address)
+            if data is not None:
+                statements += _put(address, data)
+        for prefix in sorted(prefixes):
+            statements.append((
+                'DELETE FROM parts WHERE part_prefix = ? AND inline = 0',
+                (prefix,)))
+            for address, data in client.iter_state_entries(
+                    prefix, head=head, auth_user=auth_user,
+                    auth_password=auth_password):
+                statements += _put(address, data)
+        self._finish_sync(newest, statements)
+        return len(addresses) + len(prefixes)
+
+    def _finish_sync(self, newest, statements):
+        sync = {'synced_at': time.time()}
+        if newest is not None:
+            sync['head'] = newest['header_signature']
+            sync['block_num'] = int(newest['header']['block_num'])
+        with self._lock, self._db:
+            for statement, parameters in statements:
+                self._db.execute(statement, parameters)
+            self._db.executemany(
+                'INSERT OR REPLACE INTO sync (key, value) VALUES (?, ?)',
+                sync.items())
+
+    def _get_sync(self, key):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT value FROM sync WHERE key = ?', (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _records(self, query, parameters=(), column=0):
+        with self._lock:
+            rows = self._db.execute(query, parameters).fetchall()
+        return [row[column] for row in rows]
+
+
+def _touched_since(newest, older, last_head, last_block_num):
+    """Collects the addresses and part prefixes written by supplier
+    transactions in blocks newer than last_head. Returns None if
+    last_head is not an ancestor of newest.
+    """
+    addresses = set()
+    prefixes = set()
+    block = newest
+    while block is not None:
+        if block['header_signature'] == last_head:
+            return addresses, prefixes
+        if int(block['header']['block_num']) <= last_block_num:
+            return None
+        for batch in block['batches']:
+            for transaction in batch['transactions']:
+                _collect_outputs(transaction, addresses, prefixes)
+        block = next(older, None)
+    return None
+
+
+def _collect_outputs(transaction, addresses, prefixes):
+    header = transaction['header']
+    if header['family_name'] != addressing.FAMILY_NAME:
+        return
+
+    links = _link_addresses(transaction)
+    for output in header['outputs']:
+        if not output.startswith(_INDEXED_NAMESPACES):
+            continue
+        if len(output) == ADDRESS_LENGTH:
+            addresses.add(output)
+        elif links is not None:
+            addresses.update(links)
+        else:
+            prefixes.add(output)
+
+
+def _link_addresses(transaction):
+    """Returns the addresses of the part links a 1.1 create, AddPart or
+    AddParts may have written, or None if the part prefix it lists as an
+    output has to be listed again.
+    """
+    if transaction['header']['family_version'] == '1.0':
+        return None
+    try:
+        payload = json.loads(base64.b64decode(transaction['payload']))
+        supplier_id = str(payload['supplier_id'])
+        action = payload.get('action')
+        if action == 'create':
+            part_ids = []
+        elif action == 'AddPart':
+            part_ids = [str(payload.get('part_id') or '')]
+        elif action == 'AddParts':
+            part_ids = [str(part_id) for part_id in payload['part_ids']]
+        else:
+            return None
+    except (ValueError, KeyError, TypeError):
+        return None
+    if len(part_ids) > MAX_LINK_READS:
+        return None
+    return [addressing.make_part_address(supplier_id, part_id)
+            for part_id in part_ids]
+
+
+def _put(address, data):
+    if address.startswith(addressing.PART_NAMESPACE):
+        try:
+            part_id = json.loads(data.decode())['part_id']
+        except (ValueError, KeyError, TypeError):
+            raise SupplierException(
+                'Malformed part link at {}'.format(address))
+        return [('INSERT OR REPLACE INTO parts VALUES (?, ?, ?, 0)',
+                 (address, part_id, address[:PART_PREFIX_LENGTH]))]
+
+    try:
+        supplier = codec.decode_supplier(data)
+    except codec.CodecError as err:
+        raise SupplierException(
+            'Malformed supplier record at {}: {}'.format(address, err))
+    part_prefix = addressing.make_part_prefix(supplier['supplier_id'])
+    statements = [(
+        'INSERT OR REPLACE INTO suppliers VALUES (?, ?, ?, ?, ?, ?)',
+        (address, supplier['supplier_id'], supplier['short_id'],
+         supplier['supplier_name'], part_prefix, data))]
+    statements += [
+        ('INSERT OR REPLACE INTO parts VALUES (?, ?, ?, 1)',
+         (address, part['part_id'], part_prefix))
+        for part in supplier['parts']]
+    return statements
+
+
+def _delete(address):
+    if address.startswith(addressing.PART_NAMESPACE):
+        return [('DELETE FROM parts WHERE address = ?', (address,))]
+    return [('DELETE FROM suppliers WHERE address = ?', (address,)),
+            ('DELETE FROM parts WHERE address = ?', (address,))]
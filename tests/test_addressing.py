@@ -0,0 +1,67 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import hashlib
+
+import pytest
+
+from sparts_supplier import addressing
+from sparts_supplier.processor import handler
+from sparts_supplier.supplier_batch import SupplierBatch
+
+
+SUPPLIER_IDS = ['acme', 'Acme é', '', 'x' * 200]
+
+
+def sha512(text):
+    return hashlib.sha512(text.encode('utf-8')).hexdigest()
+
+
+@pytest.mark.parametrize('supplier_id', SUPPLIER_IDS)
+def test_addresses_match_the_unmemoized_derivation(supplier_id):
+    address = sha512('supplier')[:6] + sha512(supplier_id)[:64]
+
+    assert addressing.make_supplier_address(supplier_id) == address
+    # Asked twice, so the second answer comes from the cache
+    assert addressing.make_supplier_address(supplier_id) == address
+    assert handler.make_supplier_address(
+        addressing.NAMESPACE, supplier_id) == address
+    assert SupplierBatch('localhost')._get_address(supplier_id) == address
+
+
+def test_make_supplier_addresses_matches_make_supplier_address():
+    assert list(addressing.make_supplier_addresses(SUPPLIER_IDS)) == \
+        [addressing.make_supplier_address(supplier_id)
+         for supplier_id in SUPPLIER_IDS]
+
+
+def test_make_supplier_addresses_bypasses_the_cache():
+    before = addressing.make_supplier_address.cache_info()
+
+    list(addressing.make_supplier_addresses(
+        'bulk-{}'.format(i) for i in range(100)))
+
+    assert addressing.make_supplier_address.cache_info() == before
+
+
+def test_part_addresses():
+    part_address = addressing.make_part_address('acme', 'p1')
+
+    assert part_address == sha512('supplier-part')[:6] + \
+        sha512('acme')[:32] + sha512('p1')[:32]
+    assert part_address.startswith(addressing.make_part_prefix('acme'))
+    assert len(part_address) == 70
+    assert handler.make_part_address(
+        addressing.PART_NAMESPACE, 'acme', 'p1') == part_address
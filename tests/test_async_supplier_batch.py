@@ -0,0 +1,249 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import asyncio
+
+import pytest
+
+from sawtooth_signing import create_context
+
+from sparts_supplier import codec
+from sparts_supplier.async_supplier_batch import AsyncSupplierBatch
+from sparts_supplier.exceptions import SupplierException
+
+
+PRIVATE_KEY = create_context('secp256k1').new_random_private_key().as_hex()
+
+
+def run(make_client, scenario):
+    async def main():
+        async with make_client() as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+def connect(rest_api, **kwargs):
+    return lambda: AsyncSupplierBatch(
+        rest_api.url, private_key=PRIVATE_KEY, family_version='1.1',
+        **kwargs)
+
+
+class FakeResponse:
+    def __init__(self, status=200, text='{}'):
+        self.status = status
+        self.reason = 'Reason'
+        self._text = text
+
+    async def text(self):
+        return self._text
+
+
+class FakeRequest:
+    def __init__(self, session, label):
+        self._session = session
+        self._label = label
+
+    async def __aenter__(self):
+        session = self._session
+        session.in_flight += 1
+        session.peak = max(session.peak, session.in_flight)
+        session.started.append(self._label)
+        await asyncio.sleep(session.delays.pop(0) if session.delays else 0)
+        session.in_flight -= 1
+        session.finished.append(self._label)
+        return FakeResponse()
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class FakeSession:
+    """Stands in for an aiohttp session, recording how many requests are
+    in flight at once and the order they start and finish in.
+    """
+
+    def __init__(self, delays=()):
+        self.delays = list(delays)
+        self.in_flight = 0
+        self.peak = 0
+        self.started = []
+        self.finished = []
+
+    def get(self, url, headers):
+        return FakeRequest(self, url)
+
+    def post(self, url, headers, data):
+        return FakeRequest(self, data)
+
+    async def close(self):
+        pass
+
+
+def fake_client(session, **kwargs):
+    return lambda: AsyncSupplierBatch(
+        'rest-api:8008', session=session, private_key=PRIVATE_KEY,
+        family_version='1.1', **kwargs)
+
+
+def test_create_add_part_and_retrieve(rest_api):
+    async def scenario(client):
+        await client.create('acme', 'ac', 'Acme', 'secret', 'http://acme')
+        await client.add_part('acme', 'p1')
+        await client.add_parts('acme', ['p2', 'p3'])
+        return await client.retrieve_supplier('acme')
+
+    supplier = codec.decode_supplier(run(connect(rest_api), scenario))
+
+    assert supplier['supplier_name'] == 'Acme'
+    assert sorted(part['part_id'] for part in supplier['parts']) == \
+        ['p1', 'p2', 'p3']
+
+
+def test_retrieve_merges_inline_parts_and_links(rest_api):
+    async def scenario(client):
+        legacy = AsyncSupplierBatch(
+            rest_api.url, private_key=PRIVATE_KEY, family_version='1.0')
+        async with legacy:
+            await legacy.create('acme', 'ac', 'Acme', 'secret', '')
+            await legacy.add_part('acme', 'inline')
+        await client.add_part('acme', 'linked')
+        return await client.retrieve_supplier('acme')
+
+    supplier = codec.decode_supplier(run(connect(rest_api), scenario))
+
+    assert supplier['parts'] == [{'part_id': 'inline'},
+                                 {'part_id': 'linked'}]
+
+
+def test_retrieve_of_a_missing_supplier_is_none(rest_api):
+    async def scenario(client):
+        await client.create('acme', 'ac', 'Acme', 'secret', '')
+        return await asyncio.gather(
+            client.retrieve_supplier('missing'),
+            client.retrieve_supplier('acme'))
+
+    missing, found = run(connect(rest_api), scenario)
+
+    assert missing is None
+    assert codec.decode_supplier(found)['supplier_id'] == 'acme'
+
+
+def test_retrieve_of_a_corrupt_record_raises(rest_api):
+    rest_api.ledger._state[
+        AsyncSupplierBatch('')._get_address('acme')] = b'\x00\x7f'
+
+    async def scenario(client):
+        return await client.retrieve_supplier('acme')
+
+    with pytest.raises(SupplierException, match='Malformed'):
+        run(connect(rest_api), scenario)
+
+
+def test_iter_suppliers_follows_every_page(rest_api):
+    suffixes = []
+
+    class RecordingClient(AsyncSupplierBatch):
+        async def _send_request(self, suffix, *args, **kwargs):
+            suffixes.append(suffix)
+            return await super()._send_request(suffix, *args, **kwargs)
+
+    async def scenario(client):
+        await client.submit_many(
+            [client.make_create_transaction(
+                's{}'.format(i), 'x{}'.format(i), 'Name', '', '')
+             for i in range(5)])
+        del suffixes[:]
+        return [codec.decode_supplier(data)['supplier_id']
+                async for data in client.iter_suppliers(page_size=2)]
+
+    supplier_ids = run(
+        lambda: RecordingClient(rest_api.url, private_key=PRIVATE_KEY,
+                                family_version='1.1'),
+        scenario)
+
+    assert sorted(supplier_ids) == ['s0', 's1', 's2', 's3', 's4']
+    assert len(suffixes) == 3
+    assert 'start=' not in suffixes[0]
+    assert all('start=' in suffix for suffix in suffixes[1:])
+
+
+def test_get_status_entries(rest_api):
+    async def scenario(client):
+        created = await client.submit_many([
+            client.make_create_transaction('acme', 'ac', 'Acme', '', '')])
+        rejected = await client.submit_many([
+            client.make_create_transaction('acme', 'ac', 'Acme', '', '')])
+        return await client.get_status_entries(
+            created + rejected + ['unknown'])
+
+    committed, invalid, unknown = run(connect(rest_api), scenario)
+
+    assert committed['status'] == 'COMMITTED'
+    assert invalid['status'] == 'INVALID'
+    assert 'already exists' in \
+        invalid['invalid_transactions'][0]['message']
+    assert unknown['status'] == 'UNKNOWN'
+
+
+def test_requests_in_flight_are_capped():
+    session = FakeSession([0.01] * 10)
+
+    async def scenario(client):
+        return await asyncio.gather(*[
+            client.retrieve_supplier('s{}'.format(i)) for i in range(10)])
+
+    assert run(fake_client(session, max_concurrency=3), scenario) == \
+        [None] * 10
+    assert session.peak == 3
+
+
+def test_submit_many_sends_batch_lists_in_order():
+    # The first BatchList takes longest, but the second is not started
+    # until it is done
+    session = FakeSession([0.03, 0.02, 0.01])
+
+    async def scenario(client):
+        transactions = [client.make_add_part_transaction('acme', str(i))
+                        for i in range(3)]
+        return await client.submit_many(
+            transactions, batch_size=1, batches_per_list=1)
+
+    run(fake_client(session), scenario)
+
+    assert session.peak == 1
+    assert session.started == session.finished
+
+
+def test_submit_many_concurrency():
+    session = FakeSession([0.03, 0.02, 0.01])
+
+    async def scenario(client):
+        transactions = [client.make_add_part_transaction('acme', str(i))
+                        for i in range(3)]
+        return await client.submit_many(
+            transactions, batch_size=1, batches_per_list=1, concurrency=2)
+
+    batch_ids = run(fake_client(session), scenario)
+
+    assert session.peak == 2
+    assert len(batch_ids) == 3
+
+
+def test_submit_many_concurrency_must_be_positive():
+    async def scenario(client):
+        await client.submit_many([], concurrency=0)
+
+    with pytest.raises(SupplierException):
+        run(fake_client(FakeSession()), scenario)
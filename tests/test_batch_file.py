@@ -0,0 +1,148 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import io
+import re
+
+import pytest
+
+from sparts_supplier import batch_file
+from sparts_supplier.exceptions import SupplierException
+
+
+RECORDS = [b'first', b'', b'x' * 300, b'last']
+
+
+class FailingClient:
+    """Accepts BatchLists until it is sent the one it is set to fail."""
+
+    def __init__(self, fail_on=None):
+        self.sent = []
+        self.fail_on = fail_on
+
+    def send_batch_list(self, batch_list, auth_user=None,
+                        auth_password=None):
+        if batch_list == self.fail_on:
+            raise SupplierException('Error 503: Service Unavailable')
+        self.sent.append(batch_list)
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / 'load.batches')
+    assert batch_file.write_batch_file(path, iter(RECORDS)) == len(RECORDS)
+    return path
+
+
+def read(path, offset=None):
+    return list(batch_file.iter_batch_file(path, offset))
+
+
+def test_records_read_back_in_order(path):
+    records = read(path)
+
+    assert [data for _, data in records] == RECORDS
+    assert records[0][0] == len(batch_file.MAGIC)
+
+
+def test_reading_resumes_from_an_offset(path):
+    offsets = [offset for offset, _ in read(path)]
+
+    assert [data for _, data in read(path, offsets[2])] == RECORDS[2:]
+    assert read(path, offsets[-1] + 4 + len(RECORDS[-1])) == []
+
+
+def test_an_empty_batch_file(tmp_path):
+    path = str(tmp_path / 'empty.batches')
+    batch_file.write_batch_file(path, [])
+
+    assert read(path) == []
+
+
+# Bytes cut from the end: into the data of the last record, or into its
+# length
+@pytest.mark.parametrize('cut', [1, len(RECORDS[-1]), len(RECORDS[-1]) + 1])
+def test_a_truncated_last_record_fails_after_the_others(path, cut):
+    with open(path, 'rb') as fd:
+        data = fd.read()
+    with open(path, 'wb') as fd:
+        fd.write(data[:-cut])
+    records = batch_file.iter_batch_file(path)
+
+    assert [next(records)[1] for _ in RECORDS[:-1]] == RECORDS[:-1]
+    with pytest.raises(SupplierException, match='Truncated record'):
+        next(records)
+
+
+def test_a_file_without_the_magic_is_rejected(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'SPBATCH0' + b'\x00\x00\x00\x00')
+
+    with pytest.raises(SupplierException, match='Not a batch file'):
+        read(str(path))
+
+
+@pytest.mark.parametrize('offset', [0, 7, 10 ** 6])
+def test_offsets_outside_the_file_are_rejected(path, offset):
+    with pytest.raises(SupplierException, match='outside'):
+        read(path, offset)
+
+
+def test_submit_sends_every_record_and_reports_progress(path):
+    client = FailingClient()
+    progress = []
+
+    assert batch_file.submit_batch_file(
+        client, path, progress=progress.append) == len(RECORDS)
+    assert client.sent == RECORDS
+    assert progress[-1] == len(open(path, 'rb').read())
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_a_failed_submit_names_the_offset_to_resume_from(path, concurrency):
+    offsets = [offset for offset, _ in read(path)]
+    client = FailingClient(fail_on=RECORDS[2])
+
+    with pytest.raises(SupplierException) as excinfo:
+        batch_file.submit_batch_file(client, path, concurrency=concurrency)
+    offset = int(re.search(r'offset (\d+)', str(excinfo.value)).group(1))
+    assert offset == offsets[2]
+
+    client.fail_on = None
+    client.sent = []
+    assert batch_file.submit_batch_file(client, path, offset=offset) == 2
+    assert client.sent == RECORDS[2:]
+
+
+def test_read_specs():
+    lines = io.StringIO(
+        '{"action": "create", "supplier_id": "s1", "short_id": "a"}\n'
+        '\n'
+        '{"action": "AddPart", "supplier_id": "s1", "part_id": "p1"}\n')
+
+    assert [spec['action'] for spec in batch_file.read_specs(lines)] == \
+        ['create', 'AddPart']
+
+
+@pytest.mark.parametrize('line, error', [
+    ('{"action": "create"', 'invalid JSON'),
+    ('{"action": "create"}', 'supplier_id and action are required'),
+    ('["create"]', 'supplier_id and action are required'),
+    ('{"action": "create", "supplier_id": "s1", "colour": "red"}',
+     'unknown keys: colour'),
+])
+def test_read_specs_rejects_bad_lines(line, error):
+    with pytest.raises(SupplierException, match='Line 1: ' + error):
+        list(batch_file.read_specs([line]))
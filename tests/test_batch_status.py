@@ -0,0 +1,81 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import pytest
+
+from sparts_supplier import batch_status
+from sparts_supplier.batch_status import BatchStatusTracker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class PendingClient:
+    """Answers every long-poll only once its wait has run out."""
+
+    def __init__(self, clock):
+        self._clock = clock
+        self.waits = []
+
+    def get_status_entries(self, batch_ids, wait=0, auth_user=None,
+                           auth_password=None):
+        self.waits.append(wait)
+        self._clock.now += wait
+        return [{'id': batch_id, 'status': batch_status.PENDING}
+                for batch_id in batch_ids]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(batch_status, 'time', clock)
+    return clock
+
+
+def test_one_request_per_poll_by_default(clock):
+    client = PendingClient(clock)
+    tracker = BatchStatusTracker(['{:0128x}'.format(i) for i in range(500)])
+
+    tracker.poll(client, wait=30)
+
+    assert client.waits == [30]
+
+
+def test_a_poll_long_polls_for_wait_seconds_in_all(clock):
+    client = PendingClient(clock)
+    tracker = BatchStatusTracker(
+        [str(i) for i in range(100)], ids_per_request=10)
+
+    tracker.poll(client, wait=30)
+
+    assert len(client.waits) == 10
+    assert sum(client.waits) == 30
+
+
+def test_wait_stops_at_the_timeout(clock):
+    client = PendingClient(clock)
+    tracker = BatchStatusTracker(
+        [str(i) for i in range(100)], ids_per_request=10)
+    start = clock.now
+
+    counts = tracker.wait(client, timeout=45, wait=30)
+
+    assert clock.now - start == 45
+    assert counts[batch_status.PENDING] == 100
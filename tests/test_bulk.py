@@ -0,0 +1,79 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import pytest
+
+from sawtooth_sdk.protobuf.batch_pb2 import BatchList
+from sawtooth_signing import create_context
+
+from sparts_supplier.bulk import BulkTransactionFactory
+from sparts_supplier.bulk import encode_batch_list
+from sparts_supplier.supplier_batch import SupplierClientBase
+
+
+PRIVATE_KEY = create_context('secp256k1').new_random_private_key().as_hex()
+
+
+def make_batch(client, parts):
+    return client.make_batch([
+        client.make_add_part_transaction('acme', 'p{}'.format(i))
+        for i in range(parts)])
+
+
+@pytest.mark.parametrize('parts', [[], [1], [1, 2], [60, 1]])
+def test_encode_batch_list_matches_protobuf(parts):
+    client = SupplierClientBase('', private_key=PRIVATE_KEY)
+    batches = [make_batch(client, count) for count in parts]
+
+    data = encode_batch_list(
+        [batch.SerializeToString() for batch in batches])
+
+    assert data == BatchList(batches=batches).SerializeToString()
+    assert list(BatchList.FromString(data).batches) == batches
+
+
+def test_batch_lengths_take_multi_byte_varints():
+    client = SupplierClientBase('', private_key=PRIVATE_KEY)
+    small, large = (make_batch(client, count).SerializeToString()
+                    for count in (1, 60))
+
+    # Lengths over 127 take two varint bytes, over 16383 three
+    assert 127 < len(small) < 16384 < len(large)
+    assert BatchList.FromString(encode_batch_list([small, large])) \
+        .SerializeToString() == encode_batch_list([small, large])
+    assert encode_batch_list([small])[:3] == \
+        b'\x0a' + bytes([len(small) & 0x7f | 0x80, len(small) >> 7])
+
+
+def test_iter_batch_lists_keeps_the_spec_order():
+    specs = [{'action': 'AddPart', 'supplier_id': 'acme',
+              'part_id': 'p{}'.format(i)} for i in range(7)]
+    batch_ids = []
+
+    with BulkTransactionFactory(PRIVATE_KEY, workers=2, batch_size=2,
+                                family_version='1.0') as factory:
+        batch_lists = [BatchList.FromString(data)
+                       for data in factory.iter_batch_lists(
+                           specs, batches_per_list=3,
+                           batch_ids=batch_ids)]
+
+    assert [len(batch_list.batches) for batch_list in batch_lists] == [3, 1]
+    batches = [batch for batch_list in batch_lists
+               for batch in batch_list.batches]
+    assert [batch.header_signature for batch in batches] == batch_ids
+    assert [transaction.payload.decode().split(',')[-1]
+            for batch in batches
+            for transaction in batch.transactions] == \
+        [spec['part_id'] for spec in specs]
@@ -0,0 +1,84 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import pytest
+
+from sparts_supplier import codec
+
+
+def make_supplier(parts=()):
+    return {'supplier_id': 'acme', 'short_id': 'ac',
+            'supplier_name': 'Acme é', 'passwd': 'secret',
+            'supplier_url': 'http://acme.example',
+            'parts': [{'part_id': part_id} for part_id in parts]}
+
+
+@pytest.mark.parametrize('parts', [(), ('p1',), ('p1', 'p2', 'x' * 300)])
+def test_binary_round_trip(parts):
+    supplier = make_supplier(parts)
+    data = codec.encode_supplier(supplier)
+
+    assert data.startswith(codec.MAGIC)
+    assert codec.decode_supplier(data) == supplier
+
+
+@pytest.mark.parametrize('parts', [(), ('p1', 'p2')])
+def test_legacy_round_trip(parts):
+    supplier = make_supplier(parts)
+    data = codec.encode_legacy_supplier(supplier)
+
+    assert data.startswith(b'acme,')
+    assert codec.decode_supplier(data) == supplier
+
+
+def test_decodes_records_written_by_1_0_processors():
+    data = (b'acme,{"supplier_id": "acme", "short_id": "ac", '
+            b'"supplier_name": "Acme", "passwd": "secret", '
+            b'"supplier_url": "", "parts": [{"part_id": "p1"}]}')
+
+    supplier = codec.decode_supplier(data)
+
+    assert supplier['supplier_name'] == 'Acme'
+    assert supplier['parts'] == [{'part_id': 'p1'}]
+
+
+def test_part_ids_with_nul_are_rejected():
+    with pytest.raises(codec.CodecError):
+        codec.encode_supplier(make_supplier(['a\x00b']))
+
+
+@pytest.mark.parametrize('data', [
+    b'\x00',
+    b'\x00\x7f',
+    b'\x00\x01\x02\xff\xfe',
+    codec.encode_supplier(make_supplier(['p1']))[:-1],
+    codec.encode_supplier(make_supplier(['p1']))[:5],
+    b'acme',
+    b'acme,{not json',
+])
+def test_corrupt_records_raise_codec_error(data):
+    with pytest.raises(codec.CodecError):
+        codec.decode_supplier(data)
+
+
+def test_corrupt_part_count_is_detected():
+    data = bytearray(codec.encode_supplier(make_supplier(['p1', 'p2'])))
+    # The part count sits just before the length of the joined part ids
+    count_offset = len(data) - len('p1\x00p2') - 2
+    assert data[count_offset] == 2
+    data[count_offset] = 3
+
+    with pytest.raises(codec.CodecError):
+        codec.decode_supplier(bytes(data))
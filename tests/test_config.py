@@ -0,0 +1,107 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import os
+import re
+
+import pytest
+
+from sawtooth_sdk.processor.exceptions import LocalConfigurationError
+
+from sparts_supplier.processor.config.supplier import SupplierConfig
+from sparts_supplier.processor.config.supplier import \
+    load_default_supplier_config
+from sparts_supplier.processor.config.supplier import \
+    load_toml_supplier_config
+from sparts_supplier.processor.config.supplier import merge_supplier_config
+
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, 'packaging',
+                       'supplier.toml.example')
+
+
+def load(tmp_path, text):
+    path = tmp_path / 'supplier.toml'
+    path.write_text(text)
+    return load_toml_supplier_config(str(path))
+
+
+def test_a_missing_file_sets_nothing(tmp_path):
+    config = load_toml_supplier_config(str(tmp_path / 'missing.toml'))
+
+    assert config.to_dict() == {}
+
+
+def test_every_example_setting_loads(tmp_path):
+    with open(EXAMPLE) as fd:
+        # Uncomment the settings, not the prose
+        text = re.sub(r'^# (\w+ = )', r'\1', fd.read(), flags=re.M)
+
+    config = load(tmp_path, text)
+
+    assert config.to_dict() == {
+        'connect': 'tcp://localhost:4004', 'workers': 1,
+        'cache_size': 1024, 'metrics_host': '127.0.0.1',
+        'metrics_port': 9108, 'restart_delay': 1.0}
+
+
+def test_unknown_keys_are_rejected(tmp_path):
+    with pytest.raises(LocalConfigurationError,
+                       match='Invalid keys .*: threads, worker'):
+        load(tmp_path, 'workers = 2\nworker = 2\nthreads = 4\n')
+
+
+def test_toml_errors_are_reported(tmp_path):
+    with pytest.raises(LocalConfigurationError, match='Unable to parse'):
+        load(tmp_path, 'workers = \n')
+
+
+@pytest.mark.parametrize('text', [
+    'workers = 0',
+    'workers = "2"',
+    'workers = true',
+    'workers = 1.5',
+    'cache_size = -1',
+    'metrics_port = -1',
+    'restart_delay = -0.5',
+    'restart_delay = "1s"',
+])
+def test_bad_values_are_rejected(tmp_path, text):
+    with pytest.raises(LocalConfigurationError,
+                       match='must be a number no less than'):
+        load(tmp_path, text)
+
+
+@pytest.mark.parametrize('text, key, value', [
+    ('workers = 4', 'workers', 4),
+    ('cache_size = 0', 'cache_size', 0),
+    ('restart_delay = 0', 'restart_delay', 0),
+    ('restart_delay = 2.5', 'restart_delay', 2.5),
+])
+def test_boundary_values_are_accepted(tmp_path, text, key, value):
+    assert getattr(load(tmp_path, text), key) == value
+
+
+def test_earlier_configs_take_priority():
+    merged = merge_supplier_config([
+        SupplierConfig(workers=4),
+        SupplierConfig(workers=2, metrics_port=9200),
+        load_default_supplier_config(),
+    ])
+
+    assert merged.workers == 4
+    assert merged.metrics_port == 9200
+    assert merged.connect == 'tcp://localhost:4004'
+    assert merged.restart_delay == 1.0
@@ -0,0 +1,373 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import json
+
+import pytest
+
+from sawtooth_sdk.processor.exceptions import InvalidTransaction
+
+from sparts_supplier import addressing
+from sparts_supplier import codec
+from sparts_supplier.processor.handler import MAX_PART_IDS
+from sparts_supplier.processor.handler import SupplierTransactionHandler
+from sparts_supplier.processor.memory_state import InMemoryContext
+from sparts_supplier.processor.memory_state import make_request
+
+
+SUPPLIER_ID = 'acme'
+
+SUPPLIER_ADDRESS = addressing.make_supplier_address(SUPPLIER_ID)
+
+
+def csv_payload(action, supplier_id=SUPPLIER_ID, part_id='',
+                short_id='ac'):
+    return ','.join([supplier_id, short_id, 'Acme Inc', 'secret',
+                     'http://acme.example', action, part_id]).encode()
+
+
+def json_payload(action, supplier_id=SUPPLIER_ID, short_id='', **fields):
+    fields.update(action=action, supplier_id=supplier_id, short_id=short_id,
+                  supplier_name='Acme Inc', passwd='secret',
+                  supplier_url='http://acme.example')
+    return json.dumps(fields).encode()
+
+
+def apply(handler, context, payload, family_version):
+    handler.apply(make_request(payload, family_version), context)
+
+
+def stored_supplier(context, supplier_id=SUPPLIER_ID):
+    return codec.decode_supplier(
+        context.state[addressing.make_supplier_address(supplier_id)])
+
+
+def part_links(context, supplier_id=SUPPLIER_ID):
+    prefix = addressing.make_part_prefix(supplier_id)
+    return sorted(json.loads(data.decode())['part_id']
+                  for address, data in context.state.items()
+                  if address.startswith(prefix))
+
+
+@pytest.fixture
+def handler():
+    return SupplierTransactionHandler()
+
+
+@pytest.fixture
+def context():
+    return InMemoryContext()
+
+
+def test_add_part_1_1_writes_a_link_and_leaves_the_record(handler, context):
+    apply(handler, context, csv_payload('create'), '1.0')
+    record = context.state[SUPPLIER_ADDRESS]
+
+    apply(handler, context, json_payload('AddPart', part_id='p1'), '1.1')
+
+    assert context.state[SUPPLIER_ADDRESS] == record
+    assert part_links(context) == ['p1']
+    assert stored_supplier(context)['parts'] == []
+
+
+def test_add_part_1_1_requires_the_supplier(handler, context):
+    with pytest.raises(InvalidTransaction):
+        apply(handler, context, json_payload('AddPart', part_id='p1'), '1.1')
+    assert context.state == {}
+
+
+def test_add_part_1_0_appends_to_the_record(handler, context):
+    apply(handler, context, csv_payload('create'), '1.0')
+    apply(handler, context, csv_payload('AddPart', part_id='p1'), '1.0')
+
+    assert stored_supplier(context)['parts'] == [{'part_id': 'p1'}]
+    assert part_links(context) == []
+
+
+def test_migrate_parts_moves_inline_parts_to_links(handler, context):
+    apply(handler, context, csv_payload('create'), '1.0')
+    for part_id in ('p1', 'p2'):
+        apply(handler, context, csv_payload('AddPart', part_id=part_id),
+              '1.0')
+
+    apply(handler, context, json_payload('MigrateParts'), '1.1')
+
+    supplier = stored_supplier(context)
+    assert supplier['parts'] == []
+    assert supplier['supplier_name'] == 'Acme Inc'
+    assert part_links(context) == ['p1', 'p2']
+    # The record is rewritten with the binary codec
+    assert context.state[SUPPLIER_ADDRESS].startswith(codec.MAGIC)
+
+
+def test_migrate_parts_without_inline_parts_writes_nothing(handler, context):
+    apply(handler, context, csv_payload('create'), '1.0')
+    context.reset_counters()
+
+    apply(handler, context, json_payload('MigrateParts'), '1.1')
+
+    assert context.writes == 0
+
+
+def test_migrate_parts_requires_the_supplier(handler, context):
+    with pytest.raises(InvalidTransaction):
+        apply(handler, context, json_payload('MigrateParts'), '1.1')
+
+
+def test_migrate_parts_is_a_1_1_action(handler, context):
+    apply(handler, context, csv_payload('create'), '1.0')
+    with pytest.raises(InvalidTransaction):
+        apply(handler, context, csv_payload('MigrateParts'), '1.0')
+
+
+def test_create_1_1_indexes_the_short_id(handler, context):
+    apply(handler, context, json_payload('create', short_id='x'), '1.1')
+
+    entry = context.state[addressing.make_short_id_address('x')]
+    assert json.loads(entry.decode()) == {
+        'supplier_id': SUPPLIER_ID, 'address': SUPPLIER_ADDRESS}
+    assert stored_supplier(context)['short_id'] == 'x'
+
+
+def test_create_1_1_rejects_a_short_id_in_use(handler, context):
+    apply(handler, context, json_payload('create', short_id='x'), '1.1')
+    state = dict(context.state)
+
+    with pytest.raises(InvalidTransaction, match='short_id already in use'):
+        apply(handler, context,
+              json_payload('create', supplier_id='beta', short_id='x'), '1.1')
+    assert context.state == state
+
+
+def test_create_1_1_rejects_an_existing_supplier(handler, context):
+    apply(handler, context, json_payload('create', short_id='x'), '1.1')
+    state = dict(context.state)
+
+    with pytest.raises(InvalidTransaction, match='supplier already exists'):
+        apply(handler, context, json_payload('create', short_id='y'), '1.1')
+    assert context.state == state
+
+
+def short_id_entry(context, short_id):
+    return json.loads(
+        context.state[addressing.make_short_id_address(short_id)].decode())
+
+
+def test_migrate_parts_indexes_a_1_0_supplier(handler, context):
+    apply(handler, context, csv_payload('create', short_id='x'), '1.0')
+    record = context.state[SUPPLIER_ADDRESS]
+
+    apply(handler, context, json_payload('MigrateParts', short_id='x'), '1.1')
+
+    assert short_id_entry(context, 'x') == {
+        'supplier_id': SUPPLIER_ID, 'address': SUPPLIER_ADDRESS}
+    # Without inline parts the record is left alone
+    assert context.state[SUPPLIER_ADDRESS] == record
+    with pytest.raises(InvalidTransaction, match='short_id already in use'):
+        apply(handler, context,
+              json_payload('create', supplier_id='beta', short_id='x'), '1.1')
+
+
+def test_migrate_parts_indexes_and_moves_parts_together(handler, context):
+    apply(handler, context, csv_payload('create', short_id='x'), '1.0')
+    apply(handler, context, csv_payload('AddPart', part_id='p1'), '1.0')
+
+    apply(handler, context, json_payload('MigrateParts', short_id='x'), '1.1')
+
+    assert short_id_entry(context, 'x')['supplier_id'] == SUPPLIER_ID
+    assert part_links(context) == ['p1']
+    assert stored_supplier(context)['parts'] == []
+
+
+def test_migrate_parts_of_an_indexed_supplier_writes_nothing(handler, context):
+    apply(handler, context, json_payload('create', short_id='x'), '1.1')
+    context.reset_counters()
+
+    apply(handler, context, json_payload('MigrateParts', short_id='x'), '1.1')
+
+    assert context.writes == 0
+
+
+def test_migrate_parts_rejects_another_short_id(handler, context):
+    apply(handler, context, csv_payload('create', short_id='x'), '1.0')
+    state = dict(context.state)
+
+    with pytest.raises(InvalidTransaction, match='does not match'):
+        apply(handler, context,
+              json_payload('MigrateParts', short_id='y'), '1.1')
+    assert context.state == state
+
+
+def test_a_1_0_create_may_reuse_an_indexed_short_id(handler, context):
+    # 1.0 transactions only declare the supplier address, so a 1.0 create
+    # cannot read the short_id entry; its outcome stays as it was for
+    # processors that predate 1.1. The clash is rejected from the 1.1
+    # side instead: the second supplier cannot take over the entry.
+    apply(handler, context, json_payload('create', short_id='x'), '1.1')
+    apply(handler, context,
+          csv_payload('create', supplier_id='beta', short_id='x'), '1.0')
+    state = dict(context.state)
+
+    with pytest.raises(InvalidTransaction, match='short_id already in use'):
+        apply(handler, context,
+              json_payload('MigrateParts', supplier_id='beta', short_id='x'),
+              '1.1')
+    assert context.state == state
+    assert short_id_entry(context, 'x')['supplier_id'] == SUPPLIER_ID
+
+
+@pytest.mark.parametrize('supplier_id', ['\x00a', 'a\nb', 'a\x7f'])
+@pytest.mark.parametrize('family_version', ['1.0', '1.1'])
+def test_supplier_ids_with_control_characters_are_rejected(
+        handler, context, supplier_id, family_version):
+    # A 1.0 record for '\x00a' would start with the binary codec's magic
+    # byte and could not be read back.
+    payload = csv_payload('create', supplier_id=supplier_id) \
+        if family_version == '1.0' \
+        else json_payload('create', supplier_id=supplier_id)
+
+    with pytest.raises(InvalidTransaction):
+        apply(handler, context, payload, family_version)
+    assert context.state == {}
+
+
+def test_duplicate_add_part_1_0_writes_nothing(handler, context):
+    apply(handler, context, csv_payload('create'), '1.0')
+    apply(handler, context, csv_payload('AddPart', part_id='p1'), '1.0')
+    context.reset_counters()
+
+    apply(handler, context, csv_payload('AddPart', part_id='p1'), '1.0')
+
+    assert context.writes == 0
+    assert stored_supplier(context)['parts'] == [{'part_id': 'p1'}]
+
+
+def test_duplicate_add_part_1_1_writes_nothing(handler, context):
+    apply(handler, context, csv_payload('create'), '1.0')
+    apply(handler, context, json_payload('AddPart', part_id='p1'), '1.1')
+    context.reset_counters()
+
+    apply(handler, context, json_payload('AddPart', part_id='p1'), '1.1')
+
+    assert context.writes == 0
+    assert part_links(context) == ['p1']
+
+
+def test_add_part_1_1_skips_parts_held_inline(handler, context):
+    apply(handler, context, csv_payload('create'), '1.0')
+    apply(handler, context, csv_payload('AddPart', part_id='p1'), '1.0')
+    context.reset_counters()
+
+    apply(handler, context, json_payload('AddPart', part_id='p1'), '1.1')
+
+    assert context.writes == 0
+    assert part_links(context) == []
+
+
+def test_add_parts_writes_only_new_links(handler, context):
+    apply(handler, context, csv_payload('create'), '1.0')
+    apply(handler, context, csv_payload('AddPart', part_id='inline'), '1.0')
+    apply(handler, context, json_payload('AddPart', part_id='linked'), '1.1')
+    context.reset_counters()
+
+    apply(handler, context,
+          json_payload('AddParts',
+                       part_ids=['inline', 'linked', 'new', 'new']),
+          '1.1')
+
+    assert context.writes == 1
+    assert part_links(context) == ['linked', 'new']
+    assert stored_supplier(context)['parts'] == [{'part_id': 'inline'}]
+
+
+def test_add_parts_of_known_parts_writes_nothing(handler, context):
+    apply(handler, context, csv_payload('create'), '1.0')
+    apply(handler, context, json_payload('AddParts', part_ids=['a', 'b']),
+          '1.1')
+    context.reset_counters()
+
+    apply(handler, context, json_payload('AddParts', part_ids=['b', 'a']),
+          '1.1')
+
+    assert context.writes == 0
+
+
+def test_add_parts_part_id_limit(handler, context):
+    apply(handler, context, csv_payload('create'), '1.0')
+    part_ids = ['p{}'.format(i) for i in range(MAX_PART_IDS + 1)]
+
+    with pytest.raises(InvalidTransaction):
+        apply(handler, context, json_payload('AddParts', part_ids=part_ids),
+              '1.1')
+
+    apply(handler, context,
+          json_payload('AddParts', part_ids=part_ids[:MAX_PART_IDS]), '1.1')
+    assert len(part_links(context)) == MAX_PART_IDS
+
+
+def mixed_workload():
+    yield csv_payload('create'), '1.0'
+    yield csv_payload('create'), '1.0'
+    yield csv_payload('create', supplier_id='beta', short_id='be'), '1.0'
+    yield json_payload('create', supplier_id='gamma', short_id='ga'), '1.1'
+    for part_id in ('p1', 'p2', 'p1'):
+        yield csv_payload('AddPart', part_id=part_id), '1.0'
+        yield json_payload('AddPart', part_id=part_id), '1.1'
+        yield json_payload('AddPart', supplier_id='gamma',
+                           part_id=part_id), '1.1'
+    yield json_payload('AddParts', part_ids=['p2', 'p3']), '1.1'
+    yield json_payload('AddPart', supplier_id='missing', part_id='p1'), '1.1'
+    yield json_payload('MigrateParts'), '1.1'
+    yield csv_payload('AddPart', part_id='p4'), '1.0'
+    yield csv_payload('AddPart', supplier_id='beta', part_id='p1'), '1.0'
+    yield json_payload('MigrateParts', supplier_id='beta'), '1.1'
+    yield json_payload('MigrateParts', supplier_id='beta', short_id='be'), \
+        '1.1'
+    yield csv_payload('AddPart', supplier_id='beta', part_id='p1'), '1.0'
+
+
+def run_workload(make_handler, handler_per_transaction=False):
+    context = InMemoryContext()
+    handler = make_handler()
+    outcomes = []
+    for payload, family_version in mixed_workload():
+        if handler_per_transaction:
+            handler = make_handler()
+        try:
+            apply(handler, context, payload, family_version)
+            outcomes.append('ok')
+        except InvalidTransaction as err:
+            outcomes.append(str(err))
+    return outcomes, context.state
+
+
+def test_the_record_cache_does_not_change_outcomes():
+    cached = run_workload(SupplierTransactionHandler)
+    uncached = run_workload(lambda: SupplierTransactionHandler(cache_size=0))
+    # Every transaction on a processor that has not seen the supplier yet
+    cold = run_workload(SupplierTransactionHandler,
+                        handler_per_transaction=True)
+
+    assert cached == uncached == cold
+    assert 'ok' in cached[0]
+    assert cached[0].count('ok') < len(cached[0])
+
+
+def test_the_record_cache_is_used(handler, context):
+    apply(handler, context, csv_payload('create'), '1.0')
+    apply(handler, context, json_payload('AddPart', part_id='p1'), '1.1')
+    apply(handler, context, json_payload('AddPart', part_id='p2'), '1.1')
+
+    assert handler.record_cache.hits == 1
@@ -0,0 +1,119 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import io
+
+import pytest
+
+from sawtooth_signing import create_context
+
+from sparts_supplier.batch_status import BatchStatusTracker
+from sparts_supplier.batch_status import COMMITTED
+from sparts_supplier.batch_status import INVALID
+from sparts_supplier.importer import SupplierImporter
+from sparts_supplier.importer import read_rows
+
+
+ROWS = '''supplier_id,short_id,supplier_name,passwd,supplier_url,part_id
+s1,a1,One,p,u,
+s1,,,,,p1
+s1,,,,,p2
+s2,a1,Two,p,u,
+s3,a3,Three,p,u,
+'''
+
+
+class RecordingClient:
+    """Accepts every BatchList, and answers status queries with the
+    statuses it was given.
+    """
+
+    def __init__(self, statuses=None):
+        self.batch_lists = []
+        self.statuses = statuses or {}
+
+    def send_batch_list(self, batch_list, auth_user=None,
+                        auth_password=None):
+        self.batch_lists.append(batch_list)
+
+    def get_status_entries(self, batch_ids, wait=0, auth_user=None,
+                           auth_password=None):
+        return [dict(self.statuses[batch_id], id=batch_id)
+                for batch_id in batch_ids]
+
+
+def import_rows(rows=ROWS, batch_size=2):
+    private_key = create_context('secp256k1').new_random_private_key()
+    with SupplierImporter(RecordingClient(), private_key.as_hex(),
+                          workers=1, batch_size=batch_size,
+                          family_version='1.1') as importer:
+        return importer.run(read_rows(io.StringIO(rows), 'csv'))
+
+
+def check(report, invalid_batch=None, message=None):
+    """Feeds the report the final batch statuses, with invalid_batch
+    rejected for message.
+    """
+    statuses = {
+        batch_id: {'status': COMMITTED, 'invalid_transactions': []}
+        for batch_id in report.batch_ids}
+    if invalid_batch is not None:
+        statuses[invalid_batch] = {
+            'status': INVALID,
+            'invalid_transactions': [{'id': 'txn', 'message': message}]}
+    tracker = BatchStatusTracker(report.batch_ids)
+    tracker.poll(RecordingClient(statuses))
+    report.add_batch_statuses(tracker)
+
+
+def test_unchecked_imports_are_only_submitted():
+    report = import_rows()
+
+    assert report.error_count == 0
+    assert report.status == 'submitted'
+
+
+def test_batches_keep_the_lines_of_their_rows():
+    rows = ROWS.replace('s2,a1', ',,,,,no-supplier\ns2,a1')
+
+    report = import_rows(rows)
+
+    assert report.invalid_rows == 1
+    assert [report.batch_rows[batch_id] for batch_id in report.batch_ids] \
+        == [[[2, 4]], [[6, 7]]]
+
+
+def test_every_row_of_an_invalid_batch_is_reported():
+    report = import_rows()
+
+    check(report, report.batch_ids[1],
+          'Invalid Action-short_id already in use.')
+
+    assert report.status == 'failed'
+    assert report.failed_rows == 2
+    assert report.batches[INVALID] == 1
+    assert [error['line'] for error in report.errors] == [5, 6]
+    assert all('short_id already in use' in error['error']
+               for error in report.errors)
+
+
+@pytest.mark.parametrize('batch_size', [1, 100])
+def test_every_batch_committed_is_a_success(batch_size):
+    report = import_rows(batch_size=batch_size)
+
+    check(report)
+
+    assert report.status == 'success'
+    assert report.failed_rows == 0
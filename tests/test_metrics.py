@@ -0,0 +1,69 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import pytest
+
+from sawtooth_sdk.processor.exceptions import InvalidTransaction
+
+from sparts_supplier.processor import handler as handler_module
+from sparts_supplier.processor.handler import SupplierTransactionHandler
+from sparts_supplier.processor.memory_state import InMemoryContext
+from sparts_supplier.processor.memory_state import make_request
+from sparts_supplier.processor.metrics import InstrumentedHandler
+from sparts_supplier.processor.metrics import ProcessorMetrics
+from sparts_supplier.processor.profiling import ProfilingHandler
+
+
+def apply_label(payload, family_version='1.0'):
+    metrics = ProcessorMetrics()
+    handler = InstrumentedHandler(SupplierTransactionHandler(), metrics)
+    try:
+        handler.apply(make_request(payload, family_version),
+                      InMemoryContext())
+    except InvalidTransaction:
+        pass
+    return [line for line in metrics.render().splitlines()
+            if line.startswith('supplier_apply_seconds_count')]
+
+
+@pytest.mark.parametrize('payload, label', [
+    (b'acme,ac,Acme,p,u,create,', 'action="create",status="ok"'),
+    (b'acme,ac,Acme,p,u,AddPart,p1', 'action="AddPart",status="invalid"'),
+    (b'acme,ac,Acme,p,u,Delete,', 'action="other",status="invalid"'),
+    (b'acme,ac', 'action="unparsable",status="invalid"'),
+])
+def test_apply_is_labelled_by_action(payload, label):
+    assert apply_label(payload) == [
+        'supplier_apply_seconds_count{' + label + '} 1']
+
+
+def test_the_payload_is_parsed_once(monkeypatch, tmp_path):
+    calls = []
+    parse_payload = handler_module.parse_payload
+
+    def counting_parse_payload(*args):
+        calls.append(args)
+        return parse_payload(*args)
+
+    monkeypatch.setattr(handler_module, 'parse_payload',
+                        counting_parse_payload)
+    handler = InstrumentedHandler(
+        ProfilingHandler(SupplierTransactionHandler(), str(tmp_path)),
+        ProcessorMetrics())
+
+    handler.apply(make_request(b'acme,ac,Acme,p,u,create,', '1.0'),
+                  InMemoryContext())
+
+    assert len(calls) == 1
@@ -0,0 +1,56 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+from sparts_supplier.processor.handler import SupplierTransactionHandler
+from sparts_supplier.processor.memory_state import InMemoryContext
+from sparts_supplier.processor.memory_state import make_request
+from sparts_supplier.processor.profiling import ProfilingHandler
+
+
+def apply_creates(handler, context, supplier_ids):
+    for supplier_id in supplier_ids:
+        payload = '{},{},Acme,p,u,create,'.format(supplier_id, supplier_id)
+        handler.apply(make_request(payload.encode(), '1.0'), context)
+
+
+def test_profiles_the_armed_number_of_calls(tmp_path):
+    handler = ProfilingHandler(SupplierTransactionHandler(), str(tmp_path))
+    handler.arm(2)
+
+    apply_creates(handler, InMemoryContext(), ['a', 'b', 'c'])
+
+    assert len(list(tmp_path.glob('*.pstats'))) == 1
+    assert len(list(tmp_path.glob('*-phases.txt'))) == 1
+
+
+def test_arming_during_a_dump_is_kept(tmp_path, monkeypatch):
+    handler = ProfilingHandler(SupplierTransactionHandler(), str(tmp_path))
+    dump = handler._dump
+    dumps = []
+
+    def arm_then_dump(profile, timer):
+        # As if SIGUSR1 arrived while the first profile was being written
+        if not dumps:
+            handler.arm(1)
+        dumps.append(timer.calls)
+        dump(profile, timer)
+
+    monkeypatch.setattr(handler, '_dump', arm_then_dump)
+    handler.arm(1)
+    context = InMemoryContext()
+
+    apply_creates(handler, context, ['a', 'b', 'c'])
+
+    assert dumps == [1, 1]
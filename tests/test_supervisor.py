@@ -0,0 +1,88 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import os
+import signal
+import threading
+import time
+
+from sparts_supplier.processor.supervisor import Supervisor
+
+
+def record_start(path, exit_after, worker):
+    """Worker target: notes its start, then exits after exit_after
+    seconds, or runs until terminated if that is None.
+    """
+    with open(path, 'a') as fd:
+        fd.write('{} {}\n'.format(worker, os.getpid()))
+    if exit_after is None:
+        while True:
+            time.sleep(1)
+    time.sleep(exit_after)
+
+
+def starts(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as fd:
+        return [tuple(int(field) for field in line.split())
+                for line in fd]
+
+
+def stop_when(condition, timeout=10):
+    """Sends this process SIGTERM, as an operator would the supervisor,
+    once condition() holds or timeout seconds pass.
+    """
+    def watch():
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    return watcher
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def test_a_worker_that_exits_is_restarted(tmp_path):
+    path = str(tmp_path / 'starts')
+    stop_when(lambda: len([worker for worker, _ in starts(path)
+                           if worker == 0]) >= 3)
+
+    Supervisor(1, record_start, args=(path, 0), restart_delay=0.01).run()
+
+    pids = [pid for worker, pid in starts(path) if worker == 0]
+    assert len(pids) >= 3
+    assert len(set(pids)) == len(pids)
+
+
+def test_sigterm_stops_every_worker(tmp_path):
+    path = str(tmp_path / 'starts')
+    previous = signal.getsignal(signal.SIGTERM)
+    stop_when(lambda: len(starts(path)) == 3)
+
+    Supervisor(3, record_start, args=(path, None)).run()
+
+    assert sorted(worker for worker, _ in starts(path)) == [0, 1, 2]
+    assert not any(alive(pid) for _, pid in starts(path))
+    assert signal.getsignal(signal.SIGTERM) == previous
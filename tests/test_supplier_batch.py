@@ -0,0 +1,383 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import json
+import sys
+import threading
+import time
+
+import pytest
+
+from sawtooth_sdk.protobuf.batch_pb2 import BatchList
+from sawtooth_sdk.protobuf.transaction_pb2 import TransactionHeader
+from sawtooth_signing import create_context
+
+from sparts_supplier import addressing
+from sparts_supplier import codec
+from sparts_supplier import supplier_batch
+from sparts_supplier.exceptions import SupplierException
+from sparts_supplier.supplier_batch import SupplierBatch
+from sparts_supplier.supplier_batch import create_session
+
+
+PRIVATE_KEY = create_context('secp256k1').new_random_private_key().as_hex()
+
+
+class RecordingSupplierBatch(SupplierBatch):
+    """Keeps the BatchLists it is asked to POST instead of sending them."""
+
+    def __init__(self, **kwargs):
+        super().__init__('localhost:8008', private_key=PRIVATE_KEY,
+                         family_version='1.1', **kwargs)
+        self.batch_lists = []
+
+    def _send_request(self, suffix, data=None, content_type=None,
+                      supplier_id=None, auth_user=None, auth_password=None,
+                      missing_ok=False):
+        assert suffix == 'batches'
+        self.batch_lists.append(BatchList.FromString(data))
+        return '{}'
+
+    def packing(self):
+        """Returns the part ids of each batch of each BatchList sent."""
+        return [[[json.loads(transaction.payload)['part_id']
+                  for transaction in batch.transactions]
+                 for batch in batch_list.batches]
+                for batch_list in self.batch_lists]
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, text='{}'):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.reason = 'Reason'
+        self.text = text
+
+
+class FakeSession:
+    """Records the requests made through it."""
+
+    def __init__(self, responses=None):
+        self.requests = []
+        self.responses = responses or {}
+        self.closed = False
+
+    def get(self, url, headers, timeout):
+        self.requests.append(('GET', url, headers))
+        return self.responses.get(url, FakeResponse())
+
+    def post(self, url, headers, data, timeout):
+        self.requests.append(('POST', url, headers))
+        return self.responses.get(url, FakeResponse())
+
+    def close(self):
+        self.closed = True
+
+
+def add_parts(client, count):
+    return [client.make_add_part_transaction('acme', 'p{}'.format(i))
+            for i in range(count)]
+
+
+@pytest.fixture
+def client():
+    return RecordingSupplierBatch()
+
+
+def test_submit_many_packs_transactions_in_order(client):
+    batch_ids = client.submit_many(
+        add_parts(client, 7), batch_size=2, batches_per_list=2)
+
+    assert client.packing() == [
+        [['p0', 'p1'], ['p2', 'p3']],
+        [['p4', 'p5'], ['p6']],
+    ]
+    assert batch_ids == [batch.header_signature
+                         for batch_list in client.batch_lists
+                         for batch in batch_list.batches]
+
+
+def test_submit_many_of_nothing_sends_nothing(client):
+    assert client.submit_many([]) == []
+    assert client.batch_lists == []
+
+
+def test_builder_sends_full_batch_lists_as_it_goes(client):
+    with client.batch_builder(batch_size=2, batches_per_list=1) as builder:
+        builder.add_part('acme', 'p0')
+        builder.add_part('acme', 'p1')
+        assert client.packing() == [[['p0', 'p1']]]
+        builder.add_part('acme', 'p2')
+        assert len(client.batch_lists) == 1
+
+    assert client.packing() == [[['p0', 'p1']], [['p2']]]
+    assert len(builder.batch_ids) == 2
+
+
+def test_builder_sends_nothing_more_after_an_error(client):
+    with pytest.raises(RuntimeError):
+        with client.batch_builder(batch_size=2) as builder:
+            builder.add_part('acme', 'p0')
+            raise RuntimeError
+
+    assert client.batch_lists == []
+
+
+def test_builder_add_parts_splits_long_lists(client, monkeypatch):
+    monkeypatch.setattr(supplier_batch, 'MAX_PARTS_PER_TRANSACTION', 2)
+
+    with client.batch_builder() as builder:
+        builder.add_parts('acme', ['p0', 'p1', 'p2'])
+
+    batch, = client.batch_lists[0].batches
+    assert [json.loads(transaction.payload)['part_ids']
+            for transaction in batch.transactions] == [['p0', 'p1'], ['p2']]
+
+
+@pytest.mark.parametrize('sizes', [(0, 1), (1, 0)])
+def test_builder_sizes_must_be_positive(client, sizes):
+    with pytest.raises(SupplierException):
+        client.batch_builder(*sizes)
+
+
+def test_create_session_sizes_its_pool():
+    session = create_session(pool_size=3, keep_alive=False)
+
+    adapter = session.get_adapter('https://rest-api:8008')
+    assert adapter._pool_maxsize == 3
+    assert adapter.max_retries.total == 0
+    assert session.headers['Connection'] == 'close'
+
+
+def test_requests_share_the_session():
+    session = FakeSession()
+    first = SupplierBatch('rest-api:8008', session=session)
+    second = SupplierBatch('https://rest-api:8008/', session=session)
+
+    first.get_state('00' * 35)
+    second.get_state('00' * 35, auth_user='user', auth_password='secret')
+
+    assert [url for _, url, _ in session.requests] == [
+        'http://rest-api:8008/state/' + '00' * 35,
+        'https://rest-api:8008/state/' + '00' * 35,
+    ]
+    assert session.requests[1][2]['Authorization'] == \
+        'Basic dXNlcjpzZWNyZXQ='
+
+
+def test_a_shared_session_is_left_open():
+    session = FakeSession()
+    with SupplierBatch('rest-api:8008', session=session):
+        pass
+
+    assert not session.closed
+
+
+def test_an_own_session_is_closed(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(supplier_batch, 'create_session', lambda: session)
+
+    with SupplierBatch('rest-api:8008'):
+        pass
+
+    assert session.closed
+
+
+def test_error_responses_raise():
+    url = 'http://rest-api:8008/state/' + '00' * 35
+    session = FakeSession({url: FakeResponse(503)})
+    client = SupplierBatch('rest-api:8008', session=session)
+
+    with pytest.raises(SupplierException, match='Error 503'):
+        client.get_state('00' * 35)
+
+
+class PagingSupplierBatch(SupplierBatch):
+    """Records the suffix of every request it sends."""
+
+    def __init__(self, url, **kwargs):
+        super().__init__(url, private_key=PRIVATE_KEY, family_version='1.1',
+                         **kwargs)
+        self.suffixes = []
+
+    def _send_request(self, suffix, *args, **kwargs):
+        self.suffixes.append(suffix)
+        return super()._send_request(suffix, *args, **kwargs)
+
+
+def create_suppliers(client, count):
+    return client.submit_many(
+        client.make_create_transaction(
+            's{}'.format(i), 'x{}'.format(i), 'Name', '', '')
+        for i in range(count))
+
+
+def test_iter_suppliers_follows_next_position(rest_api):
+    client = PagingSupplierBatch(rest_api.url)
+    create_suppliers(client, 5)
+    client.suffixes = []
+
+    suppliers = client.iter_suppliers(page_size=2)
+    first = next(suppliers)
+    # Pages are fetched as they are needed
+    assert len(client.suffixes) == 1
+    supplier_ids = [codec.decode_supplier(data)['supplier_id']
+                    for data in [first] + list(suppliers)]
+
+    assert sorted(supplier_ids) == ['s0', 's1', 's2', 's3', 's4']
+    assert len(client.suffixes) == 3
+    assert all('limit=2' in suffix for suffix in client.suffixes)
+    assert 'start=' not in client.suffixes[0]
+    assert all('start=' in suffix for suffix in client.suffixes[1:])
+
+
+def test_list_supplier_of_an_empty_namespace(rest_api):
+    assert PagingSupplierBatch(rest_api.url).list_supplier() == []
+
+
+def test_iter_blocks_pages_newest_first(rest_api):
+    client = PagingSupplierBatch(rest_api.url)
+    # Each submission is one block
+    create_suppliers(client, 1)
+    for i in range(3):
+        client.submit_many(
+            [client.make_add_part_transaction('s0', 'p{}'.format(i))])
+
+    block_nums = [int(block['header']['block_num'])
+                  for block in client.iter_blocks(page_size=2)]
+
+    assert block_nums == [3, 2, 1, 0]
+
+
+def test_migrate_parts_declares_the_short_id_address():
+    client = SupplierBatch('localhost:8008', private_key=PRIVATE_KEY,
+                           family_version='1.1')
+    short_id_address = addressing.make_short_id_address('x')
+
+    header = TransactionHeader.FromString(
+        client.make_migrate_parts_transaction('s0', 'x').header)
+    assert short_id_address in header.inputs
+    assert short_id_address in header.outputs
+
+    header = TransactionHeader.FromString(
+        client.make_migrate_parts_transaction('s0').header)
+    assert short_id_address not in header.inputs
+
+
+def test_migrate_parts_makes_1_0_suppliers_findable_by_short_id(rest_api):
+    SupplierBatch(rest_api.url, private_key=PRIVATE_KEY,
+                  family_version='1.0').create('s0', 'x0', 'Name', '', '')
+    client = SupplierBatch(rest_api.url, private_key=PRIVATE_KEY,
+                           family_version='1.1')
+    assert client.retrieve_supplier_by_short_id('x0') is None
+
+    client.migrate_parts('s0', 'x0')
+
+    supplier = client.retrieve_supplier_by_short_id('x0')
+    assert codec.decode_supplier(supplier)['supplier_id'] == 's0'
+
+
+class CountingSupplierBatch(SupplierBatch):
+    """Holds every request open for a moment and records the most that
+    were in flight at once.
+    """
+
+    def __init__(self, url, **kwargs):
+        super().__init__(url, private_key=PRIVATE_KEY, family_version='1.1',
+                         **kwargs)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+
+    def _send_request(self, *args, **kwargs):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(0.01)
+            return super()._send_request(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def test_retrieve_suppliers_returns_none_for_missing_ids(rest_api):
+    client = CountingSupplierBatch(rest_api.url)
+    create_suppliers(client, 3)
+    client.add_part('s1', 'p1')
+
+    suppliers = client.retrieve_suppliers(['s2', 'missing', 's0', 's1'])
+
+    assert list(suppliers) == ['s2', 'missing', 's0', 's1']
+    assert suppliers['missing'] is None
+    assert codec.decode_supplier(suppliers['s1'])['parts'] == \
+        [{'part_id': 'p1'}]
+    assert all(codec.decode_supplier(suppliers[supplier_id])['supplier_id']
+               == supplier_id for supplier_id in ('s2', 's0', 's1'))
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_retrieve_suppliers_bounds_its_parallelism(rest_api, concurrency):
+    client = CountingSupplierBatch(rest_api.url)
+    create_suppliers(client, 8)
+    client.peak = 0
+
+    suppliers = client.retrieve_suppliers(
+        ['s{}'.format(i) for i in range(8)], concurrency=concurrency)
+
+    assert None not in suppliers.values()
+    assert client.peak <= concurrency
+    if concurrency > 1:
+        assert client.peak > 1
+
+
+def test_a_corrupt_record_raises_instead_of_reading_as_missing(rest_api):
+    client = CountingSupplierBatch(rest_api.url)
+    create_suppliers(client, 2)
+    rest_api.ledger._state[client._get_address('s1')] = b'\x00\x7f'
+
+    with pytest.raises(SupplierException, match='Malformed supplier record'):
+        client.retrieve_suppliers(['s0', 's1'])
+    with pytest.raises(SupplierException, match='Malformed supplier record'):
+        client.retrieve_supplier('s1')
+
+
+def test_json_responses_do_not_need_yaml(monkeypatch):
+    # An import of yaml now fails
+    monkeypatch.setitem(sys.modules, 'yaml', None)
+
+    assert supplier_batch._load_response('{"data": [1, 2]}') == \
+        {'data': [1, 2]}
+
+
+def test_non_json_responses_fall_back_to_yaml():
+    body = 'data:\n- id: abc\n  status: COMMITTED\n'
+
+    assert supplier_batch._load_response(body) == \
+        {'data': [{'id': 'abc', 'status': 'COMMITTED'}]}
+    assert supplier_batch._parse_status(body) == 'COMMITTED'
+
+
+@pytest.mark.parametrize('body', [
+    '{"data": "YWNtZQ=="}',
+    'data: YWNtZQ==\n',
+])
+def test_parse_state_either_way(body):
+    assert supplier_batch._parse_state(body) == b'acme'
+
+
+def test_malformed_state_pages_raise():
+    with pytest.raises(SupplierException, match='Malformed state listing'):
+        supplier_batch._parse_state_page('[unclosed')
@@ -0,0 +1,293 @@
+# Copyright 2018 Wind River
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import base64
+import collections
+import json
+
+import pytest
+
+from sawtooth_sdk.protobuf.batch_pb2 import BatchList
+from sawtooth_signing import create_context
+
+from benchmarks.mock_rest_api import MockLedger
+from sparts_supplier import addressing
+from sparts_supplier import codec
+from sparts_supplier import supplier_index
+from sparts_supplier.supplier_batch import SupplierBatch
+from sparts_supplier.supplier_batch import SupplierClientBase
+from sparts_supplier.supplier_index import SupplierIndex
+
+
+PRIVATE_KEY = create_context('secp256k1').new_random_private_key().as_hex()
+
+
+class LedgerClient:
+    """Serves blocks and state from a MockLedger through the SupplierBatch
+    methods SupplierIndex.sync calls, counting the requests each makes.
+    """
+
+    def __init__(self, family_version='1.1'):
+        self.ledger = MockLedger()
+        self.requests = collections.Counter()
+        self._client = SupplierClientBase(
+            '', family_version=family_version, private_key=PRIVATE_KEY)
+
+    def submit(self, *specs):
+        """Applies one batch of transactions as one new block."""
+        batch = self._client.make_batch(
+            [self._client.make_transaction(**spec) for spec in specs])
+        self.ledger.submit(BatchList(batches=[batch]).SerializeToString())
+
+    def iter_blocks(self, page_size=100, auth_user=None,
+                    auth_password=None):
+        start = None
+        while True:
+            self.requests['blocks'] += 1
+            blocks, start = self.ledger.blocks(page_size, start)
+            yield from blocks
+            if start is None:
+                return
+
+    def iter_state_entries(self, prefix, page_size=100, head=None,
+                           auth_user=None, auth_password=None):
+        start = None
+        while True:
+            self.requests['list'] += 1
+            entries, start = self.ledger.list(prefix, page_size, start)
+            yield from entries
+            if start is None:
+                return
+
+    def get_state(self, address, head=None, auth_user=None,
+                  auth_password=None):
+        self.requests['get'] += 1
+        return self.ledger.get(address)
+
+
+def create(supplier_id, short_id='', **fields):
+    return dict(fields, action='create', supplier_id=supplier_id,
+                short_id=short_id, supplier_name='Name ' + supplier_id)
+
+
+def add_part(supplier_id, part_id):
+    return {'action': 'AddPart', 'supplier_id': supplier_id,
+            'part_id': part_id}
+
+
+def add_parts(supplier_id, part_ids):
+    return {'action': 'AddParts', 'supplier_id': supplier_id,
+            'part_ids': part_ids}
+
+
+def parts(index, supplier_id):
+    supplier = codec.decode_supplier(index.retrieve_supplier(supplier_id))
+    return sorted(part['part_id'] for part in supplier['parts'])
+
+
+@pytest.fixture
+def client():
+    return LedgerClient()
+
+
+@pytest.fixture
+def index():
+    with SupplierIndex(':memory:') as index:
+        yield index
+
+
+def test_the_first_sync_copies_the_namespace(client, index):
+    client.submit(create('s1', 'a1'), add_parts('s1', ['p1', 'p2']))
+    client.submit(create('s2', 'a2'))
+
+    # Two supplier records and two part links
+    assert index.sync(client) == 4
+    assert index.head == client.ledger.blocks(1)[0][0]['header_signature']
+    assert parts(index, 's1') == ['p1', 'p2']
+    assert index.find_by_part('p1') == \
+        [client.ledger.get(addressing.make_supplier_address('s1'))]
+    assert len(index.find_by_short_id('a2')) == 1
+
+
+def test_a_sync_with_nothing_new_fetches_only_the_head(client, index):
+    client.submit(create('s1'))
+    index.sync(client)
+    client.requests.clear()
+
+    assert index.sync(client) == 0
+    assert client.requests == {'blocks': 1}
+
+
+def test_later_syncs_re_read_only_what_changed(client, index):
+    client.submit(create('s1'), add_part('s1', 'p1'))
+    client.submit(create('s2'))
+    index.sync(client)
+    client.requests.clear()
+
+    client.submit(add_part('s1', 'p9'))
+    client.submit(add_parts('s2', ['q1', 'q2']), create('s3'))
+
+    # The three links and the record of s3; the records of s1 and s2
+    # were not written, but are outputs of their transactions
+    assert index.sync(client) == 6
+    assert client.requests['list'] == 0
+    assert parts(index, 's1') == ['p1', 'p9']
+    assert parts(index, 's2') == ['q1', 'q2']
+    assert index.retrieve_supplier('s3') is not None
+
+
+def test_long_part_lists_re_list_the_part_prefix(client, index, monkeypatch):
+    monkeypatch.setattr(supplier_index, 'MAX_LINK_READS', 2)
+    client.submit(create('s1'))
+    index.sync(client)
+    client.requests.clear()
+
+    client.submit(add_parts('s1', ['p1', 'p2', 'p3']))
+    index.sync(client)
+
+    assert client.requests['list'] == 1
+    assert parts(index, 's1') == ['p1', 'p2', 'p3']
+
+
+def test_a_sync_pages_back_to_the_last_head(client, index):
+    client.submit(create('s1'))
+    index.sync(client)
+    for i in range(150):
+        client.submit(add_part('s1', 'p{}'.format(i)))
+
+    index.sync(client)
+
+    assert len(parts(index, 's1')) == 150
+
+
+def test_a_fork_copies_the_namespace_again(client, index):
+    client.submit(create('s1'), add_part('s1', 'p1'))
+    client.submit(create('s2'))
+    index.sync(client)
+
+    # The block the index synced to is replaced by another one at the
+    # same height, which holds a different supplier
+    blocks = client.ledger._blocks
+    state = client.ledger._state
+    orphan = blocks.pop()
+    del state[addressing.make_supplier_address('s2')]
+    client.ledger._addresses.remove(addressing.make_supplier_address('s2'))
+    client.submit(create('s3'))
+    assert blocks[-1]['header']['block_num'] == \
+        orphan['header']['block_num']
+    client.requests.clear()
+
+    index.sync(client)
+
+    assert client.requests['list'] == 2
+    assert index.retrieve_supplier('s2') is None
+    assert index.retrieve_supplier('s3') is not None
+    assert parts(index, 's1') == ['p1']
+
+
+def test_1_0_transactions_re_read_the_record(index):
+    client = LedgerClient(family_version='1.0')
+    client.submit(create('s1', 'a1'))
+    index.sync(client)
+    client.requests.clear()
+
+    client.submit(add_part('s1', 'p1'))
+    index.sync(client)
+
+    # A 1.0 AddPart writes the part into the record, its only output
+    assert client.requests['list'] == 0
+    assert client.requests['get'] == 1
+    assert parts(index, 's1') == ['p1']
+
+
+def test_retrieve_reads_through_a_synced_index(rest_api):
+    client = SupplierBatch(rest_api.url, private_key=PRIVATE_KEY,
+                           family_version='1.1',
+                           index=SupplierIndex(':memory:'))
+    client.create('s1', 'a1', 'Name', '', '')
+    assert codec.decode_supplier(client.retrieve_supplier('s1'))['parts'] \
+        == []
+
+    client.add_part('s1', 'p9')
+
+    assert codec.decode_supplier(client.retrieve_supplier('s1'))['parts'] \
+        == [{'part_id': 'p9'}]
+
+
+def transaction(payload, family_version='1.1', outputs=(),
+                family_name='supplier'):
+    return {
+        'header': {'family_name': family_name,
+                   'family_version': family_version,
+                   'outputs': list(outputs)},
+        'payload': base64.b64encode(json.dumps(payload).encode()).decode(),
+    }
+
+
+def block(number, *transactions):
+    return {'header_signature': 'block-{}'.format(number),
+            'header': {'block_num': str(number)},
+            'batches': [{'transactions': list(transactions)}]}
+
+
+def test_touched_since_collects_the_outputs_of_newer_blocks():
+    record = addressing.make_supplier_address('s1')
+    prefix = addressing.make_part_prefix('s1')
+    blocks = [
+        block(3, transaction(add_part('s1', 'p1'), outputs=[record, prefix])),
+        block(2, transaction({}, family_name='intkey', outputs=[record]),
+              transaction(create('s2'), family_version='1.0',
+                          outputs=[addressing.make_part_prefix('s2')])),
+        block(1),
+    ]
+
+    touched = supplier_index._touched_since(
+        blocks[0], iter(blocks[1:]), 'block-1', 1)
+
+    assert touched == (
+        {record, addressing.make_part_address('s1', 'p1')},
+        {addressing.make_part_prefix('s2')})
+
+
+@pytest.mark.parametrize('older, last_head, last_block_num', [
+    # The last head is not among the blocks back to its height
+    ([block(2), block(1)], 'block-x', 1),
+    # The chain ends before the last head is found
+    ([block(2)], 'block-1', 1),
+])
+def test_touched_since_detects_forks(older, last_head, last_block_num):
+    assert supplier_index._touched_since(
+        block(3), iter(older), last_head, last_block_num) is None
+
+
+@pytest.mark.parametrize('payload, family_version, part_ids', [
+    (create('s1', 'a1'), '1.1', []),
+    (add_part('s1', 'p1'), '1.1', ['p1']),
+    (add_parts('s1', ['p1', 'p2']), '1.1', ['p1', 'p2']),
+    ({'action': 'MigrateParts', 'supplier_id': 's1'}, '1.1', None),
+    (add_part('s1', 'p1'), '1.0', None),
+    ({'action': 'AddPart'}, '1.1', None),
+    (add_parts('s1', 5), '1.1', None),
+    (add_parts('s1', ['p{}'.format(i) for i in range(101)]), '1.1', None),
+])
+def test_link_addresses(payload, family_version, part_ids):
+    addresses = supplier_index._link_addresses(
+        transaction(payload, family_version))
+
+    if part_ids is None:
+        assert addresses is None
+    else:
+        assert addresses == [addressing.make_part_address('s1', part_id)
+                             for part_id in part_ids]